@@ -0,0 +1,245 @@
+import argparse
+import asyncio
+import json
+import logging
+import multiprocessing
+import os
+import random
+import statistics
+import struct
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmark.packet_generator import AVLPacketGenerator, DEFAULT_IO_MIX
+from benchmark.mqtt_sink import run_counting_broker
+
+logger = logging.getLogger("fleet")
+
+ACK = struct.Struct(">I")
+
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * fraction))]
+
+
+class FleetStats:
+    def __init__(self):
+        self.latencies = []
+        self.sessions_started = 0
+        self.sessions_failed = 0
+        self.login_failures = 0
+        self.frames_sent = 0
+        self.records_sent = 0
+        self.records_acked = 0
+        self.bad_acks = 0
+        self.errors = {}
+
+    def fail(self, reason: str):
+        self.sessions_failed += 1
+        self.errors[reason] = self.errors.get(reason, 0) + 1
+
+    def summary(self, elapsed: float):
+        latencies = sorted(self.latencies)
+        return {
+            "elapsed_seconds": elapsed,
+            "sessions_started": self.sessions_started,
+            "sessions_failed": self.sessions_failed,
+            "login_failures": self.login_failures,
+            "frames_sent": self.frames_sent,
+            "frames_acked": len(latencies),
+            "records_sent": self.records_sent,
+            "records_acked": self.records_acked,
+            "bad_acks": self.bad_acks,
+            "records_per_second": self.records_acked / elapsed if elapsed else 0.0,
+            "frames_per_second": len(latencies) / elapsed if elapsed else 0.0,
+            "ack_latency_ms": {
+                "mean": statistics.fmean(latencies) * 1000 if latencies else 0.0,
+                "p50": percentile(latencies, 0.50) * 1000,
+                "p90": percentile(latencies, 0.90) * 1000,
+                "p99": percentile(latencies, 0.99) * 1000,
+                "p999": percentile(latencies, 0.999) * 1000,
+                "max": latencies[-1] * 1000 if latencies else 0.0,
+            },
+            "errors": self.errors,
+        }
+
+
+class DeviceSession:
+    # Satu device: login IMEI, lalu kirim frame AVL dengan interval + jitter dan tunggu ACK setiap frame
+
+    __slots__ = ("generator", "codec_id", "templates", "interval", "jitter", "stats")
+
+    def __init__(self, imei, args, stats: FleetStats, seed: int):
+        self.generator = AVLPacketGenerator(imei=imei, io_mix=args.io_mix, seed=seed)
+        self.codec_id = args.codec
+        # Record dibuat sekali lalu di-restamp setiap kirim, supaya CPU simulator tidak jadi bottleneck
+        self.templates = [self.generator.record(args.codec) for _ in range(args.records)]
+        self.interval = 1.0 / args.rate
+        self.jitter = args.jitter
+        self.stats = stats
+
+    def next_delay(self) -> float:
+        return max(0.0, self.interval * (1 + random.uniform(-self.jitter, self.jitter)))
+
+    async def run(self, host, port, start_delay, deadline, timeout):
+        await asyncio.sleep(start_delay)
+        stats = self.stats
+        stats.sessions_started += 1
+        writer = None
+        try:
+            reader, writer = await asyncio.wait_for(asyncio.open_connection(host, port), timeout)
+            writer.write(self.generator.login())
+            await writer.drain()
+            if await asyncio.wait_for(reader.readexactly(1), timeout) != b"\x01":
+                stats.login_failures += 1
+                stats.fail("login_rejected")
+                return
+
+            loop = asyncio.get_running_loop()
+            while loop.time() < deadline:
+                records = [self.generator.restamp(record) for record in self.templates]
+                frame = self.generator.build_frame(self.codec_id, records)
+                sent_at = time.perf_counter()
+                writer.write(frame)
+                await writer.drain()
+                stats.frames_sent += 1
+                stats.records_sent += len(records)
+                ack = ACK.unpack(await asyncio.wait_for(reader.readexactly(ACK.size), timeout))[0]
+                stats.latencies.append(time.perf_counter() - sent_at)
+                if ack != len(records):
+                    stats.bad_acks += 1
+                stats.records_acked += ack
+                await asyncio.sleep(self.next_delay())
+        except asyncio.TimeoutError:
+            stats.fail("timeout")
+        except asyncio.IncompleteReadError:
+            stats.fail("closed_by_server")
+        except OSError as e:
+            stats.fail(type(e).__name__)
+        finally:
+            if writer is not None:
+                writer.close()
+                try:
+                    await writer.wait_closed()
+                except OSError:
+                    pass
+
+
+async def run_fleet(args):
+    stats = FleetStats()
+    loop = asyncio.get_running_loop()
+    start = loop.time()
+    deadline = start + args.ramp_up + args.duration
+    sessions = [
+        DeviceSession(f"{args.imei_base + i:015d}", args, stats, args.seed + i)
+        for i in range(args.devices)
+    ]
+    logger.info("Menjalankan %d device ke %s:%d selama %.0f detik...", args.devices, args.host, args.port, args.duration)
+    await asyncio.gather(*(
+        session.run(args.host, args.port, args.ramp_up * i / max(1, args.devices), deadline, args.timeout)
+        for i, session in enumerate(sessions)
+    ))
+    return stats.summary(loop.time() - start)
+
+
+def run_embedded_server(port, ready, stop, payloads, results):
+    # Server lengkap dalam process terpisah; connector MQTT diganti sink yang meneruskan payload ke broker tiruan
+    from config.config import Config
+    Config.TCP_SERVER_PORT = port
+    Config.SPOOL_ENABLED = False
+    Config.MQTT_STATS_INTERVAL = 0
+    Config.LOG_LEVEL = "WARNING"
+
+    logging.basicConfig(level=logging.WARNING, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    from utils.log import setup_logging
+    setup_logging()
+
+    from config.mqtt import mqtt_pool
+    from config.teltonika_server import teltonika_server
+    from controller.teltonika_server import teltonika_controller
+    from benchmark.mqtt_sink import install_sink
+
+    async def serve():
+        install_sink(mqtt_pool, forward=payloads)
+        mqtt_pool.start()
+        await teltonika_server.begin()
+        server_task = asyncio.create_task(teltonika_server.start_server())
+        ready.set()
+        await asyncio.get_running_loop().run_in_executor(None, stop.wait)
+        await teltonika_server.close_server(Config.SHUTDOWN_DRAIN_TIMEOUT)
+        server_task.cancel()
+        await mqtt_pool.stop()
+        teltonika_controller.teltonika_handler.close()
+        pool_stats = mqtt_pool.stats()
+        pool_stats.pop("shards", None)
+        payloads.put(None)
+        results.put(pool_stats)
+
+    asyncio.run(serve())
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Simulasi armada device Teltonika untuk load test server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=50000)
+    parser.add_argument("--devices", type=int, default=1000)
+    parser.add_argument("--rate", type=float, default=1.0, help="Frame per detik per device")
+    parser.add_argument("--jitter", type=float, default=0.2, help="Variasi interval kirim, 0.2 = +/-20%%")
+    parser.add_argument("--records", type=int, default=1, help="Record per frame (1..255)")
+    parser.add_argument("--codec", type=lambda value: int(value, 0), default=0x8E, help="0x08 atau 0x8E")
+    parser.add_argument("--io-mix", default=DEFAULT_IO_MIX)
+    parser.add_argument("--duration", type=float, default=30, help="Lama pengiriman setelah ramp-up (detik)")
+    parser.add_argument("--ramp-up", type=float, default=5, help="Waktu untuk membuka semua sesi (detik)")
+    parser.add_argument("--timeout", type=float, default=10, help="Batas tunggu connect/ACK (detik)")
+    parser.add_argument("--imei-base", type=int, default=353201350000000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--embedded", action="store_true",
+                        help="Jalankan server sendiri (process terpisah) dengan sink MQTT lokal, tanpa broker")
+    parser.add_argument("--output", help="Simpan ringkasan sebagai JSON")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    random.seed(args.seed)
+
+    server = broker = None
+    if args.embedded:
+        context = multiprocessing.get_context("spawn")
+        ready, stop = context.Event(), context.Event()
+        payloads, server_results, broker_results = context.Queue(), context.Queue(), context.Queue()
+        broker = context.Process(target=run_counting_broker, args=(payloads, broker_results), name="fleet-broker")
+        broker.start()
+        server = context.Process(
+            target=run_embedded_server, args=(args.port, ready, stop, payloads, server_results), name="fleet-server"
+        )
+        server.start()
+        if not ready.wait(30):
+            server.terminate()
+            broker.terminate()
+            raise SystemExit("Server embedded gagal dijalankan")
+
+    try:
+        summary = asyncio.run(run_fleet(args))
+    finally:
+        if server is not None:
+            stop.set()
+
+    if server is not None:
+        summary["server"] = server_results.get(timeout=60)
+        summary["broker"] = broker_results.get(timeout=120)
+        server.join(30)
+        broker.join(30)
+        # Record yang sudah di-ACK ke device tapi tidak sampai ke broker
+        summary["records_lost"] = summary["records_acked"] - summary["broker"]["records"]
+
+    print(json.dumps(summary, indent=2))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(summary, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
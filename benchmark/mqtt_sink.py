@@ -0,0 +1,92 @@
+import asyncio
+import json
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+try:
+    import cbor2
+except ImportError:
+    cbor2 = None
+
+
+def count_records(payload: bytes) -> int:
+    # Menghitung record dalam satu pesan MQTT, baik array polos maupun dengan envelope
+    if payload[:1] in (b"[", b"{"):
+        decoded = orjson.loads(payload) if orjson is not None else json.loads(payload)
+    elif msgpack is not None:
+        try:
+            decoded = msgpack.unpackb(payload, strict_map_key=False)
+        except Exception:
+            decoded = cbor2.loads(payload) if cbor2 is not None else []
+    elif cbor2 is not None:
+        decoded = cbor2.loads(payload)
+    else:
+        return 0
+    if isinstance(decoded, dict):
+        decoded = decoded.get("records", [])
+    return len(decoded)
+
+
+class MQTTSinkConnector:
+    # Pengganti MQTTConnector tanpa broker: publish selalu berhasil dan hanya menghitung pesan.
+    # Dipakai benchmark end-to-end dan load test supaya pipeline bisa diuji tanpa jaringan.
+
+    def __init__(self, name="sink-0", count=True, latency: float = 0.0, forward=None):
+        self.name = name
+        self.count = count
+        self.latency = latency
+        # forward: multiprocessing.Queue ke process broker tiruan, supaya decode payload tidak membebani server
+        self.forward = forward
+        self.connected = asyncio.Event()
+        self.reconnects = 0
+        self.last_publish = 0.0
+        self.messages = 0
+        self.bytes = 0
+        self.records = 0
+
+    def start(self):
+        self.connected.set()
+
+    async def stop(self):
+        self.connected.clear()
+
+    async def publish(self, topic, payload) -> bool:
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        self.messages += 1
+        self.bytes += len(payload)
+        if self.forward is not None:
+            self.forward.put(payload)
+        elif self.count:
+            self.records += count_records(payload)
+        return True
+
+
+def run_counting_broker(payloads, results):
+    # Broker tiruan di process sendiri: menghitung pesan/record sampai menerima None
+    messages = records = size = 0
+    while True:
+        payload = payloads.get()
+        if payload is None:
+            break
+        messages += 1
+        size += len(payload)
+        records += count_records(payload)
+    results.put({"messages": messages, "records": records, "bytes": size})
+
+
+def install_sink(pool, count=True, latency: float = 0.0, forward=None):
+    # Mengganti connector setiap shard; dipanggil sebelum pool.start()
+    sinks = []
+    for i, shard in enumerate(pool.shards):
+        shard.connector = MQTTSinkConnector(f"sink-{i}", count, latency, forward)
+        sinks.append(shard.connector)
+    return sinks
@@ -0,0 +1,260 @@
+import argparse
+import asyncio
+import json
+import logging
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config.config import Config
+from benchmark.packet_generator import AVLPacketGenerator, DEFAULT_IO_MIX
+from utils.crc import CRC16ARC
+from parser.codec8 import ParseRawCodec8
+from parser.codec8e import ParseRawCodec8e
+from parser.model_json import TeltonikaPayloadMapper, RAW_MODES
+from parser import columnar
+from utils.serializer import get_serializer
+
+logger = logging.getLogger("benchmark")
+
+SERIALIZERS = ("json", "json-std", "msgpack", "cbor")
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"], stderr=subprocess.DEVNULL, text=True
+        ).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def measure(func, repeat: int, number: int, items: int):
+    # Ambil waktu terbaik dari beberapa ulangan; items = jumlah record/byte per pemanggilan
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(number):
+            func()
+        timings.append((time.perf_counter() - start) / number)
+    best = min(timings)
+    return {
+        "seconds_per_op": best,
+        "median_seconds_per_op": statistics.median(timings),
+        "items_per_op": items,
+        "items_per_second": items / best if best else 0.0,
+    }
+
+
+def split_frame(frame: bytes):
+    # Sama seperti handler: data_field mulai byte ke-8, CRC 4 byte terakhir
+    avl_data = frame[8:]
+    return avl_data[2:-5], avl_data[1], avl_data[:-4], int.from_bytes(avl_data[-4:], "big")
+
+
+def micro_benchmarks(args):
+    results = {}
+    generator = AVLPacketGenerator(io_mix=args.io_mix, seed=args.seed)
+    frames = {
+        "codec8": generator.frame(0x08, args.records),
+        "codec8e": generator.frame(0x8E, args.records),
+    }
+
+    crc_data = frames["codec8e"][8:-4]
+    results["crc16arc"] = measure(lambda: CRC16ARC.compute(crc_data), args.repeat, args.number, len(crc_data))
+    results["crc16arc"]["unit"] = "bytes"
+
+    parsers = {"codec8": ParseRawCodec8.parse, "codec8e": ParseRawCodec8e.parse}
+    decoded = {}
+    for name, parse in parsers.items():
+        content, count, crc_part, crc_received = split_frame(frames[name])
+        decoded[name] = parse(content, count, generator.imei, crc_part, crc_received)
+        if decoded[name] is None or len(decoded[name]) != count:
+            raise RuntimeError(f"Frame sintetis {name} gagal didecode")
+        results[f"decode_{name}"] = measure(
+            lambda: parse(content, count, generator.imei, crc_part, crc_received), args.repeat, args.number, count
+        )
+        results[f"decode_{name}"]["frame_bytes"] = len(frames[name])
+
+    if columnar.np is not None:
+        # Decode header GPS kolumnar vs loop per record, untuk banyak frame sekaligus (back-fill/replay)
+        batch_frames = [(generator.imei, frames[name]) for name in ("codec8", "codec8e")] * 50
+        batch_records = sum(frame[9] for _, frame in batch_frames)
+        batch = columnar.decode_gps_batch(batch_frames, verify_crc=False)
+        if len(batch) != batch_records or batch["timestamp_ms"].tolist() != [
+            record.timestamp_ms for _ in range(50) for name in ("codec8", "codec8e") for record in decoded[name]
+        ]:
+            raise RuntimeError("Decode kolumnar tidak sama dengan decoder per record")
+        decoders = {0x08: ParseRawCodec8.decode_records, 0x8E: ParseRawCodec8e.decode_records}
+        results["decode_records_loop"] = measure(
+            lambda: [decoders[frame[8]](frame[10:-5], frame[9], imei) for imei, frame in batch_frames],
+            args.repeat, max(1, args.number // 10), batch_records,
+        )
+        results["decode_columnar_gps"] = measure(
+            lambda: columnar.decode_gps_batch(batch_frames, verify_crc=False),
+            args.repeat, max(1, args.number // 10), batch_records,
+        )
+    else:
+        logger.info("Lewati decode kolumnar: numpy tidak terpasang")
+
+    records = decoded["codec8e"]
+    mapped = None
+    for raw_mode in RAW_MODES:
+        for timestamp_format in ("iso", "epoch_ms"):
+            mapper = TeltonikaPayloadMapper.for_profile(Config.MAPPING_PROFILE, raw_mode, timestamp_format)
+            results[f"map_{raw_mode}_{timestamp_format}"] = measure(
+                lambda: [mapper.map(generator.imei, record) for record in records], args.repeat, args.number, len(records)
+            )
+            if raw_mode == Config.PAYLOAD_RAW_MODE and timestamp_format == Config.TIMESTAMP_FORMAT:
+                mapped = [mapper.map(generator.imei, record) for record in records]
+
+    for name in SERIALIZERS:
+        try:
+            serializer = get_serializer(name, Config.PAYLOAD_ENVELOPE)
+        except RuntimeError as e:
+            logger.info("Lewati serializer %s: %s", name, e)
+            continue
+        result = measure(lambda: serializer.dumps(mapped), args.repeat, args.number, len(mapped))
+        result["payload_bytes"] = len(serializer.dumps(mapped))
+        results[f"serialize_{name}"] = result
+
+    for name, result in results.items():
+        result.setdefault("unit", "records")
+    return results
+
+
+async def end_to_end(args):
+    # Jalur lengkap: handle_raw_data -> mapper -> pool MQTT -> serializer -> connector tiruan
+    from config.mqtt import mqtt_pool
+    from service.teltonika_server import TeltonikaHandler
+    from benchmark.mqtt_sink import install_sink
+
+    # Sink tidak men-decode payload supaya biaya verifikasi tidak ikut terukur
+    sinks = install_sink(mqtt_pool, count=False)
+    mqtt_pool.start()
+    handler = TeltonikaHandler()
+
+    devices = [
+        AVLPacketGenerator(imei=f"35320135{i:07d}", io_mix=args.io_mix, seed=args.seed + i)
+        for i in range(args.devices)
+    ]
+    frames = [
+        (device.imei, device.frame(args.codec, args.records))
+        for _ in range(args.frames)
+        for device in devices
+    ]
+    total_records = len(frames) * args.records
+    total_bytes = sum(len(frame) for _, frame in frames)
+
+    start = time.perf_counter()
+    for imei, frame in frames:
+        with memoryview(frame) as view:
+            if await handler.handle_raw_data(view, imei, None) != args.records:
+                raise RuntimeError(f"Frame dari {imei} tidak di-ACK dengan benar")
+        # Seperti server sungguhan: publisher mendapat giliran di antara frame
+        await asyncio.sleep(0)
+    decoded = time.perf_counter() - start
+    await mqtt_pool.stop()
+    elapsed = time.perf_counter() - start
+    handler.close()
+
+    published = sum(shard.published_records for shard in mqtt_pool.shards)
+    if published != total_records:
+        raise RuntimeError(f"Record terkirim {published}, seharusnya {total_records}")
+    return {
+        "seconds": elapsed,
+        "ack_path_seconds": decoded,
+        "records": total_records,
+        "bytes_in": total_bytes,
+        "messages_out": sum(sink.messages for sink in sinks),
+        "bytes_out": sum(sink.bytes for sink in sinks),
+        "items_per_second": total_records / elapsed,
+        "unit": "records",
+    }
+
+
+def compare(current, baseline_path, threshold):
+    # Membandingkan items_per_second; penurunan lebih dari threshold dianggap regresi
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+    regressions = []
+    print(f"\nPerbandingan dengan {baseline_path} (commit {baseline.get('commit')}):")
+    for name, result in current["results"].items():
+        old = baseline.get("results", {}).get(name)
+        if not old or not old.get("items_per_second"):
+            print(f"  {name:<28} baru")
+            continue
+        change = result["items_per_second"] / old["items_per_second"] - 1
+        flag = ""
+        if change < -threshold:
+            flag = "  <-- REGRESI"
+            regressions.append(name)
+        print(f"  {name:<28} {change:+7.1%}{flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark decoder, mapper, serializer dan pipeline Teltonika")
+    parser.add_argument("--records", type=int, default=50, help="Jumlah record per frame (1..255)")
+    parser.add_argument("--io-mix", default=DEFAULT_IO_MIX, help="Jumlah IO per tipe, contoh 1B=6,2B=4,4B=3,8B=2,NX=1")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeat", type=int, default=5, help="Jumlah ulangan, diambil yang tercepat")
+    parser.add_argument("--number", type=int, default=200, help="Pemanggilan per ulangan")
+    parser.add_argument("--codec", type=lambda value: int(value, 0), default=0x8E, help="Codec end-to-end: 0x08 atau 0x8E")
+    parser.add_argument("--devices", type=int, default=100, help="Jumlah IMEI pada run end-to-end")
+    parser.add_argument("--frames", type=int, default=20, help="Frame per device pada run end-to-end")
+    parser.add_argument("--skip-e2e", action="store_true")
+    parser.add_argument("--output", help="File JSON hasil (default benchmark/results/<commit>.json)")
+    parser.add_argument("--compare", help="File JSON hasil commit lain sebagai pembanding")
+    parser.add_argument("--threshold", type=float, default=0.10, help="Batas penurunan throughput sebelum dianggap regresi")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    logger.setLevel(logging.INFO)
+
+    # Benchmark tidak boleh menyentuh broker/spool dan harus mengukur decode inline
+    Config.SPOOL_ENABLED = False
+    Config.MQTT_STATS_INTERVAL = 0
+    Config.OFFLOAD_EXECUTOR = "none"
+
+    commit = git_commit()
+    report = {
+        "commit": commit,
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "params": {
+            key: getattr(args, key) for key in ("records", "io_mix", "seed", "repeat", "number", "codec", "devices", "frames")
+        },
+        "config": {
+            "payload_format": Config.PAYLOAD_FORMAT,
+            "payload_raw_mode": Config.PAYLOAD_RAW_MODE,
+            "timestamp_format": Config.TIMESTAMP_FORMAT,
+            "mqtt_pool_size": Config.MQTT_POOL_SIZE,
+            "mqtt_batch_size": Config.MQTT_BATCH_SIZE,
+        },
+        "results": micro_benchmarks(args),
+    }
+    if not args.skip_e2e:
+        report["results"]["end_to_end"] = asyncio.run(end_to_end(args))
+
+    for name, result in report["results"].items():
+        print(f"{name:<28} {result['items_per_second']:>14,.0f} {result['unit']}/s")
+
+    output = args.output or os.path.join(os.path.dirname(os.path.abspath(__file__)), "results", f"{commit}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"\nHasil disimpan di {output}")
+
+    if args.compare and compare(report, args.compare, args.threshold):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
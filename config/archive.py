@@ -0,0 +1,334 @@
+import asyncio
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from config.config import Config
+from utils.columnar_file import writer_class, recover_tcol, SchemaChanged
+from utils.dedup import split_key
+from utils.log import get_logger
+from utils.metrics import (
+    metrics, archive_records_total, archive_dropped_records_total, archive_files_total, archive_write_seconds,
+)
+
+logger = get_logger("archive")
+
+DAY_MS = 86_400_000
+TMP_SUFFIX = ".tmp"
+
+# Tidak diarsip: imei/timestamp disimpan sebagai kolom sendiri, data_payload bertingkat
+SKIPPED_FIELDS = ("imei", "timestamp", "data_payload")
+
+
+def process_alive(pid: int) -> bool:
+    if pid == os.getpid():
+        # Pid proses ini dipakai ulang dari worker yang crash: file sementara pasti bukan milik kita
+        return False
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    except OSError:
+        return False
+    return True
+
+
+def tmp_owner(name: str):
+    # ".part-<ms>-<pid>-<seq>.<ext>.tmp" -> pid penulis, None bila nama tidak dikenali
+    parts = name.split("-")
+    if len(parts) < 4 or parts[0] != ".part":
+        return None
+    try:
+        return int(parts[2])
+    except ValueError:
+        return None
+
+
+class ArchivePartition:
+    # Satu partisi (tanggal UTC, prefix IMEI): buffer baris di event loop, file terbuka di thread writer
+
+    __slots__ = ("directory", "rows", "pending", "last_submit", "writer", "tmp_path", "final_path", "opened")
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        self.rows = []
+        # Jumlah batch yang sudah dikirim ke thread writer tapi belum selesai ditulis
+        self.pending = 0
+        self.last_submit = time.monotonic()
+        self.writer = None
+        self.tmp_path = None
+        self.final_path = None
+        self.opened = 0.0
+
+
+class ArchiveSink:
+    # Sink kedua di samping MQTT: record hasil mapping ditulis ke file kolumnar terkompresi,
+    # dipartisi per tanggal dan prefix IMEI. Semua I/O file berjalan di satu thread writer
+    # (urutan tulis per file terjaga); file baru terlihat setelah selesai (tulis ke .tmp lalu rename).
+
+    def __init__(self, directory: str, file_format: str = "auto", imei_prefix: int = 4, batch_rows: int = 5000,
+                 flush_interval: float = 10.0, file_size: int = 128 * 1024 * 1024, roll_interval: float = 3600.0,
+                 max_pending_rows: int = 500000):
+        self.directory = directory
+        self.file_format = file_format
+        self.imei_prefix = imei_prefix
+        self.batch_rows = batch_rows
+        self.flush_interval = flush_interval
+        self.file_size = file_size
+        self.roll_interval = roll_interval
+        self.max_pending_rows = max_pending_rows
+        self.enabled = False
+        self.writer_cls = None
+        self.executor = None
+        self.task = None
+        self.partitions = {}
+        self.sequence = 0
+        self.buffered_rows = 0
+        self.pending_rows = 0
+        self.written_records = 0
+        self.dropped_records = 0
+        self.files = 0
+
+    def start(self):
+        self.writer_cls = writer_class(self.file_format)
+        self.recover()
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="archive")
+        self.task = asyncio.create_task(self.maintain())
+        self.enabled = True
+        logger.info("Arsip kolumnar (%s) aktif di %s", self.writer_cls.extension, self.directory)
+
+    def recover(self):
+        # File sementara sisa crash: tcol dipotong sampai chunk lengkap terakhir lalu difinalisasi,
+        # parquet tanpa footer tidak bisa dibaca sehingga dibuang. ARCHIVE_DIR dipakai bersama semua
+        # worker: file milik proses yang masih hidup (pid di nama file) sedang ditulis dan dilewati.
+        for root, _, names in os.walk(self.directory):
+            for name in names:
+                if not (name.startswith(".") and name.endswith(TMP_SUFFIX)):
+                    continue
+                pid = tmp_owner(name)
+                if pid is not None and process_alive(pid):
+                    continue
+                path = os.path.join(root, name)
+                final_path = os.path.join(root, name[1:-len(TMP_SUFFIX)])
+                try:
+                    rows = recover_tcol(path) if name.endswith(".tcol" + TMP_SUFFIX) else 0
+                    if rows:
+                        os.replace(path, final_path)
+                        logger.warning("File arsip %s dipulihkan: %d baris", final_path, rows)
+                    else:
+                        os.remove(path)
+                        logger.warning("File arsip tidak lengkap %s dibuang", path)
+                except OSError as e:
+                    logger.error("Gagal memulihkan file arsip %s: %s", path, e)
+
+    def partition_for(self, day: int, prefix: str) -> ArchivePartition:
+        key = (day, prefix)
+        partition = self.partitions.get(key)
+        if partition is None:
+            date = datetime.fromtimestamp(day * 86400, tz=timezone.utc).strftime("%Y-%m-%d")
+            partition = self.partitions[key] = ArchivePartition(
+                os.path.join(self.directory, f"date={date}", f"imei={prefix}")
+            )
+        return partition
+
+    def submit(self, imei: str, records, keys):
+        # Dipanggil di event loop untuk setiap frame; hanya menambah ke buffer partisi
+        if self.buffered_rows + self.pending_rows >= self.max_pending_rows:
+            self.dropped_records += len(records)
+            archive_dropped_records_total.inc(len(records))
+            logger.warning("Buffer arsip penuh (%d baris), %d record dari IMEI %s tidak diarsip.",
+                           self.buffered_rows + self.pending_rows, len(records), imei)
+            return
+        for partition in self.buffer(imei, records, keys):
+            self.flush(partition)
+
+    def buffer(self, imei: str, records, keys):
+        # Menambah record ke buffer partisi; mengembalikan partisi yang sudah mencapai batch_rows
+        prefix = imei[:self.imei_prefix]
+        partition = None
+        last_day = None
+        full = []
+        for record, key in zip(records, keys):
+            day = split_key(key)[0] // DAY_MS
+            if day != last_day:
+                partition = self.partition_for(day, prefix)
+                last_day = day
+            partition.rows.append((imei, key, record))
+            if len(partition.rows) == self.batch_rows:
+                full.append(partition)
+        self.buffered_rows += len(records)
+        return full
+
+    def flush(self, partition: ArchivePartition):
+        rows = partition.rows
+        if not rows:
+            return
+        partition.rows = []
+        partition.pending += 1
+        partition.last_submit = time.monotonic()
+        self.buffered_rows -= len(rows)
+        self.pending_rows += len(rows)
+        future = asyncio.get_running_loop().run_in_executor(self.executor, self.write, partition, rows)
+        future.add_done_callback(lambda future: self.written(future, partition, len(rows)))
+
+    def written(self, future, partition: ArchivePartition, rows: int):
+        partition.pending -= 1
+        self.pending_rows -= rows
+        if future.cancelled():
+            return
+        error = future.exception()
+        if error is not None:
+            self.dropped_records += rows
+            archive_dropped_records_total.inc(rows)
+            logger.error("Gagal menulis %d baris arsip ke %s: %s", rows, partition.directory, error)
+
+    async def maintain(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            now = time.monotonic()
+            for key, partition in list(self.partitions.items()):
+                self.flush(partition)
+                # Partisi yang lama diam dilepas (hari sudah berganti) dan file-nya difinalisasi
+                if not partition.pending and not partition.rows and now - partition.last_submit > self.roll_interval * 2:
+                    del self.partitions[key]
+                    await loop.run_in_executor(self.executor, self.close_all, [partition])
+            # Daftar partisi diambil di event loop: dict partitions hanya diubah di sini dan di partition_for
+            await loop.run_in_executor(self.executor, self.roll, list(self.partitions.values()))
+
+    # --- Berjalan di thread writer ---
+
+    def columns(self, rows):
+        first = rows[0][2]
+        fields = [
+            field for field, value in first.items()
+            if field not in SKIPPED_FIELDS and not isinstance(value, (dict, list))
+        ]
+        timestamps, priorities = zip(*(split_key(key) for _, key, _ in rows))
+        columns = {
+            "imei": [imei for imei, _, _ in rows],
+            "timestamp_ms": list(timestamps),
+            "priority": list(priorities),
+        }
+        for field in fields:
+            columns[field] = [record.get(field) for _, _, record in rows]
+        return columns
+
+    def open(self, partition: ArchivePartition):
+        os.makedirs(partition.directory, exist_ok=True)
+        self.sequence += 1
+        name = f"part-{int(time.time() * 1000)}-{os.getpid()}-{self.sequence:06d}.{self.writer_cls.extension}"
+        partition.final_path = os.path.join(partition.directory, name)
+        partition.tmp_path = os.path.join(partition.directory, f".{name}{TMP_SUFFIX}")
+        partition.writer = self.writer_cls(partition.tmp_path)
+        partition.opened = time.monotonic()
+
+    def finalize(self, partition: ArchivePartition):
+        if partition.writer is None:
+            return
+        writer = partition.writer
+        partition.writer = None
+        writer.close()
+        os.replace(partition.tmp_path, partition.final_path)
+        self.files += 1
+        archive_files_total.inc()
+        logger.debug("File arsip selesai: %s", partition.final_path)
+
+    def write(self, partition: ArchivePartition, rows):
+        start = time.perf_counter()
+        columns = self.columns(rows)
+        if partition.writer is None:
+            self.open(partition)
+        try:
+            partition.writer.write(columns, len(rows))
+        except SchemaChanged as e:
+            logger.info("Skema arsip berubah (%s), file baru dibuka", e)
+            self.finalize(partition)
+            self.open(partition)
+            partition.writer.write(columns, len(rows))
+        if partition.writer.size() >= self.file_size:
+            self.finalize(partition)
+        self.written_records += len(rows)
+        archive_records_total.inc(len(rows))
+        archive_write_seconds.observe(time.perf_counter() - start)
+
+    def roll(self, partitions):
+        now = time.monotonic()
+        self.close_all([
+            partition for partition in partitions
+            if partition.writer is not None and now - partition.opened >= self.roll_interval
+        ])
+
+    def close_all(self, partitions):
+        for partition in partitions:
+            try:
+                self.finalize(partition)
+            except OSError as e:
+                logger.error("Gagal memfinalisasi file arsip %s: %s", partition.tmp_path, e)
+
+    # --- Mode sinkron untuk tool offline (replay), tanpa event loop dan thread writer ---
+
+    def open_sync(self):
+        self.writer_cls = writer_class(self.file_format)
+
+    def submit_sync(self, imei: str, records, keys):
+        for partition in self.buffer(imei, records, keys):
+            rows = partition.rows
+            partition.rows = []
+            self.buffered_rows -= len(rows)
+            self.write(partition, rows)
+
+    def close_sync(self):
+        for partition in self.partitions.values():
+            rows = partition.rows
+            if rows:
+                partition.rows = []
+                self.buffered_rows -= len(rows)
+                self.write(partition, rows)
+        self.close_all(list(self.partitions.values()))
+        self.partitions.clear()
+
+    # ---
+
+    async def stop(self):
+        if not self.enabled:
+            return
+        self.enabled = False
+        if self.task is not None:
+            self.task.cancel()
+            self.task = None
+        partitions = list(self.partitions.values())
+        for partition in partitions:
+            self.flush(partition)
+        # Executor satu thread: close_all berjalan setelah semua batch sebelumnya selesai ditulis
+        await asyncio.get_running_loop().run_in_executor(self.executor, self.close_all, partitions)
+        self.executor.shutdown(wait=True)
+        self.partitions.clear()
+        logger.info("Arsip ditutup: %d record, %d file, %d dibuang", self.written_records, self.files, self.dropped_records)
+
+    def stats(self):
+        return {
+            "archive_records": self.written_records,
+            "archive_dropped": self.dropped_records,
+            "archive_files": self.files,
+            "archive_buffered_rows": self.buffered_rows + self.pending_rows,
+        }
+
+
+archive_sink = ArchiveSink(
+    Config.ARCHIVE_DIR,
+    Config.ARCHIVE_FORMAT,
+    Config.ARCHIVE_IMEI_PREFIX,
+    Config.ARCHIVE_BATCH_ROWS,
+    Config.ARCHIVE_FLUSH_INTERVAL,
+    Config.ARCHIVE_FILE_SIZE,
+    Config.ARCHIVE_ROLL_INTERVAL,
+    Config.ARCHIVE_MAX_PENDING_ROWS,
+)
+
+metrics.gauge(
+    "archive_buffered_rows", "Baris arsip di memori yang belum ditulis ke file",
+    lambda: archive_sink.buffered_rows + archive_sink.pending_rows,
+)
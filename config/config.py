@@ -9,6 +9,101 @@ load_env()
 class Config:
     TCP_SERVER_HOST = os.getenv("TCP_SERVER_HOST", "0.0.0.0")
     TCP_SERVER_PORT = int(os.getenv("TCP_SERVER_PORT", "50000"))
+    TCP_READ_SIZE = int(os.getenv("TCP_READ_SIZE", "65536"))
+    MAX_CONNECTIONS = int(os.getenv("MAX_CONNECTIONS", "20000"))
+    LOGIN_TIMEOUT = float(os.getenv("LOGIN_TIMEOUT", "10"))
+    TCP_IDLE_TIMEOUT = float(os.getenv("TCP_IDLE_TIMEOUT", "20"))
+    FRAME_TIMEOUT = float(os.getenv("FRAME_TIMEOUT", "30"))
+    AVL_MAX_FRAME_SIZE = int(os.getenv("AVL_MAX_FRAME_SIZE", "1048576"))
+    WORKERS = int(os.getenv("WORKERS", "1"))
+    WORKER_RESTART_DELAY = float(os.getenv("WORKER_RESTART_DELAY", "1"))
+    WORKER_RESTART_RESET = float(os.getenv("WORKER_RESTART_RESET", "60"))
+    WORKER_STATS_INTERVAL = float(os.getenv("WORKER_STATS_INTERVAL", "60"))
+    SHUTDOWN_DRAIN_TIMEOUT = float(os.getenv("SHUTDOWN_DRAIN_TIMEOUT", "10"))
+    OFFLOAD_EXECUTOR = os.getenv("OFFLOAD_EXECUTOR", "process").lower()
+    OFFLOAD_WORKERS = int(os.getenv("OFFLOAD_WORKERS", "2"))
+    OFFLOAD_THRESHOLD_BYTES = int(os.getenv("OFFLOAD_THRESHOLD_BYTES", "16384"))
+    DEDUP_ENABLED = os.getenv("DEDUP_ENABLED", "true").lower() in ("1", "true", "yes")
+    DEDUP_TTL = float(os.getenv("DEDUP_TTL", "900"))
+    DEDUP_MAX_PER_DEVICE = int(os.getenv("DEDUP_MAX_PER_DEVICE", "512"))
+    DEDUP_PRUNE_INTERVAL = float(os.getenv("DEDUP_PRUNE_INTERVAL", "30"))
+    DEDUP_SNAPSHOT = os.getenv("DEDUP_SNAPSHOT", "")
+    DEDUP_SNAPSHOT_INTERVAL = float(os.getenv("DEDUP_SNAPSHOT_INTERVAL", "300"))
+    STATE_PUBLISH_MODE = os.getenv("STATE_PUBLISH_MODE", "all").lower()
+    STATE_DEADBANDS = os.getenv("STATE_DEADBANDS", "")
+    STATE_MIN_INTERVAL = float(os.getenv("STATE_MIN_INTERVAL", "0"))
+    STATE_HEARTBEAT_INTERVAL = float(os.getenv("STATE_HEARTBEAT_INTERVAL", "300"))
+    STATE_FORCE_PRIORITY = int(os.getenv("STATE_FORCE_PRIORITY", "1"))
+    STATE_IDLE_TTL = float(os.getenv("STATE_IDLE_TTL", "3600"))
+    FILTER_RULES = os.getenv("FILTER_RULES", "")
+    FILTER_MAX_FUTURE = float(os.getenv("FILTER_MAX_FUTURE", "86400"))
+    FILTER_MIN_TIMESTAMP = os.getenv("FILTER_MIN_TIMESTAMP", "2015-01-01")
+    FILTER_MIN_SATELLITES = int(os.getenv("FILTER_MIN_SATELLITES", "3"))
+    FILTER_MAX_SPEED = float(os.getenv("FILTER_MAX_SPEED", "250"))
+    FILTER_KEEP_PRIORITY = int(os.getenv("FILTER_KEEP_PRIORITY", "2"))
+    FILTER_STATE_TTL = float(os.getenv("FILTER_STATE_TTL", "3600"))
+    GEOFENCE_FILE = os.getenv("GEOFENCE_FILE", "")
+    GEOFENCE_CELL_SIZE = float(os.getenv("GEOFENCE_CELL_SIZE", "0.01"))
+    GEOFENCE_RELOAD_INTERVAL = float(os.getenv("GEOFENCE_RELOAD_INTERVAL", "10"))
+    GEOFENCE_TOPIC_TEMPLATE = os.getenv("GEOFENCE_TOPIC_TEMPLATE", "topic/geofence")
+    GEOFENCE_IDLE_TTL = float(os.getenv("GEOFENCE_IDLE_TTL", "86400"))
+    TRIP_ENABLED = os.getenv("TRIP_ENABLED", "false").lower() in ("1", "true", "yes")
+    TRIP_GAP = float(os.getenv("TRIP_GAP", "600"))
+    TRIP_INTERVAL = float(os.getenv("TRIP_INTERVAL", "3600"))
+    TRIP_LATENESS = float(os.getenv("TRIP_LATENESS", "120"))
+    TRIP_IDLE_TTL = float(os.getenv("TRIP_IDLE_TTL", "7200"))
+    TRIP_TOPIC_TEMPLATE = os.getenv("TRIP_TOPIC_TEMPLATE", "topic/trips")
+    TRAJECTORY_TOLERANCE = float(os.getenv("TRAJECTORY_TOLERANCE", "0"))
+    TRAJECTORY_ANGLE = float(os.getenv("TRAJECTORY_ANGLE", "30"))
+    TRAJECTORY_MAX_POINTS = int(os.getenv("TRAJECTORY_MAX_POINTS", "60"))
+    TRAJECTORY_MAX_INTERVAL = float(os.getenv("TRAJECTORY_MAX_INTERVAL", "300"))
+    TRAJECTORY_MAX_DELAY = float(os.getenv("TRAJECTORY_MAX_DELAY", "30"))
+    ARCHIVE_ENABLED = os.getenv("ARCHIVE_ENABLED", "false").lower() in ("1", "true", "yes")
+    ARCHIVE_DIR = os.getenv("ARCHIVE_DIR", "archive")
+    ARCHIVE_FORMAT = os.getenv("ARCHIVE_FORMAT", "auto").lower()
+    ARCHIVE_IMEI_PREFIX = int(os.getenv("ARCHIVE_IMEI_PREFIX", "4"))
+    ARCHIVE_BATCH_ROWS = int(os.getenv("ARCHIVE_BATCH_ROWS", "5000"))
+    ARCHIVE_FLUSH_INTERVAL = float(os.getenv("ARCHIVE_FLUSH_INTERVAL", "10"))
+    ARCHIVE_FILE_SIZE = int(os.getenv("ARCHIVE_FILE_SIZE", str(128 * 1024 * 1024)))
+    ARCHIVE_ROLL_INTERVAL = float(os.getenv("ARCHIVE_ROLL_INTERVAL", "3600"))
+    ARCHIVE_MAX_PENDING_ROWS = int(os.getenv("ARCHIVE_MAX_PENDING_ROWS", "500000"))
+    CAPTURE_ENABLED = os.getenv("CAPTURE_ENABLED", "false").lower() in ("1", "true", "yes")
+    CAPTURE_DIR = os.getenv("CAPTURE_DIR", "capture")
+    CAPTURE_FILE_SIZE = int(os.getenv("CAPTURE_FILE_SIZE", str(256 * 1024 * 1024)))
+    CAPTURE_ROLL_INTERVAL = float(os.getenv("CAPTURE_ROLL_INTERVAL", "3600"))
+    CAPTURE_BUFFER_SIZE = int(os.getenv("CAPTURE_BUFFER_SIZE", str(1024 * 1024)))
+    CAPTURE_FLUSH_INTERVAL = float(os.getenv("CAPTURE_FLUSH_INTERVAL", "1"))
+    METRICS_HOST = os.getenv("METRICS_HOST", "127.0.0.1")
+    METRICS_PORT = int(os.getenv("METRICS_PORT", "9108"))
+    MAPPING_PROFILE = os.getenv("MAPPING_PROFILE", "default")
+    PAYLOAD_FORMAT = os.getenv("PAYLOAD_FORMAT", "json")
+    PAYLOAD_ENVELOPE = os.getenv("PAYLOAD_ENVELOPE", "auto")
+    PAYLOAD_RAW_MODE = os.getenv("PAYLOAD_RAW_MODE", "full")
+    TIMESTAMP_FORMAT = os.getenv("TIMESTAMP_FORMAT", "iso")
 
     MQTT_HOST = os.getenv("MQTT_HOST", "localhost")
     MQTT_PORT = int(os.getenv("MQTT_PORT", "1883"))
+    MQTT_POOL_SIZE = int(os.getenv("MQTT_POOL_SIZE", "4"))
+    MQTT_TOPIC_TEMPLATE = os.getenv("MQTT_TOPIC_TEMPLATE", "topic/data")
+    MQTT_HEALTH_INTERVAL = float(os.getenv("MQTT_HEALTH_INTERVAL", "30"))
+    MQTT_HEALTH_TOPIC = os.getenv("MQTT_HEALTH_TOPIC", "")
+    MQTT_QUEUE_SIZE = int(os.getenv("MQTT_QUEUE_SIZE", "10000"))
+    MQTT_BATCH_SIZE = int(os.getenv("MQTT_BATCH_SIZE", "500"))
+    MQTT_FLUSH_INTERVAL = float(os.getenv("MQTT_FLUSH_INTERVAL", "0.2"))
+    MQTT_STATS_INTERVAL = float(os.getenv("MQTT_STATS_INTERVAL", "60"))
+    MQTT_PUBLISH_TIMEOUT = float(os.getenv("MQTT_PUBLISH_TIMEOUT", "5"))
+    MQTT_QOS = int(os.getenv("MQTT_QOS", "1"))
+
+    SPOOL_ENABLED = os.getenv("SPOOL_ENABLED", "true").lower() in ("1", "true", "yes")
+    SPOOL_DIR = os.getenv("SPOOL_DIR", "spool")
+    SPOOL_SEGMENT_SIZE = int(os.getenv("SPOOL_SEGMENT_SIZE", str(64 * 1024 * 1024)))
+    SPOOL_FSYNC = os.getenv("SPOOL_FSYNC", "false").lower() in ("1", "true", "yes")
+    SPOOL_REPLAY_BATCH = int(os.getenv("SPOOL_REPLAY_BATCH", "1000"))
+    SPOOL_RETRY_INTERVAL = float(os.getenv("SPOOL_RETRY_INTERVAL", "1"))
+
+    LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+    LOG_LEVELS = os.getenv("LOG_LEVELS", "")
+    DEBUG_IMEIS = os.getenv("DEBUG_IMEIS", "")
+    LOG_RATE_LIMIT_INTERVAL = float(os.getenv("LOG_RATE_LIMIT_INTERVAL", "10"))
+    LOG_RATE_LIMIT_BURST = int(os.getenv("LOG_RATE_LIMIT_BURST", "20"))
+    LOG_SAMPLE_RATE = int(os.getenv("LOG_SAMPLE_RATE", "1"))
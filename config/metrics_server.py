@@ -0,0 +1,52 @@
+import asyncio
+from config.config import Config
+from utils.log import get_logger
+from utils.metrics import metrics
+
+logger = get_logger("server")
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+class MetricsServer:
+    # Endpoint HTTP minimal untuk scrape Prometheus, berjalan di event loop yang sama dengan server TCP
+
+    def __init__(self, registry=metrics):
+        self.registry = registry
+        self.server = None
+
+    async def begin(self, host: str, port: int):
+        self.server = await asyncio.start_server(self.handle, host, port)
+        logger.info("Metrics tersedia di http://%s:%d/metrics", host, port)
+
+    async def handle(self, reader, writer):
+        try:
+            request_line = await asyncio.wait_for(reader.readline(), timeout=5)
+            # Header request dibaca sampai baris kosong lalu diabaikan
+            while True:
+                line = await asyncio.wait_for(reader.readline(), timeout=5)
+                if line in (b"\r\n", b"\n", b""):
+                    break
+            parts = request_line.decode("latin-1").split()
+            if len(parts) >= 2 and parts[0] == "GET" and parts[1].split("?")[0] == "/metrics":
+                status, body = "200 OK", self.registry.render().encode("utf-8")
+            else:
+                status, body = "404 Not Found", b"Not Found\n"
+            writer.write(
+                f"HTTP/1.1 {status}\r\nContent-Type: {CONTENT_TYPE}\r\nContent-Length: {len(body)}\r\n"
+                f"Connection: close\r\n\r\n".encode("latin-1") + body
+            )
+            await writer.drain()
+        except (asyncio.TimeoutError, ConnectionError) as e:
+            logger.debug("Request metrics gagal: %s", e)
+        finally:
+            writer.close()
+
+    async def close(self):
+        if self.server:
+            self.server.close()
+            await self.server.wait_closed()
+            self.server = None
+
+
+metrics_server = MetricsServer()
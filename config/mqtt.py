@@ -1,38 +1,371 @@
 import asyncio
+import logging
+import os
 import time
+import zlib
 import aiomqtt
 from config.config import Config
+from utils.log import get_logger
+from utils.metrics import metrics, serialization_seconds, publish_seconds, publish_failures_total, dropped_records_total
+from utils.serializer import get_serializer
+from utils.spool import SegmentSpool
+from utils.stats import merge_stats
+
+logger = get_logger("mqtt")
 
 class MQTTConnector:
-    def __init__(self):
+    def __init__(self, name="mqtt-0"):
+        self.name = name
         self.host = Config.MQTT_HOST
         self.port = Config.MQTT_PORT
+        # QoS 1: publish baru dianggap berhasil setelah PUBACK broker, bukan saat masuk buffer socket
+        self.qos = Config.MQTT_QOS
         self.client = None  
         self.connected = asyncio.Event()  
+        self.reconnect_task = None
+        self.health_task = None
+        self.last_publish = 0.0
+        self.reconnects = 0
+
+    def start(self):
+        # Koneksi dibuka di background; selama broker belum siap publisher menulis ke spool
+        self.schedule_reconnect()
+        if Config.MQTT_HEALTH_INTERVAL > 0 and self.health_task is None:
+            self.health_task = asyncio.create_task(self.health_check())
+
+    async def stop(self):
+        for task in (self.health_task, self.reconnect_task):
+            if task is not None:
+                task.cancel()
+        self.health_task = self.reconnect_task = None
+        if self.client is not None:
+            try:
+                await self.client.__aexit__(None, None, None)
+            except Exception as e:
+                logger.debug("Gagal menutup koneksi MQTT %s: %s", self.name, e)
+            self.client = None
+        self.connected.clear()
+
+    async def health_check(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            await asyncio.sleep(Config.MQTT_HEALTH_INTERVAL)
+            if not self.connected.is_set():
+                if self.reconnect_task is None or self.reconnect_task.done():
+                    self.schedule_reconnect()
+                continue
+            # Koneksi yang diam dicek dengan publish kecil; gagal publish otomatis memicu reconnect
+            if Config.MQTT_HEALTH_TOPIC and loop.time() - self.last_publish >= Config.MQTT_HEALTH_INTERVAL:
+                await self.publish(Config.MQTT_HEALTH_TOPIC.format(client=self.name), b"1")
+
+    def schedule_reconnect(self):
+        self.connected.clear()
+        if self.reconnect_task is None or self.reconnect_task.done():
+            self.reconnect_task = asyncio.create_task(self.reconnect())
+
+    async def reconnect(self):
+        self.reconnects += 1
+        if self.client is not None:
+            try:
+                await self.client.__aexit__(None, None, None)
+            except Exception as e:
+                logger.debug("Gagal menutup koneksi MQTT lama: %s", e)
+            self.client = None
+        await self.connect()
 
     async def connect(self):
         while True:
             try:
-                self.client = aiomqtt.Client(self.host, port=self.port)
-                await self.client.__aenter__()  
+                client = aiomqtt.Client(self.host, port=self.port)
+                await client.__aenter__()  
+                self.client = client
                 self.connected.set()
-                print(f"Terhubung ke MQTT Broker: {self.host}:{self.port}")
+                logger.info("Terhubung ke MQTT Broker: %s:%d (%s)", self.host, self.port, self.name)
                 return  
             except aiomqtt.MqttError as e:
-                print(f"Gagal terhubung ke MQTT: {e}. Mencoba lagi dalam 5 detik...")
+                logger.warning("Gagal terhubung ke MQTT (%s): %s. Mencoba lagi dalam 5 detik...", self.name, e)
                 self.connected.clear()
                 await asyncio.sleep(5)
 
-    import time  # Tambahkan import ini
-    async def publish(self, topic, payload):
-        await self.connected.wait()  
+    async def publish(self, topic, payload) -> bool:
+        # Tidak menunggu broker: False berarti payload belum terkirim dan harus di-spool
+        if not self.connected.is_set():
+            return False
         try:
-            start_time = time.time()  # Catat waktu sebelum publish
-            await self.client.publish(topic, payload)
-            end_time = time.time()  # Catat waktu setelah publish
-            print(f"Published: {payload} to topic: {topic}")
-            print(f"Time taken to publish: {end_time - start_time} seconds")  # Log waktu yang diambil
+            start_time = time.perf_counter()  # Catat waktu sebelum publish
+            await asyncio.wait_for(self.client.publish(topic, payload, qos=self.qos), Config.MQTT_PUBLISH_TIMEOUT)
+            self.last_publish = asyncio.get_running_loop().time()
+            elapsed = time.perf_counter() - start_time
+            publish_seconds.observe(elapsed)
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug("Published %d bytes to topic: %s in %.6f seconds", len(payload), topic, elapsed)
+            return True
+        except asyncio.TimeoutError:
+            # Broker/koneksi macet: diperlakukan sama dengan MqttError supaya koneksi dibuka ulang
+            logger.warning("Publish ke topic %s melebihi %.1f detik (%s). Menyambung ulang...",
+                           topic, Config.MQTT_PUBLISH_TIMEOUT, self.name)
+            self.schedule_reconnect()
+            return False
         except aiomqtt.MqttError as e:
-            print(f"MQTT error saat publish: {e}")
+            logger.error("MQTT error saat publish (%s): %s. Menyambung ulang...", self.name, e)
+            self.schedule_reconnect()
+            return False
+
+
+class MQTTBatchPublisher:
+    # Antrian terbatas antara koneksi device dan broker; record dari banyak koneksi digabung per topic
+
+    def __init__(self, connector, serializer, spool=None):
+        self.connector = connector
+        self.serializer = serializer
+        self.spool = spool
+        self.spool_ready = asyncio.Event()
+        self.replay_task = None
+        self.queue = asyncio.Queue(maxsize=Config.MQTT_QUEUE_SIZE)
+        self.batch_size = Config.MQTT_BATCH_SIZE
+        self.flush_interval = Config.MQTT_FLUSH_INTERVAL
+        self.task = None
+
+        self.submitted_records = 0
+        self.published_records = 0
+        self.published_messages = 0
+        self.size_flushes = 0
+        self.time_flushes = 0
+        self.blocked_submits = 0
+        self.max_queue_depth = 0
+        self.dropped_messages = 0
+        self.dropped_records = 0
+        self.last_flush_seconds = 0.0
+
+    def start(self):
+        if self.task is None:
+            self.task = asyncio.create_task(self.run())
+            if self.spool is not None:
+                if not self.spool.empty():
+                    self.spool_ready.set()
+                self.replay_task = asyncio.create_task(self.replay())
+
+    async def stop(self):
+        if self.task is None:
+            return
+        # Tunggu antrian kosong sebelum berhenti supaya record yang sudah di-ACK tetap terkirim
+        await self.queue.join()
+        for task in (self.task, self.replay_task):
+            if task is not None:
+                task.cancel()
+        self.task = self.replay_task = None
+        if self.spool is not None:
+            self.spool.close()
+
+    async def submit(self, topic, records):
+        # Menunggu saat antrian penuh: pembacaan socket ikut melambat (backpressure)
+        if self.queue.full():
+            self.blocked_submits += 1
+        await self.queue.put((topic, records))
+        self.submitted_records += len(records)
+        depth = self.queue.qsize()
+        if depth > self.max_queue_depth:
+            self.max_queue_depth = depth
+
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            topic, records = await self.queue.get()
+            batches = {topic: list(records)}
+            count = len(records)
+            taken = 1
+            deadline = loop.time() + self.flush_interval
+            try:
+                while count < self.batch_size:
+                    if self.queue.empty():
+                        timeout = deadline - loop.time()
+                        if timeout <= 0:
+                            break
+                        try:
+                            topic, records = await asyncio.wait_for(self.queue.get(), timeout)
+                        except asyncio.TimeoutError:
+                            break
+                    else:
+                        topic, records = self.queue.get_nowait()
+                    taken += 1
+                    batches.setdefault(topic, []).extend(records)
+                    count += len(records)
+
+                if count >= self.batch_size:
+                    self.size_flushes += 1
+                else:
+                    self.time_flushes += 1
+                await self.flush(batches)
+            except Exception as e:
+                # Consumer shard ini harus tetap hidup: bila mati, antrian penuh dan semua submit() tertahan
+                logger.error("Gagal flush batch MQTT (%s): %s", self.connector.name, e)
+            finally:
+                for _ in range(taken):
+                    self.queue.task_done()
+
+    async def flush(self, batches):
+        start_time = time.perf_counter()
+        for topic, records in batches.items():
+            for i in range(0, len(records), self.batch_size):
+                chunk = records[i:i + self.batch_size]
+                try:
+                    serialize_start = time.perf_counter()
+                    payload = self.serializer.dumps(chunk)
+                    serialization_seconds.observe(time.perf_counter() - serialize_start)
+                    sent = await self.send(topic, payload, len(chunk))
+                except Exception as e:
+                    # Record aneh (gagal serialisasi) atau spool gagal ditulis (disk penuh): chunk ini dibuang
+                    logger.error("Chunk %d record ke topic %s dibuang (%s): %s", len(chunk), topic, self.connector.name, e)
+                    self.drop(len(chunk))
+                    continue
+                if sent:
+                    self.published_records += len(chunk)
+                    self.published_messages += 1
+        if self.spool is not None:
+            try:
+                self.spool.flush()
+            except OSError as e:
+                logger.error("Gagal flush spool (%s): %s", self.connector.name, e)
+        self.last_flush_seconds = time.perf_counter() - start_time
+
+    def drop(self, count: int):
+        self.dropped_messages += 1
+        self.dropped_records += count
+        dropped_records_total.inc(count)
+
+    async def send(self, topic, payload, count: int) -> bool:
+        # Selama spool masih berisi, pesan baru ikut di-spool supaya urutan tetap terjaga
+        if self.spool is not None and not self.spool.empty():
+            self.spool.append(topic, payload)
+            return False
+        if self.spool is None:
+            # Tanpa spool: tunggu broker tersambung (antrian penuh menahan pembacaan device)
+            await self.connector.connected.wait()
+        if await self.connector.publish(topic, payload):
+            return True
+        publish_failures_total.inc()
+        if self.spool is not None:
+            self.spool.append(topic, payload)
+            self.spool_ready.set()
+        else:
+            logger.warning("Publish %d record ke topic %s gagal tanpa spool, dibuang (%s)", count, topic, self.connector.name)
+            self.drop(count)
+        return False
+
+    async def replay(self):
+        while True:
+            await self.spool_ready.wait()
+            await self.connector.connected.wait()
+            if self.spool.empty():
+                self.spool_ready.clear()
+                continue
+            if not self.spool.sealed:
+                self.spool.seal()
+
+            entries = self.spool.read_oldest(Config.SPOOL_REPLAY_BATCH)
+            if not entries:
+                self.spool.release_oldest()
+                continue
+
+            for topic, payload, offset in entries:
+                if not await self.connector.publish(topic, payload):
+                    await asyncio.sleep(Config.SPOOL_RETRY_INTERVAL)
+                    break
+                self.spool.ack(offset)
+            else:
+                logger.debug("Replay spool: %d pesan terkirim, sisa %d bytes", len(entries), self.spool.pending_bytes)
+
+    def stats(self):
+        return {
+            "queue_depth": self.queue.qsize(),
+            "queue_size": self.queue.maxsize,
+            "max_queue_depth": self.max_queue_depth,
+            "submitted_records": self.submitted_records,
+            "published_records": self.published_records,
+            "published_messages": self.published_messages,
+            "size_flushes": self.size_flushes,
+            "time_flushes": self.time_flushes,
+            "blocked_submits": self.blocked_submits,
+            "dropped_messages": self.dropped_messages,
+            "dropped_records": self.dropped_records,
+            "last_flush_seconds": self.last_flush_seconds,
+            "connected": self.connector.connected.is_set(),
+            "reconnects": self.connector.reconnects,
+            **(self.spool.stats() if self.spool is not None else {}),
+        }
+
+
+class MQTTConnectionPool:
+    # N koneksi MQTT; record di-shard berdasarkan hash IMEI sehingga urutan per device tetap terjaga
+
+    def __init__(self, size, topic_template, spool_dir):
+        self.topic_template = topic_template
+        # Spool dibuat saat start(), supaya tiap worker bisa memakai direktori sendiri
+        self.spool_dir = spool_dir
+        self.serializer = get_serializer(Config.PAYLOAD_FORMAT, Config.PAYLOAD_ENVELOPE)
+        self.shards = [
+            MQTTBatchPublisher(MQTTConnector(f"mqtt-{i}"), self.serializer)
+            for i in range(size)
+        ]
+        self.topics = {}
+        self.stats_task = None
+
+    def shard_for(self, imei: str) -> MQTTBatchPublisher:
+        # crc32, bukan hash(): stabil antar proses dan antar restart
+        return self.shards[zlib.crc32(imei.encode("utf-8")) % len(self.shards)]
+
+    def topic_for(self, imei: str) -> str:
+        topic = self.topics.get(imei)
+        if topic is None:
+            topic = self.topics[imei] = self.topic_template.format(imei=imei)
+        return topic
+
+    async def submit(self, imei: str, records, topic: str = None):
+        # topic lain (mis. event geofence) tetap lewat shard IMEI yang sama supaya urutannya terjaga
+        await self.shard_for(imei).submit(topic or self.topic_for(imei), records)
+
+    def start(self):
+        for i, shard in enumerate(self.shards):
+            if Config.SPOOL_ENABLED and shard.spool is None:
+                shard.spool = SegmentSpool(os.path.join(self.spool_dir, f"shard-{i}"), Config.SPOOL_SEGMENT_SIZE, Config.SPOOL_FSYNC)
+            shard.connector.start()
+            shard.start()
+        if Config.MQTT_STATS_INTERVAL > 0 and self.stats_task is None:
+            self.stats_task = asyncio.create_task(self.log_stats())
+
+    async def stop(self):
+        if self.stats_task is not None:
+            self.stats_task.cancel()
+            self.stats_task = None
+        for shard in self.shards:
+            await shard.stop()
+            await shard.connector.stop()
+
+    def stats(self):
+        shards = [shard.stats() for shard in self.shards]
+        total = merge_stats(shards)
+        total["shards"] = shards
+        return total
+
+    async def log_stats(self):
+        while True:
+            await asyncio.sleep(Config.MQTT_STATS_INTERVAL)
+            logger.info("MQTT publisher stats: %s", self.stats())
+
+
+mqtt_pool = MQTTConnectionPool(Config.MQTT_POOL_SIZE, Config.MQTT_TOPIC_TEMPLATE, Config.SPOOL_DIR)
+
 
-mqtt_connector = MQTTConnector()
\ No newline at end of file
+metrics.gauge(
+    "mqtt_queue_depth", "Jumlah batch yang menunggu di antrian publisher per shard",
+    lambda: {str(i): shard.queue.qsize() for i, shard in enumerate(mqtt_pool.shards)}, ("shard",),
+)
+metrics.gauge(
+    "spool_pending_bytes", "Byte yang tersimpan di spool dan belum di-replay per shard",
+    lambda: {str(i): shard.spool.pending_bytes if shard.spool is not None else 0 for i, shard in enumerate(mqtt_pool.shards)},
+    ("shard",),
+)
+metrics.gauge(
+    "mqtt_connected", "1 bila koneksi broker shard tersambung",
+    lambda: {str(i): int(shard.connector.connected.is_set()) for i, shard in enumerate(mqtt_pool.shards)}, ("shard",),
+)
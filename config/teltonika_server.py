@@ -1,22 +1,44 @@
 import asyncio
 from config.config import Config
 from controller.teltonika_server import teltonika_controller
+from utils.log import get_logger
+
+logger = get_logger("server")
 
 
 class TeltonikaServer:
-    async def begin(self):
-        self.server = await asyncio.start_server(teltonika_controller.tcp_callback, Config.TCP_SERVER_HOST, Config.TCP_SERVER_PORT)
+    def __init__(self):
+        self.server = None
+
+    async def begin(self, reuse_port: bool = False):
+        # reuse_port: beberapa worker process mendengarkan port yang sama (SO_REUSEPORT)
+        self.server = await asyncio.start_server(
+            teltonika_controller.tcp_callback, Config.TCP_SERVER_HOST, Config.TCP_SERVER_PORT,
+            reuse_port=reuse_port or None
+        )
 
     async def start_server(self):
         if self.server:
             async with self.server:
-                print(f"Server berjalan di {Config.TCP_SERVER_HOST} dengan port {Config.TCP_SERVER_PORT}")
+                logger.info("Server berjalan di %s dengan port %d", Config.TCP_SERVER_HOST, Config.TCP_SERVER_PORT)
                 await self.server.serve_forever()
 
-    async def close_server(self):
+    async def close_server(self, drain_timeout: float = 0):
         if self.server:
+            # Berhenti menerima koneksi baru, lalu beri waktu koneksi aktif menyelesaikan frame dan ACK
             self.server.close()
+            remaining = await teltonika_controller.registry.drain(drain_timeout)
+            teltonika_controller.registry.stop()
+            if teltonika_controller.capture is not None:
+                teltonika_controller.capture.close()
+            if remaining:
+                logger.warning("%d koneksi masih aktif saat server ditutup.", remaining)
+                # Python 3.13+: tanpa ini wait_closed() menunggu semua koneksi selesai
+                close_clients = getattr(self.server, "close_clients", None)
+                if close_clients is not None:
+                    close_clients()
             await self.server.wait_closed()
+            self.server = None
 
 
 teltonika_server = TeltonikaServer()
@@ -0,0 +1,117 @@
+import asyncio
+from utils.log import get_logger
+
+logger = get_logger("server")
+
+
+class DeviceSession:
+    # Dibuat per koneksi; sengaja kecil karena sebagian besar device diam di antara laporan.
+    # Tidak ada timer/task per koneksi: deadline diperiksa oleh satu sweeper di ConnectionRegistry.
+
+    __slots__ = ("imei", "peer", "writer", "deadline", "in_frame", "busy", "closing", "finished")
+
+    def __init__(self, peer, writer, deadline: float):
+        self.imei = None
+        self.peer = peer
+        self.writer = writer
+        self.deadline = deadline
+        # in_frame: sebagian frame sudah diterima, deadline = batas frame harus lengkap (bukan idle)
+        self.in_frame = False
+        # busy: sedang memproses frame (decode, submit, ACK); sesi tidak ditutup paksa di tengahnya
+        self.busy = False
+        # Alasan penutupan oleh server (login_timeout, idle_timeout, frame_timeout, duplicate, drain)
+        self.closing = None
+        # Future dibuat hanya bila ada sesi baru yang menunggu sesi ini selesai
+        self.finished = None
+
+    def close(self, reason: str):
+        # Sesi yang sedang memproses frame ditutup oleh loop bacanya sendiri setelah ACK terkirim
+        if self.closing is None:
+            self.closing = reason
+        if not self.busy:
+            self.writer.close()
+
+    def done(self):
+        if self.finished is not None and not self.finished.done():
+            self.finished.set_result(None)
+
+
+class ConnectionRegistry:
+    # Admission control, indeks sesi per IMEI, dan satu sweeper untuk semua deadline koneksi
+
+    def __init__(self, max_connections: int = 0, sweep_interval: float = 1.0):
+        self.max_connections = max_connections
+        self.sweep_interval = sweep_interval
+        # Semua koneksi, termasuk yang belum login
+        self.connections = set()
+        self.sessions = {}
+        self.draining = False
+        self.sweeper = None
+
+    def __len__(self):
+        return len(self.sessions)
+
+    def admit(self, peer, writer, login_timeout: float):
+        if self.draining or (self.max_connections and len(self.connections) >= self.max_connections):
+            return None
+        if self.sweeper is None:
+            self.sweeper = asyncio.create_task(self.sweep())
+        session = DeviceSession(peer, writer, asyncio.get_running_loop().time() + login_timeout)
+        self.connections.add(session)
+        return session
+
+    async def register(self, session: DeviceSession, imei: str, timeout: float):
+        # Device yang reconnect menggantikan sesi lamanya. Bila sesi lama masih memproses frame,
+        # tunggu sampai selesai supaya urutan record per IMEI tetap terjaga.
+        session.imei = imei
+        old = self.sessions.get(imei)
+        self.sessions[imei] = session
+        if old is None:
+            return
+        logger.info("Sesi ganda IMEI %s: koneksi lama %s ditutup, diganti %s", imei, old.peer, session.peer)
+        if old.busy:
+            if old.finished is None:
+                old.finished = asyncio.get_running_loop().create_future()
+            old.close("duplicate")
+            try:
+                await asyncio.wait_for(asyncio.shield(old.finished), timeout)
+            except asyncio.TimeoutError:
+                logger.warning("Sesi lama IMEI %s tidak selesai dalam %.1f detik.", imei, timeout)
+        else:
+            old.close("duplicate")
+
+    def unregister(self, session: DeviceSession):
+        self.connections.discard(session)
+        if session.imei is not None and self.sessions.get(session.imei) is session:
+            del self.sessions[session.imei]
+        session.done()
+
+    async def sweep(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            await asyncio.sleep(self.sweep_interval)
+            now = loop.time()
+            for session in [session for session in self.connections if session.deadline <= now and not session.busy and session.closing is None]:
+                if session.imei is None:
+                    reason = "login_timeout"
+                elif session.in_frame:
+                    reason = "frame_timeout"
+                else:
+                    reason = "idle_timeout"
+                session.close(reason)
+
+    async def drain(self, timeout: float) -> int:
+        # Tolak koneksi baru, tutup sesi yang diam, tunggu frame yang sedang diproses selesai dan di-ACK
+        self.draining = True
+        for session in list(self.connections):
+            session.close("drain")
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        while self.connections and loop.time() < deadline:
+            await asyncio.sleep(0.05)
+        return len(self.connections)
+
+    def stop(self):
+        if self.sweeper is not None:
+            self.sweeper.cancel()
+            self.sweeper = None
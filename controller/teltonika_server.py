@@ -1,51 +1,178 @@
 import asyncio
 import struct
+from config.config import Config
 from service.teltonika_server import TeltonikaHandler
+from controller.connection_registry import ConnectionRegistry
+from utils.capture import FrameCapture
+from utils.frame_assembler import AVLFrameAssembler, FrameError
+from utils.log import get_logger, device_debug
+from utils.metrics import (
+    metrics, connections_total, bytes_received_total, frame_errors_total, connection_events_total,
+    captured_frames_total, capture_bytes_total,
+)
+
+logger = get_logger("server")
+framing_logger = get_logger("framing")
+
+FRAMING_ERRORS = frame_errors_total.labels("framing")
+CONNECTION_EVENTS = {event: connection_events_total.labels(event) for event, in connection_events_total.children}
+
+# IMEI Teltonika 15 digit; batas longgar untuk menolak login sampah tanpa membaca ribuan byte
+MAX_IMEI_LENGTH = 32
 
 
 class TeltonikaServerController:
 
     def __init__(self):
         self.teltonika_handler = TeltonikaHandler()  
+        self.registry = ConnectionRegistry(Config.MAX_CONNECTIONS)
+        self.capture = FrameCapture(
+            Config.CAPTURE_DIR, Config.CAPTURE_FILE_SIZE, Config.CAPTURE_ROLL_INTERVAL,
+            Config.CAPTURE_BUFFER_SIZE, Config.CAPTURE_FLUSH_INTERVAL,
+        ) if Config.CAPTURE_ENABLED else None
+
+    @property
+    def active_connections(self) -> int:
+        return len(self.registry.connections)
+
+    async def read_login(self, reader) -> str:
+        imei_length = int.from_bytes(await reader.readexactly(2), byteorder="big")
+        if not 0 < imei_length <= MAX_IMEI_LENGTH:
+            raise ValueError(f"panjang IMEI {imei_length}")
+        return (await reader.readexactly(imei_length)).decode("ascii")
 
     async def tcp_callback(self, reader, writer):
         addr = writer.get_extra_info('peername')
-        print(f"Koneksi dari {addr}")
+        # Login dibatasi waktu supaya klien yang tidak pernah mengirim IMEI tidak menahan slot koneksi
+        session = self.registry.admit(addr, writer, Config.LOGIN_TIMEOUT)
+        if session is None:
+            CONNECTION_EVENTS["rejected"].inc()
+            logger.warning("Koneksi dari %s ditolak: batas %d koneksi tercapai atau server sedang berhenti.", addr, Config.MAX_CONNECTIONS)
+            writer.close()
+            return
+        logger.info("Koneksi dari %s", addr)
+        connections_total.inc()
+        imei_str = None
 
         try:
-            imei_length = await reader.readexactly(2)
-            imei = await reader.readexactly(int.from_bytes(imei_length, byteorder="big"))
-            imei_str = imei.decode("utf-8")
-            print(f"IMEI: {imei_str}")
+            try:
+                imei_str = await self.read_login(reader)
+            except (ValueError, UnicodeDecodeError) as e:
+                CONNECTION_EVENTS["invalid_login"].inc()
+                logger.warning("Login tidak valid dari %s: %s", addr, e)
+                writer.write(b'\x00')
+                return
+            logger.info("IMEI: %s (%s)", imei_str, addr)
+
+            await self.registry.register(session, imei_str, Config.LOGIN_TIMEOUT)
             writer.write(b'\x01')
             await writer.drain()
-            while True:
+
+            loop = asyncio.get_running_loop()
+            session.deadline = loop.time() + Config.TCP_IDLE_TIMEOUT
+            frame_assembler = AVLFrameAssembler(Config.AVL_MAX_FRAME_SIZE)
+            while session.closing is None:
                 try:
-                    raw_data = await asyncio.wait_for(reader.read(2048), timeout=20)
-                    if not raw_data:
-                        print("Tidak ada data setelah IMEI!")
-                        break
-                    
-                    num_data_1 = await self.teltonika_handler.handle_raw_data(raw_data, imei_str, writer)
-
-                    if num_data_1 is not None:
-                        ack_response = struct.pack(">I", num_data_1)
-                        writer.write(ack_response)
-                        await writer.drain()
-                        print(f"ACK dikirim dengan nilai: {num_data_1}")
-                    else:
-                        print("Data tidak valid, tidak mengirimkan ACK.")
+                    # Tanpa wait_for per read: idle/frame timeout ditegakkan sweeper registry
+                    chunk = await reader.read(Config.TCP_READ_SIZE)
+                    if not chunk:
+                        if frame_assembler.pending():
+                            framing_logger.warning("Koneksi ditutup dengan %d bytes frame belum lengkap (IMEI: %s).", frame_assembler.pending(), imei_str)
+                        if session.closing is None:
+                            logger.info("Tidak ada data setelah IMEI! (%s)", imei_str)
                         break
 
-                except asyncio.TimeoutError:
-                    print(f"Timeout: Tidak ada data diterima dari {addr} dalam waktu yang ditentukan.")
+                    bytes_received_total.inc(len(chunk))
+                    frame_assembler.feed(chunk)
+                    chunk = None  # jangan tahan chunk terakhir selama koneksi diam
+                    session.busy = True
+                    try:
+                        if not await self.process_frames(frame_assembler, imei_str, writer):
+                            break
+                    finally:
+                        session.busy = False
+                    frame_assembler.trim()
+
+                    # Frame yang sudah mulai diterima harus lengkap dalam FRAME_TIMEOUT (slow-loris),
+                    # koneksi tanpa frame tertunda cukup dibatasi idle timeout
+                    if not frame_assembler.pending():
+                        session.in_frame = False
+                        session.deadline = loop.time() + Config.TCP_IDLE_TIMEOUT
+                    elif not session.in_frame:
+                        session.in_frame = True
+                        session.deadline = loop.time() + Config.FRAME_TIMEOUT
+
+                except FrameError as e:
+                    FRAMING_ERRORS.inc()
+                    framing_logger.warning("Frame tidak valid dari %s: %s", addr, e)
                     break
 
         except asyncio.IncompleteReadError:
-            print(f"Data tidak lengkap dari {addr}. Koneksi ditutup.")
+            if session.closing is None:
+                logger.info("Data tidak lengkap dari %s. Koneksi ditutup.", addr)
+        except ConnectionError as e:
+            logger.info("Koneksi %s terputus: %s", addr, e)
         finally:
-            print(f"Koneksi dari {addr} ditutup\n")
+            if session.closing in CONNECTION_EVENTS:
+                CONNECTION_EVENTS[session.closing].inc()
+            if session.closing == "frame_timeout":
+                framing_logger.warning("Frame dari %s (IMEI: %s) tidak lengkap dalam %.0f detik.", addr, imei_str, Config.FRAME_TIMEOUT)
+            elif session.closing is not None:
+                logger.info("Koneksi dari %s (IMEI: %s) ditutup server: %s", addr, imei_str, session.closing)
+            self.registry.unregister(session)
+            logger.info("Koneksi dari %s ditutup", addr)
             writer.close()
-            await writer.wait_closed()
+            try:
+                await writer.wait_closed()
+            except ConnectionError:
+                pass
+
+    async def process_frames(self, frame_assembler, imei_str, writer) -> bool:
+        capture = self.capture
+        for frame in frame_assembler.frames():
+            with frame:
+                if capture is not None:
+                    # Disimpan sebelum decode, termasuk frame yang nanti gagal CRC/decode
+                    if capture.append(imei_str, frame):
+                        captured_frames_total.inc()
+                        capture_bytes_total.inc(len(frame))
+                num_data_1 = await self.teltonika_handler.handle_raw_data(frame, imei_str, writer)
+
+            if num_data_1 is not None:
+                ack_response = struct.pack(">I", num_data_1)
+                writer.write(ack_response)
+                await writer.drain()
+                device_debug(framing_logger, imei_str, "ACK dikirim dengan nilai: %d", num_data_1)
+            else:
+                framing_logger.warning("Data tidak valid, tidak mengirimkan ACK (IMEI: %s).", imei_str)
+                return False
+        return True
+
+teltonika_controller = TeltonikaServerController()
 
-teltonika_controller = TeltonikaServerController()
\ No newline at end of file
+metrics.gauge("active_connections", "Koneksi device yang sedang terbuka", lambda: teltonika_controller.active_connections)
+metrics.gauge("device_sessions", "Sesi device yang sudah login (unik per IMEI)", lambda: len(teltonika_controller.registry))
+metrics.gauge(
+    "dedup_entries", "Key record di indeks dedup",
+    lambda: teltonika_controller.teltonika_handler.dedup.entries if teltonika_controller.teltonika_handler.dedup is not None else 0,
+)
+metrics.gauge(
+    "state_devices", "IMEI yang state terakhirnya disimpan untuk publish change-only",
+    lambda: len(teltonika_controller.teltonika_handler.state_cache) if teltonika_controller.teltonika_handler.state_cache is not None else 0,
+)
+metrics.gauge(
+    "geofence_zones", "Zona geofence yang sedang aktif",
+    lambda: len(teltonika_controller.teltonika_handler.geofence) if teltonika_controller.teltonika_handler.geofence is not None else 0,
+)
+metrics.gauge(
+    "geofence_devices", "IMEI yang state masuk/keluar geofence-nya disimpan",
+    lambda: len(teltonika_controller.teltonika_handler.geofence.devices) if teltonika_controller.teltonika_handler.geofence is not None else 0,
+)
+metrics.gauge(
+    "trip_devices", "IMEI dengan state agregasi trip/interval",
+    lambda: len(teltonika_controller.teltonika_handler.trips) if teltonika_controller.teltonika_handler.trips is not None else 0,
+)
+metrics.gauge(
+    "trajectory_devices", "IMEI dengan state penyederhanaan lintasan",
+    lambda: len(teltonika_controller.teltonika_handler.trajectory) if teltonika_controller.teltonika_handler.trajectory is not None else 0,
+)
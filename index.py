@@ -1,7 +1,19 @@
 import asyncio
 import logging
+import multiprocessing
+import os
+import queue
+import signal
+import time
+from multiprocessing.connection import wait
+from config.config import Config
 from config.teltonika_server import teltonika_server
-from config.mqtt import mqtt_connector
+from controller.teltonika_server import teltonika_controller
+from config.mqtt import mqtt_pool
+from config.archive import archive_sink
+from config.metrics_server import metrics_server
+from utils.log import setup_logging
+from utils.stats import merge_stats
 
 # Configure logging
 logging.basicConfig(
@@ -13,18 +25,191 @@ logging.basicConfig(
     ]
 )
 
+setup_logging()
+
 logger = logging.getLogger(__name__)
 
-async def main():
+
+def worker_stats():
+    stats = mqtt_pool.stats()
+    stats.pop("shards", None)
+    stats["active_connections"] = teltonika_controller.active_connections
+    stats["inline_frames"] = teltonika_controller.teltonika_handler.inline_frames
+    stats["offloaded_frames"] = teltonika_controller.teltonika_handler.offloaded_frames
+    stats["duplicate_records"] = teltonika_controller.teltonika_handler.duplicate_records
+    stats["suppressed_records"] = teltonika_controller.teltonika_handler.suppressed_records
+    stats["filtered_records"] = teltonika_controller.teltonika_handler.filtered_records
+    trajectory = teltonika_controller.teltonika_handler.trajectory
+    stats["simplified_records"] = trajectory.dropped if trajectory is not None else 0
+    stats.update(archive_sink.stats())
+    return stats
+
+
+async def report_stats(worker_id, stats_queue):
+    while True:
+        await asyncio.sleep(Config.WORKER_STATS_INTERVAL)
+        try:
+            stats_queue.put_nowait((worker_id, worker_stats()))
+        except queue.Full:
+            pass
+
+
+async def main(worker_id=None, stats_queue=None):
+    stop_event = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(sig, stop_event.set)
+        except (NotImplementedError, RuntimeError):
+            pass
+
     try:
-        logger.info("Starting Teltonika Server...")
-        await mqtt_connector.connect()
-        await teltonika_server.begin()
-        await teltonika_server.start_server()
+        logger.info("Starting Teltonika Server%s...", f" (worker {worker_id}, pid {os.getpid()})" if worker_id is not None else "")
+        if worker_id is not None:
+            mqtt_pool.spool_dir = os.path.join(Config.SPOOL_DIR, f"worker-{worker_id}")
+            if teltonika_controller.capture is not None:
+                # Direktori capture per worker: file aktif worker lain tidak ikut ditutup saat start
+                teltonika_controller.capture.directory = os.path.join(Config.CAPTURE_DIR, f"worker-{worker_id}")
+        mqtt_pool.start()
+        teltonika_controller.teltonika_handler.start(worker_id)
+        if Config.ARCHIVE_ENABLED:
+            archive_sink.start()
+        if Config.METRICS_PORT > 0:
+            # Mode multi-worker: tiap worker punya port metrics sendiri (METRICS_PORT + worker_id)
+            await metrics_server.begin(Config.METRICS_HOST, Config.METRICS_PORT + (worker_id or 0))
+        await teltonika_server.begin(reuse_port=worker_id is not None)
+        server_task = asyncio.create_task(teltonika_server.start_server())
+        stats_task = asyncio.create_task(report_stats(worker_id, stats_queue)) if stats_queue is not None else None
+
+        stop_task = asyncio.create_task(stop_event.wait())
+
+        await asyncio.wait((server_task, stop_task), return_when=asyncio.FIRST_COMPLETED)
+        logger.info("Menghentikan server, menunggu koneksi dan antrian MQTT selesai...")
+        await teltonika_server.close_server(Config.SHUTDOWN_DRAIN_TIMEOUT)
+        for task in (server_task, stats_task, stop_task):
+            if task is not None:
+                task.cancel()
+        await teltonika_controller.teltonika_handler.flush()
+        await mqtt_pool.stop()
+        await archive_sink.stop()
+        teltonika_controller.teltonika_handler.close()
+        await metrics_server.close()
     except KeyboardInterrupt:
         logger.info("System stopped by user")
     except Exception as e:
         logger.error(f"Error occurred: {e}", exc_info=True)
 
+
+def run_worker(worker_id, stats_queue):
+    asyncio.run(main(worker_id, stats_queue))
+
+
+class WorkerSupervisor:
+    # Menjalankan N worker process yang berbagi port lewat SO_REUSEPORT
+
+    def __init__(self, count):
+        self.count = count
+        self.context = multiprocessing.get_context("spawn")
+        self.stats_queue = self.context.Queue(maxsize=count * 16)
+        self.workers = {}
+        self.restarts = {}
+        # Crash beruntun per worker (dasar backoff) dan kapan worker yang crash boleh dijalankan lagi
+        self.crashes = {}
+        self.started = {}
+        self.next_spawn_at = {}
+        self.worker_stats = {}
+        self.stopping = False
+
+    def spawn(self, worker_id):
+        process = self.context.Process(
+            target=run_worker, args=(worker_id, self.stats_queue), name=f"teltonika-worker-{worker_id}", daemon=False
+        )
+        process.start()
+        self.workers[worker_id] = process
+        self.started[worker_id] = time.monotonic()
+        logger.info("Worker %d dijalankan (pid %d)", worker_id, process.pid)
+
+    def stop(self, *_):
+        self.stopping = True
+
+    def run(self):
+        signal.signal(signal.SIGINT, self.stop)
+        signal.signal(signal.SIGTERM, self.stop)
+        for worker_id in range(self.count):
+            self.spawn(worker_id)
+
+        next_report = time.monotonic() + Config.WORKER_STATS_INTERVAL
+        while not self.stopping:
+            sentinels = {process.sentinel: worker_id for worker_id, process in self.workers.items()}
+            timeout = 1.0
+            if self.next_spawn_at:
+                timeout = max(0.0, min(timeout, min(self.next_spawn_at.values()) - time.monotonic()))
+            for sentinel in wait(list(sentinels), timeout=timeout):
+                worker_id = sentinels[sentinel]
+                process = self.workers.pop(worker_id)
+                process.join()
+                if self.stopping:
+                    break
+                self.schedule_restart(worker_id, process.exitcode)
+            if self.stopping:
+                break
+
+            now = time.monotonic()
+            for worker_id in [worker_id for worker_id, at in self.next_spawn_at.items() if at <= now]:
+                del self.next_spawn_at[worker_id]
+                self.spawn(worker_id)
+
+            self.collect_stats()
+            if time.monotonic() >= next_report:
+                next_report = time.monotonic() + Config.WORKER_STATS_INTERVAL
+                logger.info("Worker stats: %s", self.stats())
+
+        self.shutdown()
+
+    def schedule_restart(self, worker_id, exitcode):
+        # Backoff naik per crash beruntun, dan direset bila worker sempat hidup cukup lama. Loop supervisor
+        # tidak tidur di sini: worker lain yang mati tetap dijalankan ulang dan stats tetap dikumpulkan.
+        self.restarts[worker_id] = self.restarts.get(worker_id, 0) + 1
+        uptime = time.monotonic() - self.started.get(worker_id, 0.0)
+        crashes = 1 if uptime >= Config.WORKER_RESTART_RESET else self.crashes.get(worker_id, 0) + 1
+        self.crashes[worker_id] = crashes
+        delay = min(Config.WORKER_RESTART_DELAY * crashes, 30)
+        self.next_spawn_at[worker_id] = time.monotonic() + delay
+        logger.error("Worker %d berhenti (exit code %s) setelah %.0f detik, dijalankan ulang dalam %.1f detik.",
+                     worker_id, exitcode, uptime, delay)
+
+    def collect_stats(self):
+        while True:
+            try:
+                worker_id, stats = self.stats_queue.get_nowait()
+            except queue.Empty:
+                return
+            self.worker_stats[worker_id] = stats
+
+    def stats(self):
+        total = merge_stats(self.worker_stats.values())
+        total["workers"] = sum(1 for process in self.workers.values() if process.is_alive())
+        total["worker_restarts"] = sum(self.restarts.values())
+        return total
+
+    def shutdown(self):
+        logger.info("Menghentikan %d worker...", len(self.workers))
+        for process in self.workers.values():
+            if process.is_alive():
+                process.terminate()
+        deadline = time.monotonic() + Config.SHUTDOWN_DRAIN_TIMEOUT + 10
+        for worker_id, process in self.workers.items():
+            process.join(max(0, deadline - time.monotonic()))
+            if process.is_alive():
+                logger.warning("Worker %d tidak berhenti tepat waktu, di-kill.", worker_id)
+                process.kill()
+                process.join()
+        self.collect_stats()
+        logger.info("Worker stats terakhir: %s", self.stats())
+
+
 if __name__ == "__main__":
-    asyncio.run(main())
\ No newline at end of file
+    if Config.WORKERS > 1:
+        WorkerSupervisor(Config.WORKERS).run()
+    else:
+        asyncio.run(main())
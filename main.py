@@ -1,30 +1,15 @@
 import asyncio
 import binascii
+import logging
 import struct
 from datetime import datetime, timezone
 import json
 from mqtt import mqtt_connector
+from utils.crc import CRC16ARC
+from utils.log import get_logger
 from typing import Dict, Any
 
-
-class CRC16ARC:
-    def __init__(self, polynomial=0xA001, initial_value=0x0000, final_xor=0x0000):
-        self.polynomial = polynomial
-        self.initial_value = initial_value
-        self.final_xor = final_xor
-
-    async def compute_crc(self, data: bytes) -> int:
-        crc = self.initial_value
-        for byte in data:
-            crc ^= byte
-            for _ in range(8):
-                crc = (crc >> 1) ^ (self.polynomial if crc & 1 else 0)
-            await asyncio.sleep(0)
-        return crc ^ self.final_xor
-
-    async def verify_crc(self, data: bytes, expected_crc: int) -> bool:
-        calculated_crc = await self.compute_crc(data)
-        return calculated_crc == expected_crc
+logger = get_logger("legacy")
 
 
 class TeltonikaRawReader:
@@ -36,17 +21,17 @@ class TeltonikaRawReader:
 
 
     async def parse_avl_datacodec8(self, avl_content, num_data_1, imei, crc_data, crc_received):
-        if not await self.crc.verify_crc(crc_data, crc_received):
-            print(" CRC tidak valid untuk Codec 8.")
+        if not self.crc.verify(crc_data, crc_received):
+            logger.warning("CRC tidak valid untuk Codec 8.")
             return
-        print("CRC valid untuk Codec 8.")
+        logger.debug("CRC valid untuk Codec 8.")
 
 
         payload = []
         offset = 0
         for i in range(num_data_1):
             if offset + 26 > len(avl_content):
-                print(f"Data AVL ke-{i+1} tidak lengkap, berhenti parsing.")
+                logger.warning("Data AVL ke-%d tidak lengkap, berhenti parsing.", i + 1)
                 break
 
             timestamp_raw = struct.unpack(">Q", avl_content[offset:offset+8])[0]
@@ -60,13 +45,10 @@ class TeltonikaRawReader:
             satellites = avl_content[offset+21]
             speed = struct.unpack(">H", avl_content[offset+22:offset+24])[0]
 
-            print(f"\nRecord {i+1} (IMEI: {imei}):")
-            print(f"  Latitude: {latitude}")
-            print(f"  Longitude: {longitude}")
-            print(f"  Altitude: {altitude} m")
-            print(f"  Angle: {angle}°")
-            print(f"  Satellites: {satellites}")
-            print(f"  Speed: {speed} km/h")
+            logger.debug(
+                "Record %d (IMEI: %s): Latitude: %s, Longitude: %s, Altitude: %s m, Angle: %s°, Satellites: %s, Speed: %s km/h",
+                i + 1, imei, latitude, longitude, altitude, angle, satellites, speed
+            )
 
             data_record = {
             "imei": imei,
@@ -87,10 +69,10 @@ class TeltonikaRawReader:
    
     async def parse_avl_data_codec8e(self, avl_content, num_data_1, imei, crc_data, crc_received):
         try:
-            if not await self.crc.verify_crc(crc_data, crc_received):
-                print("CRC tidak valid untuk Codec 8 Extended.")
+            if not self.crc.verify(crc_data, crc_received):
+                logger.warning("CRC tidak valid untuk Codec 8 Extended.")
                 return
-            print("CRC valid untuk Codec 8 Extended.")
+            logger.debug("CRC valid untuk Codec 8 Extended.")
 
             idx = 0
             payload = []  
@@ -175,38 +157,27 @@ class TeltonikaRawReader:
                 payload.append(data_record)
 
 
-                print(f"\nExtended Record {i+1} (IMEI: {imei})")
-                print(f"  Timestamp (UTC): {timestamp}")
-                print(f"  Latitude: {latitude}")
-                print(f"  Longitude: {longitude}")
-                print(f"  Altitude: {altitude} m")
-                print(f"  Angle: {angle}°")
-                print(f"  Satellites: {satellites}")
-                print(f"  Speed: {speed} km/h")
-                print(f"  Event IO ID: {event_io_id}")
-                print(f"  Total IO Elements: {total_io}")
-                for io_type in ["1B", "2B", "4B", "8B"]:
-                    for io in data_record["io_data"]:
-                        if io_type in io:
-                            for item in io[io_type]:
-                                print(f"    IO ID: {item['io_id']}, Value: {item['value']}")
-                for nx_item in data_record["nx_data"]:
-                    print(f"    NX IO ID: {nx_item['io_id']}, Value: {nx_item['value']} (Length: {nx_item['length']})")
+                logger.debug(
+                    "Extended Record %d (IMEI: %s): Timestamp (UTC): %s, Latitude: %s, Longitude: %s, Altitude: %s m, "
+                    "Angle: %s°, Satellites: %s, Speed: %s km/h, Event IO ID: %s, Total IO Elements: %s, IO: %s, NX: %s",
+                    i + 1, imei, timestamp, latitude, longitude, altitude, angle, satellites, speed,
+                    event_io_id, total_io, data_record["io_data"], data_record["nx_data"]
+                )
 
             return payload
 
         except Exception as e:
-            print(f" Error saat parsing Codec 8 Extended: {e}")
+            logger.error("Error saat parsing Codec 8 Extended: %s", e)
 
     async def handle_client(self, reader, writer):
         addr = writer.get_extra_info('peername')
-        print(f"\nKoneksi dari {addr}")
+        logger.info("Koneksi dari %s", addr)
 
         try:
             imei_length = await reader.readexactly(2)
             imei = await reader.readexactly(int.from_bytes(imei_length, byteorder="big"))
             imei_str = imei.decode("utf-8")
-            print(f"IMEI: {imei_str}")
+            logger.info("IMEI: %s", imei_str)
 
             writer.write(b'\x01')
             await writer.drain()
@@ -214,15 +185,15 @@ class TeltonikaRawReader:
             while True:
                 raw_data = await reader.read(2048)
                 if not raw_data:
-                    print("Tidak ada data setelah IMEI!")
+                    logger.info("Tidak ada data setelah IMEI!")
                     break
 
-                print("\nData diterima (hex):")
-                print(binascii.hexlify(raw_data).decode())
+                if logger.isEnabledFor(logging.DEBUG):
+                    logger.debug("Data diterima (hex): %s", binascii.hexlify(raw_data).decode())
 
                 if len(raw_data) >= 8:
                     data_field_length = struct.unpack(">I", raw_data[4:8])[0]
-                    print(f"\nData Field Length: {data_field_length} bytes")
+                    logger.debug("Data Field Length: %d bytes", data_field_length)
 
                     avl_data = raw_data[8:]
                     if len(avl_data) >= data_field_length:
@@ -231,10 +202,10 @@ class TeltonikaRawReader:
                         num_data_2 = avl_data[-5]
                         crc_received = struct.unpack(">I", avl_data[-4:])[0]
 
-                        print(f"Codec ID: {hex(codec_id)}")
-                        print(f"Number of Data 1: {num_data_1}")
-                        print(f"Number of Data 2: {num_data_2}")
-                        print(f"CRC Diterima: {hex(crc_received)}")
+                        logger.debug(
+                            "Codec ID: %#x, Number of Data 1: %d, Number of Data 2: %d, CRC Diterima: %#x",
+                            codec_id, num_data_1, num_data_2, crc_received
+                        )
 
                         avl_content = avl_data[2:-5]
                         crc_data = avl_data[:-4]
@@ -244,7 +215,7 @@ class TeltonikaRawReader:
                         elif codec_id == 0x8E:
                             task = asyncio.create_task(self.parse_avl_data_codec8e(avl_content, num_data_1, imei_str, crc_data, crc_received))                       
                         else:
-                            print(f"Codec ID {hex(codec_id)} tidak dikenali.")
+                            logger.warning("Codec ID %#x tidak dikenali.", codec_id)
 
                         parsed_data = await task
                         mqtt_payload = []
@@ -257,16 +228,16 @@ class TeltonikaRawReader:
 
                         ack_response = struct.pack(">I", num_data_1)
                         writer.write(ack_response)
-                        print( num_data_1)
+                        logger.debug("ACK dikirim dengan nilai: %d", num_data_1)
                         await writer.drain()
                     else:
-                        print("Data AVL tidak cukup panjang!")
+                        logger.warning("Data AVL tidak cukup panjang!")
         except asyncio.IncompleteReadError:
-            print(f"Data tidak lengkap dari {addr}. Koneksi ditutup.")
+            logger.info("Data tidak lengkap dari %s. Koneksi ditutup.", addr)
         except Exception as e:
-            print(f"Error: {e}")
+            logger.error("Error: %s", e)
 
-        print(f"Koneksi dari {addr} ditutup\n")
+        logger.info("Koneksi dari %s ditutup", addr)
         writer.close()
         await writer.wait_closed()
     
@@ -313,7 +284,7 @@ class TeltonikaRawReader:
         await mqtt_connector.connect()
         server = await asyncio.start_server(self.handle_client, self.host, self.port)
         addr = server.sockets[0].getsockname()
-        print(f"Server berjalan di {addr}")
+        logger.info("Server berjalan di %s", addr)
         async with server:
             await server.serve_forever()
 
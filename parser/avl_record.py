@@ -0,0 +1,75 @@
+from datetime import datetime, timezone
+
+IO_TYPES = ("1B", "2B", "4B", "8B")
+
+
+class AVLRecord:
+    # Satu record AVL; semua IO element disimpan flat dalam dict io_id -> value. io_groups menyimpan
+    # pasangan (io_id, value) per grup 1B/2B/4B/8B apa adanya (termasuk io_id yang muncul dua kali)
+
+    __slots__ = (
+        "imei",
+        "timestamp_ms",
+        "priority",
+        "latitude",
+        "longitude",
+        "altitude",
+        "angle",
+        "satellites",
+        "speed",
+        "event_io_id",
+        "total_io",
+        "io",
+        "io_groups",
+        "nx",
+    )
+
+    def __init__(self, imei, timestamp_ms, priority, longitude, latitude, altitude, angle, satellites, speed,
+                 event_io_id, total_io, io, io_groups, nx=None):
+        self.imei = imei
+        self.timestamp_ms = timestamp_ms
+        self.priority = priority
+        self.longitude = longitude
+        self.latitude = latitude
+        self.altitude = altitude
+        self.angle = angle
+        self.satellites = satellites
+        self.speed = speed
+        self.event_io_id = event_io_id
+        self.total_io = total_io
+        self.io = io
+        self.io_groups = io_groups
+        self.nx = nx
+
+    @property
+    def timestamp(self) -> str:
+        return datetime.fromtimestamp(self.timestamp_ms / 1000, tz=timezone.utc).isoformat()
+
+    def get(self, io_id, default=0):
+        return self.io.get(io_id, default)
+
+    def to_dict(self, epoch_ms: bool = False):
+        # Bentuk dict lama (io_data per grup 1B/2B/4B/8B), hanya untuk JSON legacy
+        io_data = [
+            {io_type: [{"io_id": io_id, "value": value} for io_id, value in group]}
+            for io_type, group in zip(IO_TYPES, self.io_groups)
+        ]
+        data_record = {
+            "imei": self.imei,
+            "timestamp": self.timestamp_ms if epoch_ms else self.timestamp,
+            "latitude": self.latitude,
+            "longitude": self.longitude,
+            "altitude": self.altitude,
+            "angle": self.angle,
+            "satellites": self.satellites,
+            "speed": self.speed,
+            "event_io_id": self.event_io_id,
+            "total_io": self.total_io,
+            "io_data": io_data
+        }
+        if self.nx is not None:
+            data_record["nx_data"] = [
+                {"io_id": io_id, "value": int.from_bytes(raw, "big"), "length": len(raw)}
+                for io_id, raw in self.nx.items()
+            ]
+        return data_record
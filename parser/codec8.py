@@ -1,53 +1,94 @@
-import asyncio
 import struct
-from datetime import datetime, timezone
 from utils.crc import CRC16ARC
+from parser.avl_record import AVLRecord
+from utils.log import get_logger, device_debug_enabled, device_debug
+
+logger = get_logger("codec")
+
+# Timestamp, priority, longitude, latitude, altitude, angle, satellites, speed
+GPS_HEADER = struct.Struct(">QBiiHHBH")
+# Event IO ID, total IO
+IO_HEADER = struct.Struct(">BB")
+# Codec 8: IO ID 1 byte, nilai 1/2/4/8 byte
+IO_GROUPS = (
+    struct.Struct(">BB"),
+    struct.Struct(">BH"),
+    struct.Struct(">BI"),
+    struct.Struct(">BQ"),
+)
+MIN_RECORD_SIZE = GPS_HEADER.size + IO_HEADER.size + len(IO_GROUPS)
+
 
 class ParseRawCodec8:
     async def parse_codec8(self, avl_content, num_data_1, imei, crc_data, crc_received):
-        if not await CRC16ARC.verify_crc(crc_data, crc_received):
-            print(" CRC tidak valid untuk Codec 8.")
+        return ParseRawCodec8.parse(avl_content, num_data_1, imei, crc_data, crc_received)
+
+    @staticmethod
+    def parse(avl_content, num_data_1, imei, crc_data, crc_received):
+        # Versi sinkron, bisa dijalankan inline maupun di executor
+        if not CRC16ARC.verify(crc_data, crc_received):
+            logger.warning("CRC tidak valid untuk Codec 8 (IMEI: %s).", imei)
             return
-        print("CRC valid untuk Codec 8.")
+        logger.debug("CRC valid untuk Codec 8.")
+        return ParseRawCodec8.decode(avl_content, num_data_1, imei)
+
+    @staticmethod
+    def decode(avl_content, num_data_1, imei):
+        # Decode tanpa cek CRC (CRC sudah diverifikasi pemanggil)
+        payload = ParseRawCodec8.decode_records(avl_content, num_data_1, imei)
+
+        if device_debug_enabled(logger, imei):
+            for i, record in enumerate(payload):
+                device_debug(
+                    logger, imei,
+                    "Record %d (IMEI: %s): Latitude: %s, Longitude: %s, Altitude: %s m, Angle: %s°, Satellites: %s, Speed: %s km/h",
+                    i + 1, imei, record.latitude, record.longitude, record.altitude, record.angle,
+                    record.satellites, record.speed
+                )
+
+        return payload
+
+    @staticmethod
+    def decode_records(avl_content, num_data_1, imei):
+        view = memoryview(avl_content)
+        end = len(view)
+        gps_unpack = GPS_HEADER.unpack_from
+        io_header_unpack = IO_HEADER.unpack_from
 
         payload = []
         offset = 0
         for i in range(num_data_1):
-            if offset + 26 > len(avl_content):
-                print(f"Data AVL ke-{i+1} tidak lengkap, berhenti parsing.")
-                break
-
-            timestamp_raw = struct.unpack(">Q", avl_content[offset:offset+8])[0]
-            timestamp = datetime.fromtimestamp(timestamp_raw / 1000, tz=timezone.utc)
-
-            longitude = struct.unpack(">i", avl_content[offset+9:offset+13])[0] / 10000000
-            latitude = struct.unpack(">i", avl_content[offset+13:offset+17])[0] / 10000000
-            altitude = struct.unpack(">H", avl_content[offset+17:offset+19])[0]
-            angle = struct.unpack(">H", avl_content[offset+19:offset+21])[0]
-            satellites = avl_content[offset+21]
-            speed = struct.unpack(">H", avl_content[offset+22:offset+24])[0]
-
-            print(f"\nRecord {i+1} (IMEI: {imei}):")
-            print(f"  Latitude: {latitude}")
-            print(f"  Longitude: {longitude}")
-            print(f"  Altitude: {altitude} m")
-            print(f"  Angle: {angle}°")
-            print(f"  Satellites: {satellites}")
-            print(f"  Speed: {speed} km/h")
-
-            data_record = {
-                "imei": imei,
-                "timestamp": timestamp.isoformat(),  
-                "latitude": latitude,
-                "longitude": longitude,
-                "altitude": altitude,
-                "angle": angle,
-                "satellites": satellites,
-                "speed": speed
-            }
-
-            payload.append(data_record)
-
-            offset += 26
+            # Record terpotong membuat seluruh frame ditolak (tidak di-ACK) supaya device mengirim ulang,
+            # sama dengan Codec 8 Extended; ACK sebagian akan membuang record yang belum didecode
+            if offset + MIN_RECORD_SIZE > end:
+                raise struct.error(f"Data AVL ke-{i + 1} tidak lengkap")
+
+            timestamp_raw, priority, longitude, latitude, altitude, angle, satellites, speed = gps_unpack(view, offset)
+            offset += GPS_HEADER.size
+            event_io_id, total_io = io_header_unpack(view, offset)
+            offset += IO_HEADER.size
+
+            # Parsing data IO berdasarkan tipe dan ukuran (1B, 2B, 4B, 8B) langsung ke dict io_id -> value
+            io = {}
+            io_groups = []
+            for unpacker in IO_GROUPS:
+                if offset >= end:
+                    raise struct.error(f"Data AVL ke-{i + 1} tidak lengkap")
+                count = view[offset]
+                offset += 1
+                group_end = offset + count * unpacker.size
+                if group_end > end:
+                    raise struct.error("IO element melebihi panjang data")
+                group = tuple(unpacker.iter_unpack(view[offset:group_end]))
+                io.update(group)
+                io_groups.append(group)
+                offset = group_end
+
+            payload.append(AVLRecord(
+                imei, timestamp_raw, priority,
+                longitude / 10000000, latitude / 10000000,
+                altitude, angle, satellites, speed,
+                event_io_id, total_io, io, tuple(io_groups)
+            ))
 
         return payload
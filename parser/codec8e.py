@@ -1,116 +1,106 @@
-import datetime
+import struct
 from utils.crc import CRC16ARC
-from datetime import datetime, timezone
+from parser.avl_record import AVLRecord
+from utils.log import get_logger, device_debug_enabled, device_debug
+
+logger = get_logger("codec")
+
+# Timestamp, priority, longitude, latitude, altitude, angle, satellites, speed, event IO ID, total IO
+RECORD_HEADER = struct.Struct(">QBiiHHBHHH")
+COUNT = struct.Struct(">H")
+# Codec 8 Extended: IO ID 2 byte, nilai 1/2/4/8 byte
+IO_GROUPS = (
+    struct.Struct(">HB"),
+    struct.Struct(">HH"),
+    struct.Struct(">HI"),
+    struct.Struct(">HQ"),
+)
+NX_HEADER = struct.Struct(">HH")
+
 
 class ParseRawCodec8e :
 
     async def parse_avl_data_codec8e(self, avl_content, num_data_1, imei, crc_data, crc_received):
+        return ParseRawCodec8e.parse(avl_content, num_data_1, imei, crc_data, crc_received)
+
+    @staticmethod
+    def parse(avl_content, num_data_1, imei, crc_data, crc_received):
+            # Versi sinkron, bisa dijalankan inline maupun di executor
             try:
-                if not await CRC16ARC.verify_crc(crc_data, crc_received):
-                    print("CRC tidak valid untuk Codec 8 Extended.")
+                if not CRC16ARC.verify(crc_data, crc_received):
+                    logger.warning("CRC tidak valid untuk Codec 8 Extended (IMEI: %s).", imei)
                     return
-                print("CRC valid untuk Codec 8 Extended.")
-
-                idx = 0
-                payload = []  
-                
-                for i in range(num_data_1):
-
-                    timestamp_raw = int.from_bytes(avl_content[idx:idx+8], "big")
-                    timestamp = datetime.fromtimestamp(timestamp_raw / 1000, tz=timezone.utc)
-
-                    idx += 8
-
-                    # Parsing data lainnya
-                    priority = avl_content[idx]
-                    idx += 1
-
-                    longitude = int.from_bytes(avl_content[idx:idx+4], "big", signed=True) / 10**7
-                    idx += 4
-
-                    latitude = int.from_bytes(avl_content[idx:idx+4], "big", signed=True) / 10**7
-                    idx += 4
-
-                    altitude = int.from_bytes(avl_content[idx:idx+2], "big")
-                    idx += 2
-
-                    angle = int.from_bytes(avl_content[idx:idx+2], "big")
-                    idx += 2
-
-                    satellites = avl_content[idx]
-                    idx += 1
-
-                    speed = int.from_bytes(avl_content[idx:idx+2], "big")
-                    idx += 2
-
-                    event_io_id = int.from_bytes(avl_content[idx:idx+2], "big")
-                    idx += 2
-
-                    total_io = int.from_bytes(avl_content[idx:idx+2], "big")
-                    idx += 2
-
-                    # Menyusun data record ke dalam dictionary
-                    data_record = {
-                        "imei": imei,
-                        "timestamp": timestamp.isoformat(),
-                        "latitude": latitude,
-                        "longitude": longitude,
-                        "altitude": altitude,
-                        "angle": angle,
-                        "satellites": satellites,
-                        "speed": speed,
-                        "event_io_id": event_io_id,
-                        "total_io": total_io,
-                        "io_data": [] 
-                    }
-
-                    # Parsing data IO berdasarkan tipe dan ukuran (1B, 2B, 4B, 8B)
-                    for io_type, size in [("1B", 1), ("2B", 2), ("4B", 4), ("8B", 8)]:
-                        count = int.from_bytes(avl_content[idx:idx+2], "big")
-                        idx += 2
-                        io_list = []  # List untuk menyimpan data IO
-                        for _ in range(count):
-                            io_id = int.from_bytes(avl_content[idx:idx+2], "big")
-                            value = int.from_bytes(avl_content[idx+2:idx+2+size], "big")
-                            io_list.append({"io_id": io_id, "value": value})
-                            idx += 2 + size
-                        data_record["io_data"].append({io_type: io_list})
-
-                    # Parsing NX AVL Data
-                    count = int.from_bytes(avl_content[idx:idx+2], "big")
-                    idx += 2
-                    nx_data_list = [] 
-                    for _ in range(count):
-                        io_id = int.from_bytes(avl_content[idx:idx+2], "big")
-                        val_len = int.from_bytes(avl_content[idx+2:idx+4], "big")
-                        value = int.from_bytes(avl_content[idx+4:idx+4+val_len], "big")
-                        nx_data_list.append({"io_id": io_id, "value": value, "length": val_len})
-                        idx += 4 + val_len
-                    data_record["nx_data"] = nx_data_list
-
-                    # Menambahkan record yang sudah diparse ke payload
-                    payload.append(data_record)
-
-
-                    print(f"\nExtended Record {i+1} (IMEI: {imei})")
-                    print(f"  Timestamp (UTC): {timestamp}")
-                    print(f"  Latitude: {latitude}")
-                    print(f"  Longitude: {longitude}")
-                    print(f"  Altitude: {altitude} m")
-                    print(f"  Angle: {angle}°")
-                    print(f"  Satellites: {satellites}")
-                    print(f"  Speed: {speed} km/h")
-                    print(f"  Event IO ID: {event_io_id}")
-                    print(f"  Total IO Elements: {total_io}")
-                    for io_type in ["1B", "2B", "4B", "8B"]:
-                        for io in data_record["io_data"]:
-                            if io_type in io:
-                                for item in io[io_type]:
-                                    print(f"    IO ID: {item['io_id']}, Value: {item['value']}")
-                    for nx_item in data_record["nx_data"]:
-                        print(f"    NX IO ID: {nx_item['io_id']}, Value: {nx_item['value']} (Length: {nx_item['length']})")
-
-                return payload
+                logger.debug("CRC valid untuk Codec 8 Extended.")
+                return ParseRawCodec8e.decode(avl_content, num_data_1, imei)
 
             except Exception as e:
-                print(f" Error saat parsing Codec 8 Extended: {e}")
\ No newline at end of file
+                logger.error("Error saat parsing Codec 8 Extended (IMEI: %s): %s", imei, e)
+
+    @staticmethod
+    def decode(avl_content, num_data_1, imei):
+        # Decode tanpa cek CRC (CRC sudah diverifikasi pemanggil)
+        payload = ParseRawCodec8e.decode_records(avl_content, num_data_1, imei)
+
+        if device_debug_enabled(logger, imei):
+            for i, record in enumerate(payload):
+                device_debug(
+                    logger, imei,
+                    "Extended Record %d (IMEI: %s): Timestamp (UTC): %s, Latitude: %s, Longitude: %s, "
+                    "Altitude: %s m, Angle: %s°, Satellites: %s, Speed: %s km/h, Event IO ID: %s, "
+                    "Total IO Elements: %s, IO: %s, NX: %s",
+                    i + 1, imei, record.timestamp, record.latitude, record.longitude, record.altitude,
+                    record.angle, record.satellites, record.speed, record.event_io_id, record.total_io,
+                    record.io, {io_id: raw.hex() for io_id, raw in record.nx.items()}
+                )
+
+        return payload
+
+    @staticmethod
+    def decode_records(avl_content, num_data_1, imei):
+        view = memoryview(avl_content)
+        end = len(view)
+        header_unpack = RECORD_HEADER.unpack_from
+        count_unpack = COUNT.unpack_from
+        nx_unpack = NX_HEADER.unpack_from
+
+        idx = 0
+        payload = []
+        for _ in range(num_data_1):
+            (timestamp_raw, priority, longitude, latitude, altitude, angle, satellites, speed,
+             event_io_id, total_io) = header_unpack(view, idx)
+            idx += RECORD_HEADER.size
+
+            # Parsing data IO berdasarkan tipe dan ukuran (1B, 2B, 4B, 8B) langsung ke dict io_id -> value
+            io = {}
+            io_groups = []
+            for unpacker in IO_GROUPS:
+                count = count_unpack(view, idx)[0]
+                idx += 2
+                group_end = idx + count * unpacker.size
+                if group_end > end:
+                    raise struct.error("IO element melebihi panjang data")
+                group = tuple(unpacker.iter_unpack(view[idx:group_end]))
+                io.update(group)
+                io_groups.append(group)
+                idx = group_end
+
+            # Parsing NX AVL Data
+            count = count_unpack(view, idx)[0]
+            idx += 2
+            nx = {}
+            for _ in range(count):
+                io_id, val_len = nx_unpack(view, idx)
+                idx += 4
+                if idx + val_len > end:
+                    raise struct.error("NX element melebihi panjang data")
+                nx[io_id] = bytes(view[idx:idx+val_len])
+                idx += val_len
+
+            payload.append(AVLRecord(
+                imei, timestamp_raw, priority,
+                longitude / 10**7, latitude / 10**7,
+                altitude, angle, satellites, speed,
+                event_io_id, total_io, io, tuple(io_groups), nx
+            ))
+
+        return payload
@@ -0,0 +1,187 @@
+import struct
+from datetime import datetime, timezone
+from utils.crc import CRC16ARC
+from utils.log import get_logger
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+logger = get_logger("codec")
+
+UINT32 = struct.Struct(">I")
+
+# Header per record yang lebarnya tetap: GPS element + event IO ID + total IO (big-endian)
+HEADER_FIELDS = {
+    0x08: (
+        ("timestamp_ms", ">u8"), ("priority", "u1"), ("longitude", ">i4"), ("latitude", ">i4"),
+        ("altitude", ">u2"), ("angle", ">u2"), ("satellites", "u1"), ("speed", ">u2"),
+        ("event_io_id", "u1"), ("total_io", "u1"),
+    ),
+    0x8E: (
+        ("timestamp_ms", ">u8"), ("priority", "u1"), ("longitude", ">i4"), ("latitude", ">i4"),
+        ("altitude", ">u2"), ("angle", ">u2"), ("satellites", "u1"), ("speed", ">u2"),
+        ("event_io_id", ">u2"), ("total_io", ">u2"),
+    ),
+}
+
+# Kolom hasil dalam dtype native; latitude/longitude sudah diskalakan ke derajat
+COLUMNS = (
+    ("timestamp_ms", "i8"), ("priority", "u1"), ("latitude", "f8"), ("longitude", "f8"),
+    ("altitude", "u2"), ("angle", "u2"), ("satellites", "u1"), ("speed", "u2"),
+    ("event_io_id", "u2"), ("total_io", "u2"),
+)
+
+# Ukuran satu IO element (ID + nilai) per grup 1B/2B/4B/8B
+CODEC8_IO_SIZES = (2, 3, 5, 9)
+CODEC8E_IO_SIZES = (3, 4, 6, 10)
+
+_dtypes = {}
+
+
+def require_numpy():
+    if np is None:
+        raise RuntimeError("Decode kolumnar membutuhkan paket numpy (pip install numpy)")
+
+
+def header_dtype(codec_id: int):
+    dtype = _dtypes.get(codec_id)
+    if dtype is None:
+        dtype = _dtypes[codec_id] = np.dtype(list(HEADER_FIELDS[codec_id]))
+    return dtype
+
+
+def record_offsets(view, num_data_1: int, codec_id: int):
+    # Satu kali jalan mencari awal tiap record: IO element hanya dilompati, tidak di-unpack
+    offsets = []
+    idx = 0
+    end = len(view)
+    if codec_id == 0x08:
+        for _ in range(num_data_1):
+            offsets.append(idx)
+            # Lebar header codec 8: 24 byte GPS + event IO ID 1 byte + total IO 1 byte
+            idx += 26
+            for size in CODEC8_IO_SIZES:
+                idx += 1 + view[idx] * size
+            if idx > end:
+                raise ValueError("record melebihi panjang data")
+    else:
+        for _ in range(num_data_1):
+            offsets.append(idx)
+            # Lebar header codec 8E: 24 byte GPS + event IO ID 2 byte + total IO 2 byte
+            idx += 28
+            for size in CODEC8E_IO_SIZES:
+                idx += 2 + (view[idx] << 8 | view[idx + 1]) * size
+            count = view[idx] << 8 | view[idx + 1]
+            idx += 2
+            for _ in range(count):
+                idx += 4 + (view[idx + 2] << 8 | view[idx + 3])
+            if idx > end:
+                raise ValueError("record melebihi panjang data")
+    return offsets
+
+
+class ColumnarBatch:
+    # Header GPS banyak record (satu atau banyak frame) dalam bentuk kolom NumPy.
+    # imeis: daftar IMEI unik, imei_index: index ke imeis per record.
+
+    __slots__ = ("imeis", "imei_index", "columns", "frames", "errors")
+
+    def __init__(self, imeis, imei_index, columns, frames: int = 0, errors: int = 0):
+        self.imeis = imeis
+        self.imei_index = imei_index
+        self.columns = columns
+        self.frames = frames
+        self.errors = errors
+
+    def __len__(self):
+        return len(self.imei_index)
+
+    def __getitem__(self, name):
+        return self.columns[name]
+
+    def imei_column(self):
+        return np.asarray(self.imeis, dtype=object)[self.imei_index]
+
+    def datetimes(self):
+        return self.columns["timestamp_ms"].astype("datetime64[ms]")
+
+    def rows(self):
+        # Untuk sink yang tidak memakai NumPy: dict per record dengan nilai Python biasa
+        names = [name for name, _ in COLUMNS]
+        columns = [self.columns[name].tolist() for name in names]
+        imeis = self.imeis
+        for imei_index, values in zip(self.imei_index.tolist(), zip(*columns)):
+            row = dict(zip(names, values))
+            row["imei"] = imeis[imei_index]
+            yield row
+
+
+def decode_gps_batch(frames, verify_crc: bool = True) -> ColumnarBatch:
+    # frames: iterable (imei, frame) dengan frame lengkap (preamble + length + data + CRC),
+    # codec 8 dan 8E boleh bercampur. Header semua record dikumpulkan dengan satu gather per codec,
+    # lalu skala dan konversi dilakukan per kolom. Urutan record mengikuti urutan frame.
+    require_numpy()
+    imeis = []
+    imei_ids = {}
+    imei_index = []
+    # codec_id -> ([buffer], [offset record di gabungan buffer], [posisi record di batch], [panjang gabungan buffer])
+    groups = {codec_id: ([], [], [], [0]) for codec_id in HEADER_FIELDS}
+    total = 0
+    frame_count = 0
+    errors = 0
+
+    for imei, frame in frames:
+        view = memoryview(frame)
+        try:
+            data_field_length = UINT32.unpack_from(view, 4)[0]
+            codec_id = view[8]
+            num_data_1 = view[9]
+            data_end = 8 + data_field_length
+            if codec_id not in groups or len(view) < data_end + 4:
+                raise ValueError(f"frame tidak valid (codec {codec_id:#x})")
+            if verify_crc and not CRC16ARC.verify(view[8:data_end], UINT32.unpack_from(view, data_end)[0]):
+                raise ValueError("CRC tidak valid")
+            content = view[10:data_end - 1]
+            offsets = record_offsets(content, num_data_1, codec_id)
+        except (ValueError, IndexError, struct.error) as e:
+            errors += 1
+            logger.warning("Frame dari IMEI %s dilewati pada decode kolumnar: %s", imei, e)
+            continue
+
+        buffers, global_offsets, positions, base = groups[codec_id]
+        buffers.append(content)
+        global_offsets.extend(base[0] + offset for offset in offsets)
+        positions.extend(range(total, total + len(offsets)))
+        base[0] += len(content)
+        total += len(offsets)
+        frame_count += 1
+
+        imei_id = imei_ids.get(imei)
+        if imei_id is None:
+            imei_id = imei_ids[imei] = len(imeis)
+            imeis.append(imei)
+        imei_index.extend([imei_id] * len(offsets))
+
+    columns = {name: np.empty(total, dtype=dtype) for name, dtype in COLUMNS}
+    for codec_id, (buffers, global_offsets, positions, _) in groups.items():
+        if not global_offsets:
+            continue
+        dtype = header_dtype(codec_id)
+        data = np.frombuffer(b"".join(buffers), dtype=np.uint8)
+        # Gather: baris n berisi byte header record ke-n, lalu dibaca ulang sebagai structured array
+        gather = np.asarray(global_offsets, dtype=np.int64)[:, None] + np.arange(dtype.itemsize, dtype=np.int64)
+        headers = data[gather].view(dtype).reshape(-1)
+        index = np.asarray(positions, dtype=np.int64)
+        for name, _ in COLUMNS:
+            columns[name][index] = headers[name]
+    columns["latitude"] /= 10_000_000
+    columns["longitude"] /= 10_000_000
+
+    return ColumnarBatch(imeis, np.asarray(imei_index, dtype=np.int32), columns, frame_count, errors)
+
+
+def iso_timestamps(timestamp_ms):
+    # Format sama dengan AVLRecord.timestamp (datetime.isoformat dengan offset +00:00)
+    return [datetime.fromtimestamp(value / 1000, tz=timezone.utc).isoformat() for value in timestamp_ms.tolist()]
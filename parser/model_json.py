@@ -1,69 +1,169 @@
 import json
 from typing import Dict, Any
+from parser.avl_record import AVLRecord
+
+# Spesifikasi mapping: (nama field, io_id, default, coerce)
+FMB920_OBD_PROFILE = (
+    ("battery_voltage", 67, 0, None),
+    ("power_input", 66, 0, None),
+    ("fuel_level", 9, 0, None),
+    ("total_odometer", 16, 0, None),
+    ("fuel_used_gps", 12, 0, None),
+    ("fuel_rate_gps", 13, 0, None),
+    ("operate_status", 1, 0, "bool"),
+    ("digital_input_2", 2, 0, "bool"),
+    ("gsm_signal", 21, 0, None),
+    ("ignition_on_counter", 449, 0, None),
+    ("engine_load", 31, 0, None),  # Engine Load (sebelumnya 52)
+    ("coolant_temp", 32, 0, None),  # Engine Coolant Temperature (sebelumnya 72)
+    ("short_fuel_trim", 33, 0, None),
+    ("fuel_pressure", 34, 0, None),
+    ("intake_map", 35, 0, None),
+    ("engine_rpm", 36, 0, None),
+    ("vehicle_speed", 37, 0, None),  # Vehicle Speed (sebelumnya 24)
+    ("timing_advance", 38, 0, None),
+    ("intake_air_temp", 39, 0, None),  # Intake Air Temperature (sebelumnya 73)
+    ("maf", 40, 0, None),
+    ("throttle_position", 41, 0, None),
+    ("run_time_since_engine_start", 42, 0, None),
+    ("distance_traveled_mil_on", 43, 0, None),
+    ("relative_fuel_rail_pressure", 44, 0, None),
+    ("direct_fuel_rail_pressure", 45, 0, None),
+    ("commanded_egr", 46, 0, None),
+    ("egr_error", 47, 0, None),
+    ("number_of_dtc", 30, 0, None),
+    ("distance_traveled_since_codes_clear", 49, 0, None),
+    ("control_module_voltage", 51, 0, None),  # Control Module Voltage (sebelumnya 200)
+    ("absolute_load_value", 52, 0, None),
+    ("ambient_air_temperature", 53, 0, None),
+    ("time_run_with_mil_on", 54, 0, None),
+    ("time_since_trouble_codes_cleared", 55, 0, None),
+    ("fuel_type", 759, 0, None),
+    ("hybrid_battery_pack_remaining_life", 57, 0, None),
+    ("engine_oil_temperature", 58, 0, None),
+    ("fuel_injection_timing", 59, 0, None),
+    ("fuel_rate", 60, 0, None),
+)
+
+MAPPING_PROFILES = {
+    "default": FMB920_OBD_PROFILE,
+}
+
+# Isi data_payload: full = record mentah bentuk lama, slim = hanya nilai yang belum dipetakan, none = tidak ada
+RAW_MODES = ("full", "slim", "none")
+TIMESTAMP_FORMATS = ("iso", "epoch_ms")
+
+COERCERS = {
+    None: None,
+    "bool": bool,
+    "int": int,
+    "float": float,
+}
+
 
 class TeltonikaPayloadMapper:
-    
+    # Spesifikasi dikompilasi sekali menjadi template default + index io_id -> (field, coerce)
+
+    __slots__ = ("profile", "template", "io_fields", "raw_mode", "epoch_ms")
+
+    _compiled = {}
+
+    def __init__(self, profile: str = "default", raw_mode: str = "full", timestamp_format: str = "iso"):
+        if raw_mode not in RAW_MODES:
+            raise ValueError(f"Mode data_payload tidak dikenali: {raw_mode}")
+        if timestamp_format not in TIMESTAMP_FORMATS:
+            raise ValueError(f"Format timestamp tidak dikenali: {timestamp_format}")
+        spec = MAPPING_PROFILES[profile]
+        self.profile = profile
+        self.raw_mode = raw_mode
+        self.epoch_ms = timestamp_format == "epoch_ms"
+        self.template = {}
+        self.io_fields = {}
+        for field, io_id, default, coerce in spec:
+            coercer = COERCERS[coerce]
+            self.template[field] = coercer(default) if coercer else default
+            self.io_fields.setdefault(io_id, []).append((field, coercer))
+        self.io_fields = {io_id: tuple(targets) for io_id, targets in self.io_fields.items()}
+
+    @classmethod
+    def for_profile(cls, profile: str = "default", raw_mode: str = "full",
+                    timestamp_format: str = "iso") -> "TeltonikaPayloadMapper":
+        key = (profile, raw_mode, timestamp_format)
+        mapper = cls._compiled.get(key)
+        if mapper is None:
+            mapper = cls._compiled[key] = cls(profile, raw_mode, timestamp_format)
+        return mapper
+
     @staticmethod
-    def map_teltonika_to_json_payload(imei: str, data_avl: Dict[str, Any]) -> Dict[str, Any]:
-        def get_value(io_map, key, default=0):
-            if isinstance(key, int):
-                for io_group in io_map.get("io_data", []):
-                    for io_type, io_values in io_group.items():
-                        for io in io_values:
-                            if io.get('io_id') == key:
-                                return io.get('value', default)
-            return io_map.get(key, default)
-
-        # Nilai default untuk payload
+    def register_profile(name: str, spec):
+        for field, io_id, default, coerce in spec:
+            if coerce not in COERCERS:
+                raise ValueError(f"Coerce tidak dikenali untuk field {field}: {coerce}")
+        MAPPING_PROFILES[name] = tuple(spec)
+        for key in [key for key in TeltonikaPayloadMapper._compiled if key[0] == name]:
+            del TeltonikaPayloadMapper._compiled[key]
+
+    def map(self, imei: str, data_avl: AVLRecord) -> Dict[str, Any]:
         payload = {
             "imei": imei,
-            "timestamp": data_avl.get("timestamp", "1970-01-01T00:00:00+00:00"),
-            "latitude": data_avl.get("latitude", 0.0),
-            "longitude": data_avl.get("longitude", 0.0),
-            "altitude": data_avl.get("altitude", 0),
-            "angle": data_avl.get("angle", 0),
-            "speed": data_avl.get("speed", 0),
-            "battery_voltage": get_value(data_avl, 67, 0),  # Ambil nilai dari io_id 67
-            "power_input": get_value(data_avl, 66, 0),  # Ambil nilai dari io_id 66
-            "fuel_level": get_value(data_avl, 9, 0),  # Ambil nilai dari io_id 9
-            "total_odometer": get_value(data_avl, 16, 0),  # Ambil nilai dari io_id 16
-            "fuel_used_gps": get_value(data_avl, 12, 0),  # Ambil nilai dari io_id 12
-            "fuel_rate_gps": get_value(data_avl, 13, 0),  # Ambil nilai dari io_id 13
-            "operate_status": bool(get_value(data_avl, 1, 0)),  # Ambil nilai dari io_id 1
-            "digital_input_2": bool(get_value(data_avl, 2, 0)),  # Ambil nilai dari io_id 2
-            "gsm_signal": get_value(data_avl, 21, 0),  # Ambil nilai dari io_id 21
-            "ignition_on_counter": get_value(data_avl, 449, 0),  # Ambil nilai dari io_id 449
-            "engine_load": get_value(data_avl, 31, 0),  # Engine Load (sebelumnya 52)
-            "coolant_temp": get_value(data_avl, 32, 0),  # Engine Coolant Temperature (sebelumnya 72)
-            "short_fuel_trim": get_value(data_avl, 33, 0),
-            "fuel_pressure": get_value(data_avl, 34, 0),
-            "intake_map": get_value(data_avl, 35, 0),
-            "engine_rpm": get_value(data_avl, 36, 0),  # RPM
-            "vehicle_speed": get_value(data_avl, 37, 0),  # Vehicle Speed (sebelumnya 24)
-            "timing_advance": get_value(data_avl, 38, 0),
-            "intake_air_temp": get_value(data_avl, 39, 0),  # Intake Air Temperature (sebelumnya 73)
-            "maf": get_value(data_avl, 40, 0),
-            "throttle_position": get_value(data_avl, 41, 0),  # Throttle Position
-            "run_time_since_engine_start": get_value(data_avl, 42, 0),
-            "distance_traveled_mil_on": get_value(data_avl, 43, 0),
-            "relative_fuel_rail_pressure": get_value(data_avl, 44, 0),
-            "direct_fuel_rail_pressure": get_value(data_avl, 45, 0),
-            "commanded_egr": get_value(data_avl, 46, 0),
-            "egr_error": get_value(data_avl, 47, 0),
-            # Parameter OBD yang baru ditambahkan
-            "number_of_dtc": get_value(data_avl, 30, 0),
-            "distance_traveled_since_codes_clear": get_value(data_avl, 49, 0),
-            "control_module_voltage": get_value(data_avl, 51, 0),  # Control Module Voltage (sebelumnya 200)
-            "absolute_load_value": get_value(data_avl, 52, 0),
-            "ambient_air_temperature": get_value(data_avl, 53, 0),
-            "time_run_with_mil_on": get_value(data_avl, 54, 0),
-            "time_since_trouble_codes_cleared": get_value(data_avl, 55, 0),
-            "fuel_type": get_value(data_avl, 759, 0),
-            "hybrid_battery_pack_remaining_life": get_value(data_avl, 57, 0),
-            "engine_oil_temperature": get_value(data_avl, 58, 0),
-            "fuel_injection_timing": get_value(data_avl, 59, 0),
-            "fuel_rate": get_value(data_avl, 60, 0),
-            "data_payload": data_avl  # Menyertakan data_avl yang asli dalam payload
+            "timestamp": data_avl.timestamp_ms if self.epoch_ms else data_avl.timestamp,
+            "latitude": data_avl.latitude,
+            "longitude": data_avl.longitude,
+            "altitude": data_avl.altitude,
+            "angle": data_avl.angle,
+            "speed": data_avl.speed,
         }
+        payload.update(self.template)
 
+        # Satu kali jalan atas IO element record
+        io_fields = self.io_fields
+        for io_id, value in data_avl.io.items():
+            targets = io_fields.get(io_id)
+            if targets is not None:
+                for field, coercer in targets:
+                    payload[field] = coercer(value) if coercer else value
+
+        if self.raw_mode == "full":
+            payload["data_payload"] = data_avl.to_dict(self.epoch_ms)  # Menyertakan data_avl yang asli dalam payload
+        elif self.raw_mode == "slim":
+            payload["data_payload"] = self.slim(data_avl)
         return payload
+
+    def map_positions(self, batch) -> list:
+        # Batch kolumnar (parser.columnar.ColumnarBatch): hanya field posisi, IO element tidak ikut didecode
+        from parser.columnar import iso_timestamps
+        timestamp_ms = batch["timestamp_ms"]
+        timestamps = timestamp_ms.tolist() if self.epoch_ms else iso_timestamps(timestamp_ms)
+        imeis = batch.imeis
+        return [
+            {
+                "imei": imeis[imei_index],
+                "timestamp": timestamp,
+                "latitude": latitude,
+                "longitude": longitude,
+                "altitude": altitude,
+                "angle": angle,
+                "speed": speed,
+            }
+            for imei_index, timestamp, latitude, longitude, altitude, angle, speed in zip(
+                batch.imei_index.tolist(), timestamps, batch["latitude"].tolist(), batch["longitude"].tolist(),
+                batch["altitude"].tolist(), batch["angle"].tolist(), batch["speed"].tolist(),
+            )
+        ]
+
+    def slim(self, data_avl: AVLRecord) -> Dict[str, Any]:
+        # Hanya nilai yang tidak ada di field hasil mapping, supaya tidak terkirim dua kali
+        io_fields = self.io_fields
+        slim = {
+            "priority": data_avl.priority,
+            "satellites": data_avl.satellites,
+            "event_io_id": data_avl.event_io_id,
+            "io": {io_id: value for io_id, value in data_avl.io.items() if io_id not in io_fields},
+        }
+        if data_avl.nx:
+            slim["nx"] = {io_id: raw.hex() for io_id, raw in data_avl.nx.items()}
+        return slim
+
+    @staticmethod
+    def map_teltonika_to_json_payload(imei: str, data_avl: AVLRecord) -> Dict[str, Any]:
+        return TeltonikaPayloadMapper.for_profile().map(imei, data_avl)
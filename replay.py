@@ -0,0 +1,235 @@
+import argparse
+import asyncio
+import json
+import logging
+import multiprocessing
+import os
+import time
+from datetime import datetime, timezone
+from config.config import Config
+from utils.capture import capture_files, read_capture
+
+logger = logging.getLogger("replay")
+
+SINKS = ("count", "jsonl", "archive", "mqtt")
+
+
+def parse_time(value: str) -> int:
+    # "2024-05-01", "2024-05-01T10:00:00" (UTC bila tanpa zona) atau epoch ms -> epoch ms
+    if value.isdigit():
+        return int(value)
+    moment = datetime.fromisoformat(value)
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=timezone.utc)
+    return int(moment.timestamp() * 1000)
+
+
+def frames(path: str, args):
+    # Frame dari satu file capture setelah filter IMEI dan waktu diterima
+    for received_ms, imei, frame in read_capture(path):
+        if args.imei and not imei.startswith(args.imei):
+            continue
+        if args.since is not None and received_ms < args.since:
+            continue
+        if args.until is not None and received_ms >= args.until:
+            continue
+        yield imei, frame
+
+
+def output_path(args, path: str, extension: str) -> str:
+    os.makedirs(args.output, exist_ok=True)
+    return os.path.join(args.output, os.path.basename(path).split(".")[0] + extension)
+
+
+def replay_columnar(path: str, args, result):
+    # Hanya header GPS, tanpa IO element: jalur tercepat untuk analisis posisi
+    from parser.columnar import decode_gps_batch, iso_timestamps
+
+    batch = decode_gps_batch((imei, bytes(frame)) for imei, frame in frames(path, args))
+    result["frames"] += batch.frames + batch.errors
+    result["records"] += len(batch)
+    if batch.errors:
+        result["errors"]["decode"] = result["errors"].get("decode", 0) + batch.errors
+    if args.sink == "jsonl":
+        timestamps = iso_timestamps(batch["timestamp_ms"])
+        with open(output_path(args, path, ".jsonl"), "w", encoding="utf-8") as f:
+            for row, timestamp in zip(batch.rows(), timestamps):
+                row["timestamp"] = timestamp
+                f.write(json.dumps(row, separators=(",", ":")))
+                f.write("\n")
+
+
+def replay_records(items, result, emit):
+    # items: (imei, frame); decode + mapping sama persis dengan jalur server (tanpa dedup)
+    from service.frame_decoder import decode_frame
+
+    mapper_key = (Config.MAPPING_PROFILE, Config.PAYLOAD_RAW_MODE, Config.TIMESTAMP_FORMAT)
+    errors = result["errors"]
+    for imei, frame in items:
+        decoded = decode_frame(frame, imei, mapper_key)
+        result["frames"] += 1
+        if decoded.error is not None:
+            errors[decoded.error] = errors.get(decoded.error, 0) + 1
+            continue
+        result["records"] += len(decoded.payload)
+        if emit is not None and decoded.payload:
+            emit(imei, decoded.payload, decoded.keys)
+
+
+def replay_file(path: str, args):
+    # Dijalankan di process pool: satu file capture per task, hasil berupa ringkasan yang bisa di-pickle
+    result = {"file": path, "frames": 0, "records": 0, "errors": {}, "seconds": 0.0}
+    start = time.perf_counter()
+    if args.columnar:
+        replay_columnar(path, args, result)
+    elif args.sink == "jsonl":
+        from utils.serializer import get_serializer
+
+        serializer = get_serializer("json")
+        with open(output_path(args, path, ".jsonl"), "wb") as f:
+            def emit(imei, records, keys):
+                for record in records:
+                    f.write(serializer.dumps(record))
+                    f.write(b"\n")
+
+            replay_records(frames(path, args), result, emit)
+    elif args.sink == "archive":
+        from config.archive import ArchiveSink
+
+        sink = ArchiveSink(
+            args.output, Config.ARCHIVE_FORMAT, Config.ARCHIVE_IMEI_PREFIX, Config.ARCHIVE_BATCH_ROWS,
+            file_size=Config.ARCHIVE_FILE_SIZE,
+        )
+        sink.open_sync()
+        try:
+            replay_records(frames(path, args), result, sink.submit_sync)
+        finally:
+            sink.close_sync()
+    elif args.sink == "mqtt":
+        asyncio.run(replay_mqtt(path, args, result))
+    else:
+        replay_records(frames(path, args), result, None)
+    result["seconds"] = time.perf_counter() - start
+    return result
+
+
+async def replay_mqtt(path: str, args, result):
+    from config.mqtt import mqtt_pool
+
+    # Replay tidak memakai spool: broker yang tidak tersedia cukup membuat replay gagal/diulang
+    Config.SPOOL_ENABLED = False
+    mqtt_pool.start()
+    queued = []
+
+    def emit(imei, records, keys):
+        queued.append((imei, records))
+
+    try:
+        # Koneksi dibuka di background; publish sebelum tersambung akan gagal
+        try:
+            await asyncio.wait_for(
+                asyncio.gather(*(shard.connector.connected.wait() for shard in mqtt_pool.shards)),
+                args.connect_timeout,
+            )
+        except asyncio.TimeoutError:
+            logger.error("Broker MQTT %s:%d tidak tersambung dalam %.0f detik, %s tidak direplay",
+                         Config.MQTT_HOST, Config.MQTT_PORT, args.connect_timeout, path)
+            result["errors"]["mqtt_connect"] = result["errors"].get("mqtt_connect", 0) + 1
+            return
+        # Decode per potongan dan beri kesempatan publisher mengirim sebelum potongan berikutnya
+        iterator = frames(path, args)
+        while True:
+            chunk = []
+            for imei, frame in iterator:
+                chunk.append((imei, bytes(frame)))
+                if len(chunk) >= 1000:
+                    break
+            if not chunk:
+                break
+            replay_records(chunk, result, emit)
+            for imei, records in queued:
+                await mqtt_pool.submit(imei, records)
+            queued.clear()
+            await asyncio.sleep(0)
+    finally:
+        await mqtt_pool.stop()
+        stats = mqtt_pool.stats()
+        result["published_records"] = stats["published_records"]
+        result["dropped_records"] = stats["dropped_records"]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay/re-decode file capture frame mentah secara offline")
+    parser.add_argument("paths", nargs="+", help="File capture atau direktori berisi file capture")
+    parser.add_argument("--processes", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--sink", choices=SINKS, default="count",
+                        help="count = hanya decode dan hitung, jsonl = file JSON per baris, archive = file kolumnar, "
+                             "mqtt = publish ulang lewat konfigurasi MQTT di .env")
+    parser.add_argument("--output", default="replay", help="Direktori keluaran untuk sink jsonl/archive")
+    parser.add_argument("--imei", default="", help="Hanya IMEI dengan prefix ini")
+    parser.add_argument("--since", type=parse_time, help="Waktu diterima minimal (ISO 8601 UTC atau epoch ms)")
+    parser.add_argument("--until", type=parse_time, help="Waktu diterima maksimal, eksklusif")
+    parser.add_argument("--include-active", action="store_true", help="Ikut membaca file .tcap.active yang masih ditulis")
+    parser.add_argument("--columnar", action="store_true",
+                        help="Decode header GPS saja lewat jalur kolumnar NumPy (sink count/jsonl)")
+    parser.add_argument("--connect-timeout", type=float, default=30.0,
+                        help="Sink mqtt: batas waktu (detik) menunggu semua koneksi broker tersambung")
+    parser.add_argument("--summary", help="Simpan ringkasan sebagai JSON")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    if args.columnar and args.sink in ("archive", "mqtt"):
+        parser.error("--columnar hanya untuk sink count atau jsonl")
+
+    files = capture_files(args.paths, args.include_active)
+    if not files:
+        raise SystemExit("Tidak ada file capture yang ditemukan")
+    processes = max(1, min(args.processes, len(files)))
+    logger.info("Replay %d file capture dengan %d process, sink %s", len(files), processes, args.sink)
+
+    start = time.perf_counter()
+    totals = {"files": 0, "frames": 0, "records": 0, "errors": {}}
+    if args.sink == "mqtt":
+        totals["published_records"] = totals["dropped_records"] = 0
+    if processes == 1:
+        results = (replay_file(path, args) for path in files)
+        pool = None
+    else:
+        # spawn: sama dengan process pool decode di server, aman dipakai bersama thread/event loop
+        pool = multiprocessing.get_context("spawn").Pool(processes)
+        results = pool.imap_unordered(_replay_file, [(path, args) for path in files])
+    try:
+        for result in results:
+            totals["files"] += 1
+            totals["frames"] += result["frames"]
+            totals["records"] += result["records"]
+            if args.sink == "mqtt":
+                totals["published_records"] += result.get("published_records", 0)
+                totals["dropped_records"] += result.get("dropped_records", 0)
+            for reason, count in result["errors"].items():
+                totals["errors"][reason] = totals["errors"].get(reason, 0) + count
+            logger.info("%s: %d frame, %d record dalam %.2f detik",
+                        result["file"], result["frames"], result["records"], result["seconds"])
+    finally:
+        if pool is not None:
+            pool.close()
+            pool.join()
+    elapsed = time.perf_counter() - start
+    totals["seconds"] = round(elapsed, 3)
+    totals["records_per_second"] = round(totals["records"] / elapsed) if elapsed > 0 else 0
+
+    print(json.dumps(totals, indent=2))
+    if args.summary:
+        with open(args.summary, "w", encoding="utf-8") as f:
+            json.dump(totals, f, indent=2)
+    if totals.get("dropped_records") or "mqtt_connect" in totals["errors"]:
+        # Replay mqtt yang tidak lengkap harus terlihat gagal supaya bisa diulang
+        raise SystemExit(1)
+
+
+def _replay_file(task):
+    return replay_file(*task)
+
+
+if __name__ == "__main__":
+    main()
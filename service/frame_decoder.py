@@ -0,0 +1,121 @@
+import struct
+import time
+from parser.codec8 import ParseRawCodec8
+from parser.codec8e import ParseRawCodec8e
+from parser.model_json import TeltonikaPayloadMapper
+from utils.crc import CRC16ARC
+from utils.dedup import record_key
+from utils.record_filter import RecordFilter
+from utils.log import get_logger
+
+logger = get_logger("codec")
+
+UINT32 = struct.Struct(">I")
+
+PARSERS = {
+    0x08: (ParseRawCodec8, "Codec 8"),
+    0x8E: (ParseRawCodec8e, "Codec 8 Extended"),
+}
+
+
+class DecodedFrame:
+    # Hasil decode satu frame; ikut di-pickle balik dari process pool, jadi metric dicatat oleh pemanggil
+    # error: None, "short", "unknown_codec", "crc" atau "decode"
+    # keys: record_key() tiap record di payload (urutan sama), duplicates: record dikirim ulang yang dibuang
+    # filtered: {aturan: jumlah} record yang dibuang filter, last_fix: state speed_jump terbaru untuk IMEI ini
+    # events: event_io_id tiap record di payload (tidak ikut hasil mapping), dipakai penyederhanaan lintasan
+    # received_keys: key semua record baru (setelah dedup, sebelum filter), dicatat di indeks dedup
+
+    __slots__ = (
+        "codec_id", "num_data_1", "payload", "error", "decode_seconds", "mapping_seconds", "keys", "duplicates",
+        "filtered", "last_fix", "events", "received_keys",
+    )
+
+    def __init__(self, codec_id=None, num_data_1=None, payload=None, error=None,
+                 decode_seconds=0.0, mapping_seconds=0.0, keys=(), duplicates=0, filtered=None, last_fix=None,
+                 events=(), received_keys=()):
+        self.codec_id = codec_id
+        self.num_data_1 = num_data_1
+        self.payload = payload
+        self.error = error
+        self.decode_seconds = decode_seconds
+        self.mapping_seconds = mapping_seconds
+        self.keys = keys
+        self.duplicates = duplicates
+        self.filtered = filtered
+        self.last_fix = last_fix
+        self.events = events
+        self.received_keys = received_keys
+
+
+def decode_frame(raw_data, imei_str: str, mapper_key, seen=None, filter_key=None, last_fix=None) -> DecodedFrame:
+    # Decode + mapping satu frame AVL secara sinkron. Modul ini sengaja tidak mengimpor MQTT
+    # supaya ringan di-import oleh process pool.
+    # seen: key dedup yang sudah dipublish untuk IMEI ini (None = dedup nonaktif); record yang
+    # dikirim ulang dibuang sebelum mapping.
+    # filter_key: argumen RecordFilter.for_config (None = filter nonaktif), last_fix: state speed_jump IMEI ini.
+    if len(raw_data) < 8:
+        return DecodedFrame(error="short")
+    data_field_length = UINT32.unpack_from(raw_data, 4)[0]
+    logger.debug("Data Field Length: %d bytes (IMEI: %s)", data_field_length, imei_str)
+
+    avl_data = raw_data[8:]
+    if len(avl_data) < data_field_length or len(avl_data) < 7:
+        return DecodedFrame(error="short")
+
+    codec_id = avl_data[0]
+    num_data_1 = avl_data[1]
+
+    parser = PARSERS.get(codec_id)
+    if parser is None:
+        logger.warning("Codec ID %#x tidak dikenali (IMEI: %s).", codec_id, imei_str)
+        return DecodedFrame(codec_id, num_data_1, error="unknown_codec")
+    parser, codec_name = parser
+
+    start = time.perf_counter()
+    crc_received = UINT32.unpack_from(avl_data, len(avl_data) - 4)[0]
+    if not CRC16ARC.verify(avl_data[:-4], crc_received):
+        logger.warning("CRC tidak valid untuk %s (IMEI: %s).", codec_name, imei_str)
+        return DecodedFrame(codec_id, num_data_1, error="crc")
+    logger.debug("CRC valid untuk %s.", codec_name)
+
+    try:
+        parsed_data = parser.decode(avl_data[2:-5], num_data_1, imei_str)
+    except Exception as e:
+        logger.error("Error saat parsing %s (IMEI: %s): %s", codec_name, imei_str, e)
+        return DecodedFrame(codec_id, num_data_1, error="decode")
+    decoded = time.perf_counter()
+
+    # keys sejajar dengan payload: dipakai dedup dan cache state (timestamp/priority per record)
+    keys = [record_key(data.timestamp_ms, data.priority) for data in parsed_data]
+    duplicates = 0
+    if seen is not None:
+        unique = set()
+        fresh, fresh_keys = [], []
+        for data, key in zip(parsed_data, keys):
+            if key in seen or key in unique:
+                continue
+            unique.add(key)
+            fresh.append(data)
+            fresh_keys.append(key)
+        duplicates = len(parsed_data) - len(fresh)
+        parsed_data, keys = fresh, fresh_keys
+
+    # Record yang dibuang filter tetap dicatat di dedup, supaya kiriman ulang tidak difilter dan dihitung dua kali
+    received_keys = keys
+    filtered = None
+    if filter_key is not None and parsed_data:
+        # Fix sampah dibuang dari field numerik mentah, sebelum mapping/serialisasi
+        parsed_data, keys, filtered, last_fix = RecordFilter.for_config(*filter_key).apply(
+            parsed_data, keys, last_fix, int(time.time() * 1000)
+        )
+
+    payload_mapper = TeltonikaPayloadMapper.for_profile(*mapper_key)
+    mqtt_payload = [payload_mapper.map(imei_str, data) for data in parsed_data]
+
+    return DecodedFrame(
+        codec_id, num_data_1, mqtt_payload,
+        decode_seconds=decoded - start, mapping_seconds=time.perf_counter() - decoded,
+        keys=keys, duplicates=duplicates, filtered=filtered, last_fix=last_fix,
+        events=[data.event_io_id for data in parsed_data], received_keys=received_keys,
+    )
@@ -1,71 +1,211 @@
-import asyncio
-import struct
-import json
-from datetime import datetime, timezone, timedelta
-from parser.codec8 import ParseRawCodec8
-from parser.codec8e import ParseRawCodec8e
 from parser.model_json import TeltonikaPayloadMapper
-from config.mqtt import mqtt_connector
+from config.config import Config
+from config.mqtt import mqtt_pool
+from config.archive import archive_sink
+from service.frame_decoder import decode_frame
+from utils.offload import Offloader
+from utils.dedup import DedupIndex
+from utils.state_cache import StateCache, DEFAULT_DEADBANDS, parse_deadbands
+from utils.record_filter import RecordFilter, LastFixes, parse_rules
+from utils.geofence import GeofenceEngine
+from utils.trips import TripAggregator
+from utils.trajectory import TrajectorySimplifier
+from utils.log import get_logger
+from utils.metrics import (
+    CODEC_LABELS, frames_total, records_total, frame_errors_total, unknown_codec_total,
+    decode_seconds, mapping_seconds, offloaded_frames_total, duplicate_records_total, duplicate_frames_total,
+    suppressed_records_total, filtered_records_total,
+)
+
+logger = get_logger("codec")
+
+# Child metric per codec/alasan diambil sekali di sini, bukan per frame
+FRAME_COUNTERS = {codec_id: frames_total.labels(label) for codec_id, label in CODEC_LABELS.items()}
+RECORD_COUNTERS = {codec_id: records_total.labels(label) for codec_id, label in CODEC_LABELS.items()}
+DECODE_HISTOGRAMS = {codec_id: decode_seconds.labels(label) for codec_id, label in CODEC_LABELS.items()}
+ERROR_COUNTERS = {reason: frame_errors_total.labels(reason) for reason, in frame_errors_total.children}
+FILTER_COUNTERS = {rule: filtered_records_total.labels(rule) for rule, in filtered_records_total.children}
 
 
 class TeltonikaHandler:
     def __init__(self):
-        self.payload_mapper = TeltonikaPayloadMapper()
-
-    async def handle_raw_data(self, raw_data: bytes, imei_str: str, writer):
-        if len(raw_data) >= 8:
-            data_field_length = struct.unpack(">I", raw_data[4:8])[0]
-            print(f"\nData Field Length: {data_field_length} bytes")
-
-            avl_data = raw_data[8:]
-            if len(avl_data) >= data_field_length:
-                codec_id = avl_data[0]
-                num_data_1 = avl_data[1]
-
-                crc_received = struct.unpack(">I", avl_data[-4:])[0]
-
-                avl_content = avl_data[2:-5]
-                crc_data = avl_data[:-4]
-
-                if codec_id == 0x08:
-                    task = asyncio.create_task(ParseRawCodec8.parse_codec8(self,avl_content, num_data_1, imei_str, crc_data, crc_received))
-                elif codec_id == 0x8E:
-                    task = asyncio.create_task(ParseRawCodec8e.parse_avl_data_codec8e(self,avl_content, num_data_1, imei_str, crc_data, crc_received))
-                else:
-                    print(f"Codec ID {hex(codec_id)} tidak dikenali.")
-                    return None
-
-                parsed_data = await task
-
-            mqtt_payload = []
-            for data in parsed_data:
-                #if not await self.is_valid_avl_data(data):
-                 # continue  
-
-                mapped_data = TeltonikaPayloadMapper.map_teltonika_to_json_payload(imei_str, data)
-                mqtt_payload.append(mapped_data)
-
-            if mqtt_payload:
-                mqtt_payload_json = json.dumps(mqtt_payload)
-                await mqtt_connector.publish("topic/data", mqtt_payload_json)
-
-            return num_data_1
-
-        return None
-    
-    async def is_valid_avl_data(self, data: dict) -> bool:
-        if data.get("latitude") == 0.0 and data.get("longitude") == 0.0:
-            print(f"log not inserted. device initializing position at latitude {data['latitude']}, longitude {data['longitude']}")
-            return False
-
-        if "timestamp" in data:
-            try:
-                timestamp = datetime.fromisoformat(data["timestamp"].replace("Z", "+00:00"))
-                if timestamp >= datetime.now(timezone.utc) + timedelta(days=1):
-                    print("log not inserted. timestamp on device not initialized")
-                    return False
-            except Exception as e:
-                print(f"timestamp parse error: {e}")
-                return False
-
-        return True
+        self.mapper_key = (Config.MAPPING_PROFILE, Config.PAYLOAD_RAW_MODE, Config.TIMESTAMP_FORMAT)
+        self.payload_mapper = TeltonikaPayloadMapper.for_profile(*self.mapper_key)
+        self.offloader = Offloader(Config.OFFLOAD_EXECUTOR, Config.OFFLOAD_WORKERS)
+        rules = parse_rules(Config.FILTER_RULES)
+        self.filter_key = (
+            rules, Config.FILTER_MAX_FUTURE, Config.FILTER_MIN_TIMESTAMP, Config.FILTER_MIN_SATELLITES,
+            Config.FILTER_MAX_SPEED, Config.FILTER_KEEP_PRIORITY,
+        ) if rules else None
+        if self.filter_key is not None:
+            # Dikompilasi sekarang supaya konfigurasi yang salah gagal saat start, bukan di frame pertama
+            RecordFilter.for_config(*self.filter_key)
+        # Fix terakhir yang lolos per IMEI untuk aturan speed_jump
+        self.last_fixes = LastFixes(Config.FILTER_STATE_TTL) if "speed_jump" in rules else None
+        self.dedup = DedupIndex(Config.DEDUP_TTL, Config.DEDUP_MAX_PER_DEVICE, Config.DEDUP_SNAPSHOT) if Config.DEDUP_ENABLED else None
+        # Deadband default digabung dengan STATE_DEADBANDS (yang belakangan menimpa)
+        self.state_cache = StateCache.for_mapper(
+            self.payload_mapper,
+            mode=Config.STATE_PUBLISH_MODE,
+            deadbands=parse_deadbands(DEFAULT_DEADBANDS + "," + Config.STATE_DEADBANDS),
+            min_interval=Config.STATE_MIN_INTERVAL,
+            heartbeat_interval=Config.STATE_HEARTBEAT_INTERVAL,
+            force_priority=Config.STATE_FORCE_PRIORITY,
+            idle_ttl=Config.STATE_IDLE_TTL,
+        ) if Config.STATE_PUBLISH_MODE != "all" else None
+        self.geofence = GeofenceEngine(
+            Config.GEOFENCE_FILE, Config.GEOFENCE_CELL_SIZE, Config.GEOFENCE_RELOAD_INTERVAL, Config.GEOFENCE_TOPIC_TEMPLATE,
+            Config.GEOFENCE_IDLE_TTL,
+        ) if Config.GEOFENCE_FILE else None
+        self.trips = TripAggregator.for_mapper(
+            self.payload_mapper,
+            gap=Config.TRIP_GAP,
+            interval=Config.TRIP_INTERVAL,
+            lateness=Config.TRIP_LATENESS,
+            idle_ttl=Config.TRIP_IDLE_TTL,
+            topic_template=Config.TRIP_TOPIC_TEMPLATE,
+        ) if Config.TRIP_ENABLED else None
+        self.trajectory = TrajectorySimplifier(
+            Config.TRAJECTORY_TOLERANCE,
+            angle=Config.TRAJECTORY_ANGLE,
+            max_points=Config.TRAJECTORY_MAX_POINTS,
+            max_interval=Config.TRAJECTORY_MAX_INTERVAL,
+            max_delay=Config.TRAJECTORY_MAX_DELAY,
+        ) if Config.TRAJECTORY_TOLERANCE > 0 else None
+        self.inline_frames = 0
+        self.offloaded_frames = 0
+        self.duplicate_records = 0
+        self.suppressed_records = 0
+        self.filtered_records = 0
+
+    def start(self, worker_id=None):
+        # Zona geofence dan snapshot dedup dimuat sebelum koneksi pertama
+        if self.geofence is not None:
+            self.geofence.start()
+        if self.trips is not None:
+            self.trips.start(self.publish_trips)
+        if self.last_fixes is not None:
+            self.last_fixes.start()
+        if self.state_cache is not None:
+            self.state_cache.start()
+        if self.trajectory is not None:
+            self.trajectory.start(self.publish_records)
+        if self.dedup is None:
+            return
+        # Mode multi-worker memakai file snapshot per worker
+        if worker_id is not None and self.dedup.snapshot_path:
+            self.dedup.snapshot_path = f"{Config.DEDUP_SNAPSHOT}.worker-{worker_id}"
+        self.dedup.start(Config.DEDUP_PRUNE_INTERVAL, Config.DEDUP_SNAPSHOT_INTERVAL)
+
+    async def handle_raw_data(self, raw_data: memoryview, imei_str: str, writer):
+        # Frame kecil didecode inline; frame besar (upload backlog) dipindah ke executor supaya
+        # ACK device lain tidak tertahan. Urutan per IMEI tetap terjaga karena pemanggil menunggu
+        # hasil frame ini sebelum membaca frame berikutnya dari koneksi yang sama.
+        seen = self.dedup.seen(imei_str) if self.dedup is not None else None
+        last_fix = self.last_fixes.get(imei_str) if self.last_fixes is not None else None
+        if self.offloader.enabled and len(raw_data) >= Config.OFFLOAD_THRESHOLD_BYTES:
+            frame = bytes(raw_data) if self.offloader.needs_copy else raw_data
+            if seen and self.offloader.needs_copy:
+                # Di-pickle oleh thread executor; salin dulu supaya tidak bentrok dengan add() di event loop
+                seen = frozenset(seen)
+            result = await self.offloader.run(
+                decode_frame, frame, imei_str, self.mapper_key, seen, self.filter_key, last_fix
+            )
+            self.offloaded_frames += 1
+            offloaded_frames_total.inc()
+        else:
+            result = decode_frame(raw_data, imei_str, self.mapper_key, seen, self.filter_key, last_fix)
+            self.inline_frames += 1
+
+        if result.error is not None:
+            ERROR_COUNTERS[result.error].inc()
+            if result.error == "unknown_codec":
+                unknown_codec_total.labels(f"{result.codec_id:#04x}").inc()
+            return None
+
+        codec_id = result.codec_id
+        FRAME_COUNTERS[codec_id].inc()
+        filtered = sum(result.filtered.values()) if result.filtered else 0
+        RECORD_COUNTERS[codec_id].inc(len(result.payload) + result.duplicates + filtered)
+        DECODE_HISTOGRAMS[codec_id].observe(result.decode_seconds)
+        mapping_seconds.observe(result.mapping_seconds)
+
+        if result.duplicates:
+            # Batch dikirim ulang karena ACK sebelumnya hilang: tetap di-ACK, tapi tidak dipublish lagi
+            self.duplicate_records += result.duplicates
+            duplicate_records_total.inc(result.duplicates)
+            if not result.payload and not filtered:
+                duplicate_frames_total.inc()
+                logger.info("Frame duplikat dari IMEI %s (%d record) dibuang.", imei_str, result.duplicates)
+
+        if filtered:
+            self.filtered_records += filtered
+            for rule, count in result.filtered.items():
+                FILTER_COUNTERS[rule].inc(count)
+        if result.last_fix is not None and self.last_fixes is not None:
+            self.last_fixes.set(imei_str, result.last_fix)
+
+        payload = result.payload
+        # Arsip menyimpan histori lengkap, sebelum filter change-only
+        if archive_sink.enabled and payload:
+            archive_sink.submit(imei_str, payload, result.keys)
+        if self.geofence is not None and payload:
+            events = self.geofence.evaluate(imei_str, payload, result.keys)
+            if events:
+                await mqtt_pool.submit(imei_str, events, self.geofence.topic_for(imei_str))
+        if self.trips is not None and payload:
+            summaries = self.trips.add(imei_str, payload, result.keys)
+            if summaries:
+                await self.publish_trips(imei_str, summaries)
+        keys = result.keys
+        if self.trajectory is not None and payload:
+            # Geofence dan trip di atas tetap melihat semua titik; hanya publish posisi yang disederhanakan
+            payload, keys = self.trajectory.filter(imei_str, payload, keys, result.events)
+        if payload:
+            await self.publish_records(imei_str, payload, keys)
+        # Record yang tidak dipublish (state tidak berubah, lintasan disederhanakan, dibuang filter)
+        # tetap dicatat sebagai sudah diterima
+        if self.dedup is not None and result.received_keys:
+            self.dedup.add(imei_str, result.received_keys)
+
+        return result.num_data_1
+
+    async def publish_records(self, imei: str, payload, keys):
+        # Jalur publish record data, termasuk titik lintasan yang dilepas timer/shutdown
+        if self.state_cache is not None:
+            published = len(payload)
+            payload = self.state_cache.filter(imei, payload, keys)
+            suppressed = published - len(payload)
+            if suppressed:
+                self.suppressed_records += suppressed
+                suppressed_records_total.inc(suppressed)
+        if payload:
+            await mqtt_pool.submit(imei, payload)
+
+    async def publish_trips(self, imei: str, summaries):
+        await mqtt_pool.submit(imei, summaries, self.trips.topic_for(imei))
+
+    async def flush(self):
+        # Dipanggil saat shutdown sebelum antrian MQTT ditutup
+        if self.trajectory is not None:
+            for imei, records, keys in self.trajectory.flush(0):
+                await self.publish_records(imei, records, keys)
+        if self.trips is None:
+            return
+        for imei, summaries in self.trips.close_all():
+            await self.publish_trips(imei, summaries)
+
+    def close(self):
+        self.offloader.shutdown()
+        if self.geofence is not None:
+            self.geofence.stop()
+        if self.trips is not None:
+            self.trips.stop()
+        if self.trajectory is not None:
+            self.trajectory.stop()
+        if self.last_fixes is not None:
+            self.last_fixes.stop()
+        if self.state_cache is not None:
+            self.state_cache.stop()
+        if self.dedup is not None:
+            self.dedup.stop()
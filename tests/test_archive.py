@@ -0,0 +1,37 @@
+import os
+import subprocess
+import sys
+from config.archive import ArchiveSink, tmp_owner
+from utils.columnar_file import TcolFileWriter, read_tcol
+
+
+def dead_pid():
+    process = subprocess.Popen([sys.executable, "-c", "pass"])
+    process.wait()
+    return process.pid
+
+
+def write_tmp(directory, pid):
+    name = f"part-1700000000000-{pid}-000001.tcol"
+    path = os.path.join(directory, f".{name}.tmp")
+    writer = TcolFileWriter(path)
+    writer.write({"a": [1, 2]}, 2)
+    writer.close()
+    return path, os.path.join(directory, name)
+
+
+def test_tmp_owner():
+    assert tmp_owner(".part-1700000000000-4242-000001.parquet.tmp") == 4242
+    assert tmp_owner(".other.tmp") is None
+
+
+def test_recover_skips_files_of_live_workers(tmp_path):
+    directory = tmp_path / "date=2023-11-14" / "imei=3532"
+    directory.mkdir(parents=True)
+    live_tmp, live_final = write_tmp(str(directory), os.getppid())
+    dead_tmp, dead_final = write_tmp(str(directory), dead_pid())
+    ArchiveSink(str(tmp_path)).recover()
+    # File worker lain yang masih hidup tidak disentuh
+    assert os.path.exists(live_tmp) and not os.path.exists(live_final)
+    assert not os.path.exists(dead_tmp)
+    assert [list(chunk["a"]) for chunk in read_tcol(dead_final)] == [[1, 2]]
@@ -0,0 +1,23 @@
+import struct
+from parser.codec8 import ParseRawCodec8
+
+
+def codec8_record(groups):
+    # groups: 4 list (io_id, value) untuk grup 1B/2B/4B/8B
+    parts = [struct.pack(">QBiiHHBH", 1_700_000_000_000, 0, 1068000000, -62000000, 10, 90, 8, 40)]
+    parts.append(struct.pack(">BB", 0, sum(len(group) for group in groups)))
+    for group, value_format in zip(groups, "BHIQ"):
+        parts.append(struct.pack(">B", len(group)))
+        for io_id, value in group:
+            parts.append(struct.pack(f">B{value_format}", io_id, value))
+    return b"".join(parts)
+
+
+def test_to_dict_keeps_groups_with_duplicate_io_id():
+    groups = [[(1, 1), (21, 4)], [(66, 12000)], [(16, 5000), (21, 3)], [(78, 123456789)]]
+    record, = ParseRawCodec8.decode(codec8_record(groups), 1, "353201350385883")
+    io_data = record.to_dict()["io_data"]
+    assert [list(group.keys())[0] for group in io_data] == ["1B", "2B", "4B", "8B"]
+    assert [[(item["io_id"], item["value"]) for item in next(iter(group.values()))] for group in io_data] == groups
+    # Index flat menyimpan nilai terakhir
+    assert record.get(21) == 3
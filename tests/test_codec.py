@@ -0,0 +1,109 @@
+import struct
+import pytest
+from benchmark.packet_generator import AVLPacketGenerator
+from parser.codec8 import ParseRawCodec8
+from parser.codec8e import ParseRawCodec8e
+from service.frame_decoder import decode_frame
+from utils.crc import CRC16ARC
+from utils.dedup import record_key
+
+IMEI = "353201350385883"
+MAPPER_KEY = ("default", "full", "iso")
+
+
+def encode(record, extended):
+    # Encode ulang AVLRecord hasil decode ke bentuk wire, untuk dibandingkan dengan bytes generator
+    id_format = "H" if extended else "B"
+    count_format = ">H" if extended else ">B"
+    parts = [struct.pack(
+        ">QBiiHHBH", record.timestamp_ms, record.priority, round(record.longitude * 10**7),
+        round(record.latitude * 10**7), record.altitude, record.angle, record.satellites, record.speed,
+    )]
+    parts.append(struct.pack(f">{id_format}{id_format}", record.event_io_id, record.total_io))
+    for group, value_format in zip(record.io_groups, "BHIQ"):
+        parts.append(struct.pack(count_format, len(group)))
+        for io_id, value in group:
+            parts.append(struct.pack(f">{id_format}{value_format}", io_id, value))
+    if extended:
+        parts.append(struct.pack(">H", len(record.nx)))
+        for io_id, raw in record.nx.items():
+            parts.append(struct.pack(">HH", io_id, len(raw)) + raw)
+    return b"".join(parts)
+
+
+@pytest.mark.parametrize("codec_id, parser", [(0x08, ParseRawCodec8), (0x8E, ParseRawCodec8e)])
+def test_decode_round_trip(codec_id, parser):
+    generator = AVLPacketGenerator(seed=3)
+    records = [generator.record(codec_id) for _ in range(5)]
+    frame = generator.build_frame(codec_id, records)
+    decoded = parser.decode(frame[10:-5], len(records), IMEI)
+    assert len(decoded) == len(records)
+    for record, raw in zip(decoded, records):
+        assert record.imei == IMEI
+        assert encode(record, codec_id == 0x8E) == raw
+        assert [len(group) for group in record.io_groups] == list(generator.io_counts)
+    if codec_id == 0x8E:
+        assert all(len(record.nx) == generator.nx_count for record in decoded)
+
+
+@pytest.mark.parametrize("codec_id", [0x08, 0x8E])
+def test_decode_frame(codec_id):
+    generator = AVLPacketGenerator(seed=4, start_ms=1_700_000_000_000, interval_ms=1000)
+    frame = generator.frame(codec_id, 4)
+    decoded = decode_frame(frame, IMEI, MAPPER_KEY)
+    assert decoded.error is None
+    assert decoded.codec_id == codec_id and decoded.num_data_1 == 4
+    assert len(decoded.payload) == 4
+    assert [key >> 2 for key in decoded.keys] == [1_700_000_000_000 + 1000 * i for i in range(1, 5)]
+    assert all(record["imei"] == IMEI for record in decoded.payload)
+
+
+def test_decode_frame_crc_error():
+    frame = bytearray(AVLPacketGenerator(seed=5).frame(0x08, 2))
+    frame[20] ^= 0xFF
+    assert decode_frame(bytes(frame), IMEI, MAPPER_KEY).error == "crc"
+    assert decode_frame(bytes(6), IMEI, MAPPER_KEY).error == "short"
+
+
+def test_decode_frame_drops_duplicates():
+    generator = AVLPacketGenerator(seed=6)
+    records = [generator.record(0x08) for _ in range(3)]
+    frame = generator.build_frame(0x08, records + records[:1])
+    first = decode_frame(frame, IMEI, MAPPER_KEY, seen=())
+    assert len(first.payload) == 3 and first.duplicates == 1
+    again = decode_frame(frame, IMEI, MAPPER_KEY, seen=set(first.keys[:2]))
+    assert again.keys == first.keys[2:] and again.duplicates == 3
+    assert record_key(*struct.unpack_from(">QB", records[2])) == again.keys[0]
+
+
+@pytest.mark.parametrize("codec_id, parser", [(0x08, ParseRawCodec8), (0x8E, ParseRawCodec8e)])
+def test_truncated_record_raises(codec_id, parser):
+    generator = AVLPacketGenerator(seed=8)
+    records = [generator.record(codec_id) for _ in range(3)]
+    data = b"".join(records)
+    # Record terakhir terpotong: frame harus ditolak, bukan didecode sebagian
+    for cut in (5, len(records[-1]) - 3):
+        with pytest.raises(struct.error):
+            parser.decode(data[:-cut], 3, IMEI)
+
+
+def test_decode_frame_rejects_truncated_codec8():
+    generator = AVLPacketGenerator(seed=9)
+    records = [generator.record(0x08) for _ in range(2)]
+    # Jumlah record di header lebih banyak dari isi frame (CRC tetap valid)
+    body = bytes((0x08, 3)) + b"".join(records) + bytes((3,))
+    frame = struct.pack(">II", 0, len(body)) + body + struct.pack(">I", CRC16ARC.compute(body))
+    assert decode_frame(frame, IMEI, MAPPER_KEY).error == "decode"
+
+
+def test_filtered_records_are_reported_for_dedup():
+    generator = AVLPacketGenerator(seed=10)
+    frame = generator.frame(0x08, 3)
+    # low_satellites dengan batas 100 satelit dan keep_priority 3: semua record dibuang filter
+    filter_key = (("low_satellites",), 86400.0, "2015-01-01", 100, 250.0, 3)
+    first = decode_frame(frame, IMEI, MAPPER_KEY, seen=(), filter_key=filter_key)
+    assert first.payload == [] and first.filtered == {"low_satellites": 3}
+    assert len(first.received_keys) == 3
+    # Frame yang dikirim ulang dibuang dedup, tidak difilter dan dihitung lagi
+    again = decode_frame(frame, IMEI, MAPPER_KEY, seen=set(first.received_keys), filter_key=filter_key)
+    assert again.duplicates == 3 and not again.filtered and again.received_keys == []
@@ -0,0 +1,58 @@
+import pytest
+from benchmark.packet_generator import AVLPacketGenerator
+from parser.codec8 import ParseRawCodec8
+from parser.codec8e import ParseRawCodec8e
+
+np = pytest.importorskip("numpy")
+from parser.columnar import COLUMNS, decode_gps_batch, iso_timestamps  # noqa: E402
+
+IMEIS = ("353201350385883", "353201350385884")
+PARSERS = {0x08: ParseRawCodec8, 0x8E: ParseRawCodec8e}
+
+
+def loop_decode(frames):
+    # Referensi: decoder per record (jalur server)
+    records = []
+    for imei, frame in frames:
+        records.extend(PARSERS[frame[8]].decode(frame[10:-5], frame[9], imei))
+    return records
+
+
+def mixed_frames():
+    generator = AVLPacketGenerator(seed=13)
+    return [
+        (IMEIS[0], generator.frame(0x08, 4)),
+        (IMEIS[1], generator.frame(0x8E, 3)),
+        (IMEIS[0], generator.frame(0x8E, 1)),
+        (IMEIS[1], generator.frame(0x08, 5)),
+    ]
+
+
+def test_matches_loop_decoder():
+    frames = mixed_frames()
+    batch = decode_gps_batch(frames)
+    records = loop_decode(frames)
+    assert (batch.frames, batch.errors, len(batch)) == (4, 0, len(records))
+    names = [name for name, _ in COLUMNS]
+    for row, record in zip(batch.rows(), records):
+        assert row["imei"] == record.imei
+        for name in names:
+            assert row[name] == pytest.approx(getattr(record, name), abs=1e-9), name
+    assert iso_timestamps(batch["timestamp_ms"]) == [record.timestamp for record in records]
+    assert batch.imei_column().tolist() == [record.imei for record in records]
+
+
+def test_invalid_frames_are_skipped():
+    frames = mixed_frames()
+    corrupted = bytearray(frames[1][1])
+    corrupted[20] ^= 0xFF
+    truncated = frames[2][1][:-8]
+    batch = decode_gps_batch([frames[0], (IMEIS[1], bytes(corrupted)), (IMEIS[0], truncated), frames[3]])
+    records = loop_decode([frames[0], frames[3]])
+    assert (batch.frames, batch.errors) == (2, 2)
+    assert batch["timestamp_ms"].tolist() == [record.timestamp_ms for record in records]
+
+
+def test_empty_batch():
+    batch = decode_gps_batch([])
+    assert len(batch) == 0 and list(batch.rows()) == []
@@ -0,0 +1,60 @@
+import io
+import pytest
+from utils.columnar_file import TcolFileWriter, column_type, encode_chunk, read_chunks, read_tcol, recover_tcol
+
+
+def roundtrip(columns, rows):
+    return next(read_chunks(io.BytesIO(encode_chunk(columns, rows))))[1]
+
+
+def test_roundtrip_keeps_types_and_nulls():
+    columns = {
+        "speed": [10, None, 30],
+        "voltage": [12.5, 13, None],
+        "ignition": [True, None, False],
+        "vin": ["ABC", None, ""],
+        "empty": [None, None, None],
+        "odometer": [1, 2, 3],
+    }
+    decoded = roundtrip(columns, 3)
+    assert {name: list(values) for name, values in decoded.items()} == {
+        "speed": [10, None, 30],
+        "voltage": [12.5, 13.0, None],
+        "ignition": [True, None, False],
+        "vin": ["ABC", None, ""],
+        "empty": [None, None, None],
+        "odometer": [1, 2, 3],
+    }
+
+
+def test_column_type_ignores_nulls():
+    assert column_type([1, None]) == b"q"
+    assert column_type([1, 2.5, None]) == b"d"
+    assert column_type([1 << 64 - 1, None]) == b"Q"
+    assert column_type([None]) == b"s"
+
+
+def test_recover_truncates_partial_chunk(tmp_path):
+    path = str(tmp_path / ".part.tcol.tmp")
+    writer = TcolFileWriter(path)
+    writer.write({"a": [1, 2]}, 2)
+    writer.write({"a": [3, None]}, 2)
+    writer.close()
+    with open(path, "ab") as f:
+        f.write(encode_chunk({"a": [5]}, 1)[:-3])
+    assert recover_tcol(path) == 4
+    assert [list(chunk["a"]) for chunk in read_tcol(path)] == [[1, 2], [3, None]]
+
+
+def test_parquet_keeps_nulls(tmp_path):
+    pyarrow = pytest.importorskip("pyarrow")
+    import pyarrow.parquet
+    from utils.columnar_file import ParquetFileWriter
+
+    path = str(tmp_path / "part.parquet")
+    writer = ParquetFileWriter(path)
+    writer.write({"speed": [10, None], "vin": [None, "ABC"]}, 2)
+    writer.close()
+    table = pyarrow.parquet.read_table(path)
+    assert table.schema.field("speed").type == pyarrow.int64()
+    assert table.to_pydict() == {"speed": [10, None], "vin": [None, "ABC"]}
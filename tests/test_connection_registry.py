@@ -0,0 +1,113 @@
+import asyncio
+from controller.connection_registry import ConnectionRegistry
+
+IMEI = "353201350385883"
+
+
+class FakeWriter:
+    def __init__(self):
+        self.closed = False
+
+    def close(self):
+        self.closed = True
+
+
+def run(coroutine):
+    return asyncio.run(asyncio.wait_for(coroutine, 5))
+
+
+def test_admission_limit_and_drain():
+    async def scenario():
+        registry = ConnectionRegistry(max_connections=2, sweep_interval=60)
+        first = registry.admit("a", FakeWriter(), 10)
+        second = registry.admit("b", FakeWriter(), 10)
+        rejected = registry.admit("c", FakeWriter(), 10)
+        second.busy = True
+        registry.unregister(first)
+        remaining = await registry.drain(0.1)
+        after_drain = registry.admit("d", FakeWriter(), 10)
+        registry.stop()
+        return first, second, rejected, remaining, after_drain
+
+    first, second, rejected, remaining, after_drain = run(scenario())
+    assert first is not None and rejected is None and after_drain is None
+    # Sesi yang sedang memproses frame tidak ditutup paksa saat drain
+    assert second.closing == "drain" and not second.writer.closed
+    assert remaining == 1
+
+
+def test_sweeper_deadlines():
+    async def scenario():
+        registry = ConnectionRegistry(sweep_interval=0.01)
+        loop = asyncio.get_running_loop()
+        login = registry.admit("a", FakeWriter(), 0.02)
+        idle = registry.admit("b", FakeWriter(), 10)
+        await registry.register(idle, IMEI, 1)
+        partial = registry.admit("c", FakeWriter(), 10)
+        await registry.register(partial, "353201350385884", 1)
+        partial.in_frame = True
+        busy = registry.admit("d", FakeWriter(), 0.02)
+        busy.busy = True
+        idle.deadline = partial.deadline = loop.time() + 0.02
+        await asyncio.sleep(0.1)
+        registry.stop()
+        return login, idle, partial, busy
+
+    login, idle, partial, busy = run(scenario())
+    assert (login.closing, idle.closing, partial.closing) == ("login_timeout", "idle_timeout", "frame_timeout")
+    assert login.writer.closed and idle.writer.closed and partial.writer.closed
+    assert busy.closing is None and not busy.writer.closed
+
+
+def test_duplicate_session_replaces_idle_session():
+    async def scenario():
+        registry = ConnectionRegistry(sweep_interval=60)
+        old = registry.admit("a", FakeWriter(), 10)
+        await registry.register(old, IMEI, 1)
+        new = registry.admit("b", FakeWriter(), 10)
+        await registry.register(new, IMEI, 1)
+        registry.unregister(old)
+        registry.stop()
+        return registry, old, new
+
+    registry, old, new = run(scenario())
+    assert old.closing == "duplicate" and old.writer.closed
+    # Sesi lama yang selesai belakangan tidak menghapus sesi baru dari indeks
+    assert registry.sessions == {IMEI: new} and len(registry) == 1
+
+
+def test_duplicate_session_waits_for_busy_session():
+    async def scenario():
+        registry = ConnectionRegistry(sweep_interval=60)
+        old = registry.admit("a", FakeWriter(), 10)
+        await registry.register(old, IMEI, 1)
+        old.busy = True
+        new = registry.admit("b", FakeWriter(), 10)
+        register = asyncio.create_task(registry.register(new, IMEI, 1))
+        await asyncio.sleep(0.05)
+        waiting = not register.done()
+        # Loop baca sesi lama menyelesaikan frame (ACK) lalu menutup koneksinya
+        old.busy = False
+        registry.unregister(old)
+        await register
+        registry.stop()
+        return old, waiting
+
+    old, waiting = run(scenario())
+    assert waiting
+    assert old.closing == "duplicate" and not old.writer.closed
+
+
+def test_duplicate_session_wait_times_out():
+    async def scenario():
+        registry = ConnectionRegistry(sweep_interval=60)
+        old = registry.admit("a", FakeWriter(), 10)
+        await registry.register(old, IMEI, 1)
+        old.busy = True
+        new = registry.admit("b", FakeWriter(), 10)
+        await registry.register(new, IMEI, 0.05)
+        registry.stop()
+        return registry, new
+
+    registry, new = run(scenario())
+    assert registry.sessions[IMEI] is new
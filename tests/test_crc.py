@@ -0,0 +1,31 @@
+from utils.crc import CRC16ARC
+
+# Contoh frame Codec 8 dari dokumentasi Teltonika (data field + CRC 0xC7CF)
+TELTONIKA_FRAME = bytes.fromhex(
+    "000000000000003608010000016B40D8EA30010000000000000000000000000000000105021503010101425E0F01F10000601A"
+    "014E0000000000000000010000C7CF"
+)
+
+
+def test_check_value():
+    assert CRC16ARC.compute(b"123456789") == 0xBB3D
+    assert CRC16ARC.compute(b"") == 0
+
+
+def test_teltonika_frame():
+    data = TELTONIKA_FRAME[8:-4]
+    crc = int.from_bytes(TELTONIKA_FRAME[-4:], "big")
+    assert CRC16ARC.compute(data) == crc == 0xC7CF
+    assert CRC16ARC.verify(data, crc)
+    assert CRC16ARC.verify(memoryview(data), crc)
+    assert not CRC16ARC.verify(data[:-1] + b"\x02", crc)
+
+
+def test_incremental_matches_one_shot():
+    data = bytes(range(256)) * 3
+    crc = CRC16ARC()
+    for start in range(0, len(data), 37):
+        crc.update(data[start:start + 37])
+    assert crc.digest() == CRC16ARC.compute(data)
+    crc.reset()
+    assert crc.update(b"123456789").digest() == 0xBB3D
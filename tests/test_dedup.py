@@ -0,0 +1,58 @@
+from utils.dedup import DedupIndex, record_key, split_key
+
+IMEI = "353201350385883"
+
+
+def test_record_key():
+    key = record_key(1_700_000_000_123, 2)
+    assert split_key(key) == (1_700_000_000_123, 2)
+    assert record_key(1000, 0) < record_key(1000, 1) < record_key(1001, 0)
+
+
+def test_add_and_seen():
+    dedup = DedupIndex(ttl=60, max_per_device=100)
+    assert 5 not in dedup.seen(IMEI)
+    dedup.add(IMEI, [1, 2, 3])
+    dedup.add(IMEI, [3, 4])
+    dedup.add(IMEI, [])
+    assert set(dedup.seen(IMEI)) == {1, 2, 3, 4}
+    assert dedup.entries == 4 and len(dedup) == 1
+
+
+def test_max_per_device_keeps_newest():
+    dedup = DedupIndex(ttl=60, max_per_device=8)
+    dedup.add(IMEI, range(9))
+    known = dedup.seen(IMEI)
+    assert list(known) == list(range(3, 9))
+    assert dedup.entries == 6
+
+
+def test_prune():
+    dedup = DedupIndex(ttl=60, max_per_device=100)
+    dedup.add(IMEI, [1, 2])
+    dedup.add("other", [1])
+    dedup.devices[IMEI][1] -= 120
+    assert dedup.prune() == 1
+    assert list(dedup.seen(IMEI)) == [2]
+    assert dedup.prune(now=dedup.devices[IMEI][2] + 61) == 2
+    assert len(dedup) == 0 and dedup.entries == 0
+
+
+def test_snapshot_round_trip(tmp_path):
+    path = str(tmp_path / "dedup" / "snapshot.bin")
+    dedup = DedupIndex(ttl=3600, max_per_device=100, snapshot_path=path)
+    dedup.add(IMEI, [record_key(1_700_000_000_000 + i, i % 3) for i in range(10)])
+    dedup.add("353201350385884", [record_key(1_700_000_000_000, 0)])
+    dedup.save()
+    restored = DedupIndex(ttl=3600, max_per_device=100, snapshot_path=path)
+    restored.load()
+    assert restored.devices == dedup.devices
+    assert restored.entries == 11
+
+
+def test_corrupt_snapshot_starts_empty(tmp_path):
+    path = tmp_path / "snapshot.bin"
+    path.write_bytes(b"TDDP\x00\x01\x00\x0f\x00\x00\x00\x05abc")
+    dedup = DedupIndex(ttl=3600, max_per_device=100, snapshot_path=str(path))
+    dedup.load()
+    assert len(dedup) == 0 and dedup.entries == 0
@@ -0,0 +1,59 @@
+import pytest
+from benchmark.packet_generator import AVLPacketGenerator
+from utils.frame_assembler import AVLFrameAssembler, FrameError
+
+
+def collect(assembler):
+    frames = []
+    for frame in assembler.frames():
+        with frame:
+            frames.append(bytes(frame))
+    assembler.trim()
+    return frames
+
+
+def test_frame_split_across_feeds():
+    frame = AVLPacketGenerator(seed=1).frame(0x08, 3)
+    assembler = AVLFrameAssembler(4096)
+    frames = []
+    for i in range(len(frame)):
+        assembler.feed(frame[i:i + 1])
+        frames += collect(assembler)
+        if i < len(frame) - 1:
+            assert not frames
+    assert frames == [frame]
+    assert assembler.pending() == 0
+
+
+def test_concatenated_frames():
+    generator = AVLPacketGenerator(seed=2)
+    sent = [generator.frame(0x08, 2), generator.frame(0x8E, 1), generator.frame(0x08, 5)]
+    data = b"".join(sent)
+    assembler = AVLFrameAssembler(4096)
+    # Dua setengah frame pertama dalam satu chunk, sisanya di chunk kedua
+    cut = len(sent[0]) + len(sent[1]) + 10
+    assembler.feed(data[:cut])
+    frames = collect(assembler)
+    assert frames == sent[:2]
+    assert assembler.pending() == 10
+    assembler.feed(data[cut:])
+    assert collect(assembler) == sent[2:]
+    assert assembler.pending() == 0
+
+
+def test_invalid_preamble():
+    assembler = AVLFrameAssembler(4096)
+    assembler.feed(b"\x00\x00\x00\x01" + bytes(12))
+    with pytest.raises(FrameError):
+        collect(assembler)
+
+
+def test_invalid_length():
+    assembler = AVLFrameAssembler(64)
+    assembler.feed(bytes(4) + (1000).to_bytes(4, "big"))
+    with pytest.raises(FrameError):
+        collect(assembler)
+    assembler = AVLFrameAssembler(64)
+    assembler.feed(bytes(4) + (2).to_bytes(4, "big"))
+    with pytest.raises(FrameError):
+        collect(assembler)
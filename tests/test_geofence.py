@@ -0,0 +1,110 @@
+import asyncio
+import json
+import os
+import pytest
+from utils.dedup import record_key
+from utils.geofence import GeofenceEngine, load_zones
+
+SQUARE = {
+    "type": "Feature", "id": "depot",
+    "properties": {"name": "Depot"},
+    "geometry": {"type": "Polygon", "coordinates": [[[106.0, -6.0], [106.1, -6.0], [106.1, -6.1], [106.0, -6.1], [106.0, -6.0]]]},
+}
+CIRCLE = {
+    "type": "Feature", "id": "pool",
+    "properties": {"radius": 500},
+    "geometry": {"type": "Point", "coordinates": [107.0, -6.5]},
+}
+
+
+def write_zones(tmp_path, document):
+    path = tmp_path / "zones.json"
+    path.write_text(json.dumps(document))
+    return str(path)
+
+
+def record(timestamp_ms, latitude, longitude):
+    return {"timestamp": timestamp_ms, "latitude": latitude, "longitude": longitude, "speed": 10}
+
+
+def evaluate(engine, positions, imei="353201350385883"):
+    payload = [record(1_700_000_000_000 + i * 1000, *position) for i, position in enumerate(positions)]
+    return engine.evaluate(imei, payload, [record_key(item["timestamp"], 0) for item in payload])
+
+
+@pytest.mark.parametrize("document", [5, "zones", {"features": 3}, {"type": "FeatureCollection"}])
+def test_load_zones_rejects_bad_shape(tmp_path, document):
+    with pytest.raises(ValueError):
+        load_zones(write_zones(tmp_path, document))
+
+
+def test_load_zones_skips_invalid_features(tmp_path):
+    zones = load_zones(write_zones(tmp_path, {"features": [SQUARE, CIRCLE, 3, {"id": "x", "geometry": {"type": "Line"}}]}))
+    assert sorted(zones) == ["depot", "pool"]
+
+
+def test_enter_and_exit_events(tmp_path):
+    engine = GeofenceEngine(write_zones(tmp_path, {"features": [SQUARE, CIRCLE]}))
+    engine.reload()
+    # Posisi pertama hanya mengisi state
+    assert evaluate(engine, [(-6.2, 106.05)]) == []
+    events = evaluate(engine, [(-6.05, 106.05), (-6.05, 106.06), (-6.2, 106.05), (-6.5, 107.001)])
+    assert [(event["event"], event["zone_id"]) for event in events] == [
+        ("enter", "depot"), ("exit", "depot"), ("enter", "pool"),
+    ]
+    assert events[0]["zone_name"] == "Depot"
+
+
+def test_late_record_does_not_change_state(tmp_path):
+    engine = GeofenceEngine(write_zones(tmp_path, [SQUARE]))
+    engine.reload()
+    imei = "353201350385883"
+    engine.evaluate(imei, [record(2_000, -6.2, 106.05)], [record_key(2_000, 0)])
+    assert engine.evaluate(imei, [record(1_000, -6.05, 106.05)], [record_key(1_000, 0)]) == []
+    events = engine.evaluate(imei, [record(3_000, -6.05, 106.05)], [record_key(3_000, 0)])
+    assert [event["event"] for event in events] == ["enter"]
+
+
+def test_bad_reload_keeps_previous_zones(tmp_path):
+    path = write_zones(tmp_path, [SQUARE])
+    engine = GeofenceEngine(path)
+    engine.reload()
+    with open(path, "w") as f:
+        f.write("5")
+    with pytest.raises(ValueError):
+        engine.reload()
+    assert list(engine.zones) == ["depot"]
+
+
+def test_prune_idle_devices(tmp_path):
+    engine = GeofenceEngine(write_zones(tmp_path, [SQUARE]), idle_ttl=60)
+    engine.reload()
+    imei = "353201350385883"
+    engine.evaluate(imei, [record(1_000, -6.05, 106.05)], [record_key(1_000, 0)])
+    engine.evaluate("other", [record(1_000, -6.2, 106.05)], [record_key(1_000, 0)])
+    engine.topic_for(imei)
+    engine.devices[imei].updated -= 120
+    assert engine.prune() == 1
+    assert list(engine.devices) == ["other"] and imei not in engine.topics
+    # Device yang kembali diperlakukan seperti posisi pertama
+    assert engine.evaluate(imei, [record(2_000, -6.2, 106.05)], [record_key(2_000, 0)]) == []
+
+
+def test_maintain_reloads_and_prunes(tmp_path):
+    path = write_zones(tmp_path, [SQUARE])
+
+    async def scenario():
+        engine = GeofenceEngine(path, reload_interval=0.05, idle_ttl=0.5)
+        engine.start()
+        engine.evaluate("353201350385883", [record(1_000, -6.05, 106.05)], [record_key(1_000, 0)])
+        write_zones(tmp_path, [SQUARE, CIRCLE])
+        os.utime(path, ns=(0, 10**18))
+        await asyncio.sleep(0.2)
+        reloaded = sorted(engine.zones)
+        await asyncio.sleep(1.2)
+        engine.stop()
+        return reloaded, len(engine.devices)
+
+    reloaded, devices = asyncio.run(scenario())
+    assert reloaded == ["depot", "pool"]
+    assert devices == 0
@@ -0,0 +1,47 @@
+import logging
+from utils.log import RateLimitFilter, SampleFilter
+
+
+class ListHandler(logging.Handler):
+    def __init__(self):
+        super().__init__()
+        self.messages = []
+
+    def emit(self, record):
+        self.messages.append(record.getMessage())
+
+
+def make_logger(name, *filters):
+    logger = logging.getLogger(name)
+    logger.propagate = False
+    logger.setLevel(logging.DEBUG)
+    handlers = [ListHandler(), ListHandler()]
+    for handler in handlers:
+        # Instance filter yang sama di dua handler, seperti FileHandler + StreamHandler di index.py
+        for log_filter in filters:
+            handler.addFilter(log_filter)
+        logger.addHandler(handler)
+    return logger, handlers
+
+
+def test_sample_filter_shared_by_handlers():
+    logger, handlers = make_logger("teltonika.test_sample", SampleFilter(2))
+    for i in range(10):
+        logger.info("record %d", i)
+    logger.warning("peringatan")
+    expected = [f"record {i}" for i in range(1, 10, 2)] + ["peringatan"]
+    assert [handler.messages for handler in handlers] == [expected, expected]
+
+
+def test_rate_limit_shared_by_handlers():
+    rate_limit = RateLimitFilter(interval=3600, burst=3)
+    logger, handlers = make_logger("teltonika.test_rate", rate_limit)
+    for i in range(10):
+        logger.info("frame %d", i)
+    expected = ["frame 0", "frame 1", "frame 2"]
+    assert [handler.messages for handler in handlers] == [expected, expected]
+    # Setelah window habis, record berikutnya membawa jumlah pesan yang disembunyikan
+    for window in rate_limit.windows.values():
+        window[0] -= 3600
+    logger.info("frame %d", 10)
+    assert handlers[0].messages[-1] == handlers[1].messages[-1] == "frame 10 (7 pesan serupa disembunyikan)"
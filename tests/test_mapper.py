@@ -0,0 +1,87 @@
+import json
+import pytest
+from benchmark.packet_generator import AVLPacketGenerator
+from parser.codec8 import ParseRawCodec8
+from parser.codec8e import ParseRawCodec8e
+from parser.model_json import TeltonikaPayloadMapper
+
+IMEI = "353201350385883"
+
+# Urutan field payload lama: (nama field, io_id); operate_status dan digital_input_2 berupa bool
+BASELINE_FIELDS = (
+    ("battery_voltage", 67), ("power_input", 66), ("fuel_level", 9), ("total_odometer", 16),
+    ("fuel_used_gps", 12), ("fuel_rate_gps", 13), ("operate_status", 1), ("digital_input_2", 2),
+    ("gsm_signal", 21), ("ignition_on_counter", 449), ("engine_load", 31), ("coolant_temp", 32),
+    ("short_fuel_trim", 33), ("fuel_pressure", 34), ("intake_map", 35), ("engine_rpm", 36),
+    ("vehicle_speed", 37), ("timing_advance", 38), ("intake_air_temp", 39), ("maf", 40),
+    ("throttle_position", 41), ("run_time_since_engine_start", 42), ("distance_traveled_mil_on", 43),
+    ("relative_fuel_rail_pressure", 44), ("direct_fuel_rail_pressure", 45), ("commanded_egr", 46),
+    ("egr_error", 47), ("number_of_dtc", 30), ("distance_traveled_since_codes_clear", 49),
+    ("control_module_voltage", 51), ("absolute_load_value", 52), ("ambient_air_temperature", 53),
+    ("time_run_with_mil_on", 54), ("time_since_trouble_codes_cleared", 55), ("fuel_type", 759),
+    ("hybrid_battery_pack_remaining_life", 57), ("engine_oil_temperature", 58),
+    ("fuel_injection_timing", 59), ("fuel_rate", 60),
+)
+BOOL_FIELDS = {"operate_status", "digital_input_2"}
+
+
+def baseline_payload(imei, data_avl):
+    # Salinan perilaku map_teltonika_to_json_payload lama: cari io_id di io_data bentuk dict
+    def get_value(io_id):
+        for io_group in data_avl.get("io_data", []):
+            for io_values in io_group.values():
+                for io in io_values:
+                    if io.get("io_id") == io_id:
+                        return io.get("value", 0)
+        return 0
+
+    payload = {
+        "imei": imei,
+        "timestamp": data_avl.get("timestamp", "1970-01-01T00:00:00+00:00"),
+        "latitude": data_avl.get("latitude", 0.0),
+        "longitude": data_avl.get("longitude", 0.0),
+        "altitude": data_avl.get("altitude", 0),
+        "angle": data_avl.get("angle", 0),
+        "speed": data_avl.get("speed", 0),
+    }
+    for field, io_id in BASELINE_FIELDS:
+        value = get_value(io_id)
+        payload[field] = bool(value) if field in BOOL_FIELDS else value
+    payload["data_payload"] = data_avl
+    return payload
+
+
+def decoded_records(codec_id, parser, count=20):
+    generator = AVLPacketGenerator(seed=11)
+    frame = generator.frame(codec_id, count)
+    return parser.decode(frame[10:-5], count, IMEI)
+
+
+@pytest.mark.parametrize("codec_id, parser", [(0x08, ParseRawCodec8), (0x8E, ParseRawCodec8e)])
+def test_full_mode_matches_baseline_payload(codec_id, parser):
+    mapper = TeltonikaPayloadMapper.for_profile("default", "full", "iso")
+    records = decoded_records(codec_id, parser)
+    assert any(record.io for record in records)
+    for record in records:
+        payload = mapper.map(IMEI, record)
+        expected = baseline_payload(IMEI, record.to_dict())
+        assert payload == expected
+        # Urutan key ikut menentukan JSON yang dikirim ke consumer
+        assert json.dumps(payload) == json.dumps(expected)
+
+
+def test_full_mode_data_payload_shape():
+    records = decoded_records(0x8E, ParseRawCodec8e, count=1) + decoded_records(0x08, ParseRawCodec8, count=1)
+    extended, plain = (record.to_dict() for record in records)
+    header = ["imei", "timestamp", "latitude", "longitude", "altitude", "angle", "satellites", "speed",
+              "event_io_id", "total_io", "io_data"]
+    assert list(plain) == header
+    assert list(extended) == header + ["nx_data"]
+    assert all(set(item) == {"io_id", "value", "length"} for item in extended["nx_data"])
+
+
+def test_epoch_ms_timestamp():
+    record, = decoded_records(0x08, ParseRawCodec8, count=1)
+    payload = TeltonikaPayloadMapper.for_profile("default", "full", "epoch_ms").map(IMEI, record)
+    assert payload["timestamp"] == record.timestamp_ms
+    assert payload["data_payload"]["timestamp"] == record.timestamp_ms
@@ -0,0 +1,47 @@
+import pytest
+from utils.metrics import Metric, MetricsRegistry
+
+
+def test_metric_base_is_abstract():
+    with pytest.raises(TypeError):
+        Metric("x", "x")
+
+
+def test_render_prometheus_text():
+    registry = MetricsRegistry()
+    frames = registry.counter("frames_total", "Frame per codec", ("codec",), (("8",), ("8e",)))
+    records = registry.counter("records_total", "Record")
+    registry.gauge("queue_depth", "Antrian per shard", lambda: {"0": 3, "1": 0}, ("shard",))
+    latency = registry.histogram("publish_seconds", "Latency", buckets=(0.1, 0.5))
+    frames.labels("8e").inc()
+    frames.labels("8e").inc(2)
+    records.inc(5)
+    for value in (0.05, 0.2, 3.0):
+        latency.observe(value)
+    assert registry.render().splitlines() == [
+        "# HELP teltonika_frames_total Frame per codec",
+        "# TYPE teltonika_frames_total counter",
+        'teltonika_frames_total{codec="8"} 0',
+        'teltonika_frames_total{codec="8e"} 3',
+        "# HELP teltonika_records_total Record",
+        "# TYPE teltonika_records_total counter",
+        "teltonika_records_total 5",
+        "# HELP teltonika_queue_depth Antrian per shard",
+        "# TYPE teltonika_queue_depth gauge",
+        'teltonika_queue_depth{shard="0"} 3',
+        'teltonika_queue_depth{shard="1"} 0',
+        "# HELP teltonika_publish_seconds Latency",
+        "# TYPE teltonika_publish_seconds histogram",
+        'teltonika_publish_seconds_bucket{le="0.1"} 1',
+        'teltonika_publish_seconds_bucket{le="0.5"} 2',
+        'teltonika_publish_seconds_bucket{le="+Inf"} 3',
+        "teltonika_publish_seconds_sum 3.25",
+        "teltonika_publish_seconds_count 3",
+    ]
+
+
+def test_duplicate_metric_rejected():
+    registry = MetricsRegistry()
+    registry.counter("frames_total", "Frame")
+    with pytest.raises(ValueError):
+        registry.counter("frames_total", "Frame")
@@ -0,0 +1,112 @@
+import asyncio
+from config.mqtt import MQTTBatchPublisher
+
+
+class FakeConnector:
+    name = "mqtt-test"
+
+    def __init__(self):
+        self.connected = asyncio.Event()
+        self.connected.set()
+        self.reconnects = 0
+        self.published = []
+
+    async def publish(self, topic, payload):
+        self.published.append((topic, payload))
+        return True
+
+
+class FlakySerializer:
+    # Gagal untuk batch yang berisi record "bad"
+    def dumps(self, records):
+        if any(record.get("bad") for record in records):
+            raise ValueError("record tidak bisa diserialisasi")
+        return repr(records).encode()
+
+
+class FullSpool:
+    sealed = False
+
+    def empty(self):
+        return False
+
+    def append(self, topic, payload):
+        raise OSError(28, "No space left on device")
+
+    def flush(self):
+        raise OSError(28, "No space left on device")
+
+    def stats(self):
+        return {}
+
+
+def run(coroutine):
+    return asyncio.run(asyncio.wait_for(coroutine, 5))
+
+
+def test_flush_error_does_not_stop_consumer():
+    async def scenario():
+        connector = FakeConnector()
+        publisher = MQTTBatchPublisher(connector, FlakySerializer())
+        publisher.flush_interval = 0.01
+        publisher.start()
+        await publisher.submit("topic/a", [{"bad": True}])
+        await publisher.queue.join()
+        await publisher.submit("topic/b", [{"imei": "1"}])
+        await publisher.stop()
+        return connector, publisher
+
+    connector, publisher = run(scenario())
+    assert [topic for topic, _ in connector.published] == ["topic/b"]
+    assert publisher.dropped_records == 1 and publisher.published_records == 1
+
+
+def test_spool_write_error_is_counted_and_consumer_survives():
+    async def scenario():
+        publisher = MQTTBatchPublisher(FakeConnector(), FlakySerializer())
+        publisher.spool = FullSpool()
+        publisher.flush_interval = 0.01
+        publisher.task = asyncio.create_task(publisher.run())
+        for _ in range(3):
+            await publisher.submit("topic/a", [{"imei": "1"}, {"imei": "1"}])
+            await publisher.queue.join()
+        alive = not publisher.task.done()
+        publisher.task.cancel()
+        return publisher, alive
+
+    publisher, alive = run(scenario())
+    assert alive
+    assert publisher.dropped_records == 6
+
+
+class FailingConnector(FakeConnector):
+    async def publish(self, topic, payload):
+        return False
+
+
+def test_failed_publish_without_spool_counts_dropped_records():
+    async def scenario():
+        publisher = MQTTBatchPublisher(FailingConnector(), FlakySerializer())
+        await publisher.flush({"topic/a": [{"imei": "1"}] * 3, "topic/b": [{"imei": "2"}]})
+        return publisher
+
+    publisher = run(scenario())
+    assert publisher.dropped_messages == 2 and publisher.dropped_records == 4
+    assert publisher.published_records == 0
+
+
+def test_publish_without_spool_waits_for_connection():
+    async def scenario():
+        connector = FakeConnector()
+        connector.connected.clear()
+        publisher = MQTTBatchPublisher(connector, FlakySerializer())
+        flush = asyncio.create_task(publisher.flush({"topic/a": [{"imei": "1"}]}))
+        await asyncio.sleep(0.05)
+        waiting = not flush.done()
+        connector.connected.set()
+        await flush
+        return connector, publisher, waiting
+
+    connector, publisher, waiting = run(scenario())
+    assert waiting
+    assert len(connector.published) == 1 and publisher.dropped_records == 0
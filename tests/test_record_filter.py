@@ -0,0 +1,56 @@
+import pytest
+from parser.avl_record import AVLRecord
+from utils.dedup import record_key
+from utils.record_filter import FILTER_RULES, LastFixes, RecordFilter, date_ms, parse_rules
+
+NOW_MS = date_ms("2024-05-01")
+
+
+def avl(timestamp_ms=NOW_MS, latitude=-6.2, longitude=106.8, satellites=8, priority=0):
+    return AVLRecord("353201350385883", timestamp_ms, priority, longitude, latitude, 10, 0, satellites, 30, 0, 0, {}, ((), (), (), ()))
+
+
+def apply(record_filter, records, last_fix=None):
+    keys = [record_key(record.timestamp_ms, record.priority) for record in records]
+    return record_filter.apply(records, keys, last_fix, NOW_MS)
+
+
+def test_parse_rules_rejects_unknown_rule():
+    assert parse_rules(" zero_position, speed_jump ") == ("zero_position", "speed_jump")
+    with pytest.raises(ValueError):
+        parse_rules("zero_position,teleport")
+
+
+def test_static_rules_count_first_rejecting_rule():
+    record_filter = RecordFilter(FILTER_RULES)
+    records = [
+        avl(), avl(latitude=0, longitude=0), avl(latitude=91), avl(timestamp_ms=date_ms("2010-01-01")),
+        avl(timestamp_ms=NOW_MS + 2 * 86_400_000), avl(satellites=1), avl(latitude=0, longitude=0, priority=2),
+    ]
+    kept, keys, dropped, _ = apply(record_filter, records)
+    assert kept == [records[0], records[-1]]
+    assert len(keys) == 2
+    assert dropped == {
+        "zero_position": 1, "out_of_range": 1, "ancient_timestamp": 1, "future_timestamp": 1, "low_satellites": 1,
+    }
+
+
+def test_speed_jump_rejects_teleport_then_accepts_new_position():
+    record_filter = RecordFilter(("speed_jump",))
+    # 1 derajat (~111 km) dalam 10 detik
+    records = [avl(NOW_MS), avl(NOW_MS + 10_000, latitude=-5.2)]
+    kept, _, dropped, last_fix = apply(record_filter, records)
+    assert kept == records[:1] and dropped == {"speed_jump": 1}
+    jumps = [avl(NOW_MS + i * 10_000, latitude=-5.2) for i in range(2, 5)]
+    kept, _, dropped, last_fix = apply(record_filter, jumps, last_fix)
+    # Setelah 3 lompatan berturut-turut posisi baru diterima
+    assert kept == jumps[2:] and dropped == {"speed_jump": 2}
+    assert last_fix[1] == -5.2
+
+
+def test_last_fixes_prune_idle_devices():
+    fixes = LastFixes(60.0)
+    fixes.set("1", (NOW_MS, -6.2, 106.8, 0))
+    assert fixes.get("1")[0] == NOW_MS
+    assert fixes.prune() == 0
+    assert fixes.prune(now=10 ** 9) == 1 and fixes.get("1") is None
@@ -0,0 +1,124 @@
+import argparse
+import asyncio
+import json
+import pytest
+import config.mqtt
+import replay
+from benchmark.packet_generator import AVLPacketGenerator
+from config.config import Config
+from utils.capture import FrameCapture, read_capture
+
+IMEI = "353201350385883"
+
+
+def write_capture(directory, frames):
+    async def scenario():
+        capture = FrameCapture(str(directory), file_size=1 << 20, roll_interval=3600)
+        for frame in frames:
+            capture.append(IMEI, frame)
+        capture.close()
+
+    asyncio.run(scenario())
+    path, = replay.capture_files([str(directory)])
+    return path
+
+
+def replay_args(**overrides):
+    args = dict(
+        sink="count", columnar=False, output="replay", imei="", since=None, until=None, connect_timeout=1.0,
+    )
+    args.update(overrides)
+    return argparse.Namespace(**args)
+
+
+class FakeConnector:
+    def __init__(self, connected):
+        self.connected = asyncio.Event()
+        if connected:
+            self.connected.set()
+
+
+class FakeShard:
+    def __init__(self, connected):
+        self.connector = FakeConnector(connected)
+
+
+class FakePool:
+    # Pengganti mqtt_pool: drop = jumlah record yang dianggap gagal publish
+    def __init__(self, connected=True, drop=0):
+        self.shards = [FakeShard(connected), FakeShard(connected)]
+        self.drop = drop
+        self.submitted = []
+
+    def start(self):
+        pass
+
+    async def stop(self):
+        pass
+
+    async def submit(self, imei, records):
+        self.submitted.extend(records)
+
+    def stats(self):
+        dropped = min(self.drop, len(self.submitted))
+        return {"published_records": len(self.submitted) - dropped, "dropped_records": dropped}
+
+
+@pytest.fixture
+def capture_path(tmp_path):
+    generator = AVLPacketGenerator(seed=7)
+    return write_capture(tmp_path / "capture", [generator.frame(0x08, 3), generator.frame(0x8E, 2)])
+
+
+def test_replay_mqtt_waits_for_connection(monkeypatch, capture_path):
+    pool = FakePool(connected=False)
+    monkeypatch.setattr(config.mqtt, "mqtt_pool", pool)
+    result = replay.replay_file(capture_path, replay_args(sink="mqtt", connect_timeout=0.05))
+    assert result["errors"] == {"mqtt_connect": 1}
+    assert result["records"] == 0 and not pool.submitted
+
+
+def test_replay_mqtt_reports_dropped_records(monkeypatch, capture_path):
+    pool = FakePool(drop=2)
+    monkeypatch.setattr(config.mqtt, "mqtt_pool", pool)
+    result = replay.replay_file(capture_path, replay_args(sink="mqtt"))
+    assert result["records"] == 5 and len(pool.submitted) == 5
+    assert result["published_records"] == 3 and result["dropped_records"] == 2
+
+
+def test_replay_count(capture_path):
+    result = replay.replay_file(capture_path, replay_args())
+    assert (result["frames"], result["records"], result["errors"]) == (2, 5, {})
+    assert replay.replay_file(capture_path, replay_args(imei="999"))["frames"] == 0
+    assert replay.replay_file(capture_path, replay_args(until=0))["frames"] == 0
+
+
+def test_replay_jsonl_matches_server_payload(tmp_path, capture_path):
+    from service.frame_decoder import decode_frame
+
+    result = replay.replay_file(capture_path, replay_args(sink="jsonl", output=str(tmp_path / "out")))
+    output, = (tmp_path / "out").iterdir()
+    lines = [json.loads(line) for line in output.read_text().splitlines()]
+    mapper_key = (Config.MAPPING_PROFILE, Config.PAYLOAD_RAW_MODE, Config.TIMESTAMP_FORMAT)
+    expected = [
+        payload
+        for _, imei, frame in read_capture(capture_path)
+        for payload in decode_frame(bytes(frame), imei, mapper_key).payload
+    ]
+    assert result["records"] == len(lines) == 5
+    assert lines == json.loads(json.dumps(expected))
+
+
+def test_replay_columnar_jsonl(tmp_path, capture_path):
+    pytest.importorskip("numpy")
+    result = replay.replay_file(capture_path, replay_args(sink="jsonl", columnar=True, output=str(tmp_path / "gps")))
+    replay.replay_file(capture_path, replay_args(sink="jsonl", output=str(tmp_path / "full")))
+    gps, = (tmp_path / "gps").iterdir()
+    full, = (tmp_path / "full").iterdir()
+    rows = [json.loads(line) for line in gps.read_text().splitlines()]
+    payloads = [json.loads(line) for line in full.read_text().splitlines()]
+    assert result["records"] == len(rows) == len(payloads) == 5
+    fields = ("imei", "timestamp", "latitude", "longitude", "altitude", "angle", "speed")
+    assert [{key: row[key] for key in fields} for row in rows] == [
+        {key: payload[key] for key in fields} for payload in payloads
+    ]
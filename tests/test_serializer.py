@@ -0,0 +1,50 @@
+import json
+import pytest
+from utils.serializer import JSONSerializer, PayloadSerializer, get_serializer, pack_big_int
+
+VIN = int.from_bytes(b"WVWZZZ1JZXW000001", "big")
+RECORDS = [{"imei": "353201350385883", "speed": 40, "nx_data": [{"io_id": 256, "value": VIN, "length": 17}]}]
+
+
+def test_base_serializer_is_abstract():
+    with pytest.raises(TypeError):
+        PayloadSerializer(False)
+
+
+@pytest.mark.parametrize("name", ["json", "json-std"])
+def test_json_keeps_big_int(name):
+    serializer = get_serializer(name)
+    assert not serializer.envelope
+    assert json.loads(serializer.dumps(RECORDS)) == RECORDS
+
+
+def test_json_envelope():
+    payload = json.loads(get_serializer("json", "true").dumps(RECORDS))
+    assert payload == {"format": "json", "version": 1, "records": RECORDS}
+    assert not JSONSerializer(False).binary
+
+
+def test_pack_big_int():
+    assert pack_big_int(VIN) == b"WVWZZZ1JZXW000001"
+    with pytest.raises(TypeError):
+        pack_big_int(object())
+
+
+def test_msgpack_big_int_as_bin():
+    msgpack = pytest.importorskip("msgpack")
+    serializer = get_serializer("msgpack")
+    payload = msgpack.unpackb(serializer.dumps(RECORDS))
+    assert payload["format"] == "msgpack" and payload["version"] == 1
+    nx, = payload["records"][0]["nx_data"]
+    assert nx["value"] == b"WVWZZZ1JZXW000001" and nx["length"] == 17
+
+
+def test_cbor_keeps_big_int():
+    cbor2 = pytest.importorskip("cbor2")
+    payload = cbor2.loads(get_serializer("cbor").dumps(RECORDS))
+    assert payload["records"] == RECORDS
+
+
+def test_unknown_format():
+    with pytest.raises(ValueError):
+        get_serializer("xml")
@@ -0,0 +1,77 @@
+import pytest
+from utils.dedup import record_key
+from utils.state_cache import StateCache, parse_deadbands
+
+IMEI = "353201350385883"
+START = 1_700_000_000_000
+
+
+def record(offset_s, **fields):
+    values = {"imei": IMEI, "timestamp": START + offset_s * 1000, "speed": 0, "ignition": 0}
+    values.update(fields)
+    return values
+
+
+def run(cache, records, priorities=None):
+    priorities = priorities or [0] * len(records)
+    keys = [record_key(item["timestamp"], priority) for item, priority in zip(records, priorities)]
+    return cache.filter(IMEI, records, keys)
+
+
+def test_parse_deadbands():
+    assert parse_deadbands(" speed=3, latitude=0.0001,") == {"speed": 3.0, "latitude": 0.0001}
+    with pytest.raises(ValueError):
+        StateCache(["speed"], mode="sometimes")
+
+
+def test_all_mode_passes_everything():
+    cache = StateCache(["speed"], mode="all")
+    records = [record(0), record(1), record(2)]
+    assert run(cache, records) == records
+
+
+def test_changed_mode_with_deadband():
+    cache = StateCache(["speed", "ignition"], mode="changed", deadbands={"speed": 3})
+    records = [record(0), record(1, speed=2), record(2, speed=4), record(3, speed=5), record(4, ignition=1)]
+    published = run(cache, records)
+    # speed 2 di bawah deadband; 5 dibanding snapshot terakhir (4) juga di bawah deadband
+    assert published == [records[0], records[2], records[4]]
+
+
+def test_delta_mode():
+    cache = StateCache(["speed", "ignition"], mode="delta")
+    records = [record(0), record(1, speed=10), record(2, speed=10, ignition=1)]
+    published = run(cache, records)
+    assert published[0] == records[0]
+    assert published[1:] == [
+        {"imei": IMEI, "timestamp": records[1]["timestamp"], "speed": 10},
+        {"imei": IMEI, "timestamp": records[2]["timestamp"], "ignition": 1},
+    ]
+
+
+def test_heartbeat_and_min_interval():
+    cache = StateCache(["speed"], mode="changed", min_interval=10, heartbeat_interval=60)
+    records = [record(0), record(5, speed=20), record(30), record(60), record(120)]
+    published = run(cache, records)
+    # speed=20 terlalu cepat setelah publish terakhir, speed=0 di 30s tidak berubah; heartbeat di 60s dan 120s
+    assert published == [records[0], records[3], records[4]]
+
+
+def test_force_priority_and_late_records():
+    cache = StateCache(["speed"], mode="changed")
+    records = [record(10), record(11), record(5, speed=50), record(12)]
+    published = run(cache, records, priorities=[0, 1, 0, 0])
+    assert published == [records[0], records[1], records[2]]
+    # Record terlambat tidak mengubah state
+    assert cache.devices[IMEI].values == [0]
+
+
+def test_prune_idle_devices():
+    cache = StateCache(["speed"], mode="changed", idle_ttl=60)
+    run(cache, [record(0)])
+    cache.filter("other", [record(0)], [record_key(START, 0)])
+    cache.devices["other"].updated -= 120
+    assert cache.prune() == 1
+    assert list(cache.devices) == [IMEI]
+    # Setelah dilepas, record berikutnya dipublish utuh walau tidak berubah
+    assert cache.filter("other", [record(10)], [record_key(START + 10_000, 0)]) == [record(10)]
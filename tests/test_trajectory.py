@@ -0,0 +1,97 @@
+import math
+import random
+from utils.dedup import record_key, split_key
+from utils.trajectory import TrajectorySimplifier
+
+IMEI = "353201350385883"
+START = 1_700_000_000_000
+
+
+def track(count, heading=90.0, speed=15.0, noise=0.0, seed=1):
+    generator = random.Random(seed)
+    latitude, longitude = -6.2, 106.8
+    records = []
+    for i in range(count):
+        latitude += speed * math.cos(math.radians(heading)) / 111_320
+        longitude += speed * math.sin(math.radians(heading)) / (111_320 * math.cos(math.radians(latitude)))
+        records.append({
+            "timestamp": START + i * 1000,
+            "latitude": latitude + generator.gauss(0, noise) / 111_320,
+            "longitude": longitude + generator.gauss(0, noise) / 111_320,
+            "angle": int(heading), "speed": 54,
+        })
+    return records
+
+
+def simplify(simplifier, records, events=None, chunk=25):
+    keys = [record_key(record["timestamp"], 0) for record in records]
+    events = events or [0] * len(records)
+    output, output_keys = [], []
+    for i in range(0, len(records), chunk):
+        kept, kept_keys = simplifier.filter(IMEI, records[i:i + chunk], keys[i:i + chunk], events[i:i + chunk])
+        output += kept
+        output_keys += kept_keys
+    for _, kept, kept_keys in simplifier.flush(0):
+        output += kept
+        output_keys += kept_keys
+    return output, output_keys
+
+
+def max_sed(records, kept):
+    # Error terbesar antara titik asli dan posisi interpolasi waktu di antara titik yang dipublish
+    by_time = {record["timestamp"]: record for record in records}
+    times = sorted(record["timestamp"] for record in kept)
+    worst = 0.0
+    for a_ms, b_ms in zip(times, times[1:]):
+        a, b = by_time[a_ms], by_time[b_ms]
+        for t in range(a_ms, b_ms + 1, 1000):
+            ratio = (t - a_ms) / (b_ms - a_ms)
+            point = by_time[t]
+            dy = (a["latitude"] + ratio * (b["latitude"] - a["latitude"]) - point["latitude"]) * 111_320
+            dx = (a["longitude"] + ratio * (b["longitude"] - a["longitude"]) - point["longitude"]) * 111_320 * math.cos(math.radians(point["latitude"]))
+            worst = max(worst, math.hypot(dx, dy))
+    return worst
+
+
+def test_straight_line_is_compressed_within_tolerance():
+    records = track(600, noise=2.0)
+    simplifier = TrajectorySimplifier(10.0)
+    kept, keys = simplify(simplifier, records)
+    assert len(kept) * 5 < len(records)
+    assert keys == sorted(keys)
+    assert kept[0] is records[0] and kept[-1] is records[-1]
+    assert max_sed(records, kept) <= 10.0 + 1e-6
+    assert simplifier.dropped == len(records) - len(kept)
+
+
+def test_event_records_are_always_kept():
+    records = track(200)
+    events = [239 if i in (50, 120) else 0 for i in range(len(records))]
+    kept, _ = simplify(TrajectorySimplifier(10.0), records, events)
+    assert records[50] in kept and records[120] in kept
+
+
+def test_heading_change_is_kept():
+    records = track(100) + [dict(record, angle=180) for record in track(1, heading=180.0)]
+    records[-1]["timestamp"] = START + 100_000
+    kept, _ = simplify(TrajectorySimplifier(10.0, max_points=1000), records)
+    assert records[-1] in kept
+
+
+def test_late_records_pass_through():
+    records = track(10)
+    simplifier = TrajectorySimplifier(10.0)
+    simplify(simplifier, records)
+    late = records[3]
+    kept, keys = simplifier.filter(IMEI, [late], [record_key(late["timestamp"], 0)], [0])
+    assert kept == [late] and split_key(keys[0])[0] == late["timestamp"]
+
+
+def test_prune_releases_idle_devices_without_held_points():
+    simplifier = TrajectorySimplifier(10.0)
+    records = track(20)
+    simplifier.filter(IMEI, records, [record_key(record["timestamp"], 0) for record in records], [0] * 20)
+    # Masih ada titik tahanan: tidak dilepas sebelum di-flush
+    assert simplifier.prune(-1.0) == 0
+    assert len(simplifier.flush(-1.0)) == 1
+    assert simplifier.prune(-1.0) == 1 and len(simplifier) == 0
@@ -0,0 +1,131 @@
+from utils.dedup import record_key
+from utils.trips import TripAggregator
+
+FIELDS = ("ignition", "total_odometer", "fuel_used_gps", "fuel_rate_gps", "engine_rpm")
+MINUTE = 60_000
+HOUR = 60 * MINUTE
+START = 1_700_000_000_000 // HOUR * HOUR
+
+
+def record(timestamp_ms, ignition=0, speed=0, odometer=0):
+    return {
+        "timestamp": timestamp_ms, "latitude": -6.2, "longitude": 106.8, "speed": speed,
+        "ignition": ignition, "total_odometer": odometer,
+    }
+
+
+def feed(aggregator, records, imei="353201350385883"):
+    output = []
+    for item in records:
+        output += aggregator.add(imei, [item], [record_key(item["timestamp"], 0)])
+    return output
+
+
+def intervals(summaries):
+    return [summary for summary in summaries if summary["type"] == "interval"]
+
+
+def test_parked_device_one_interval_per_bucket():
+    aggregator = TripAggregator(FIELDS, epoch_ms=True)
+    # Device parkir melapor tiap 15 menit selama 6 jam: jarak antar record > gap 600 detik
+    output = feed(aggregator, [record(START + i * 15 * MINUTE) for i in range(24)])
+    summaries = intervals(output)
+    starts = [summary["start"] for summary in summaries]
+    assert len(starts) == len(set(starts)) == 5
+    assert all(summary["records"] == 4 for summary in summaries)
+
+
+def test_evicted_device_does_not_reopen_emitted_bucket():
+    aggregator = TripAggregator(FIELDS, epoch_ms=True)
+    imei = "353201350385883"
+    output = feed(aggregator, [record(START + i * 15 * MINUTE) for i in range(4)], imei)
+    assert output == []
+    # Dilepas jauh setelah bucket berakhir: interval final dipublish sekali
+    output = aggregator.evict(imei, START + 3 * HOUR)
+    assert [(summary["start"], summary["records"]) for summary in intervals(output)] == [(START, 4)]
+    # Back-fill untuk bucket yang sama tidak menghasilkan ringkasan kedua
+    output = feed(aggregator, [record(START + 50 * MINUTE), record(START + 2 * HOUR + 30 * MINUTE)], imei)
+    output += aggregator.evict(imei, START + 6 * HOUR)
+    assert [summary["start"] for summary in intervals(output)] == [START + 2 * HOUR]
+    assert aggregator.late_dropped == 1
+
+
+def test_eviction_drops_unfinished_interval():
+    aggregator = TripAggregator(FIELDS, epoch_ms=True)
+    imei = "353201350385883"
+    feed(aggregator, [record(START + MINUTE)], imei)
+    # Bucket belum final menurut jam server: tidak ada ringkasan parsial
+    assert aggregator.evict(imei, START + 10 * MINUTE) == []
+    output = feed(aggregator, [record(START + 20 * MINUTE), record(START + HOUR + MINUTE)], imei)
+    assert intervals(output) == []
+    output = aggregator.evict(imei, START + 3 * HOUR)
+    assert [(summary["start"], summary["records"]) for summary in intervals(output)] == [(START, 1), (START + HOUR, 1)]
+
+
+def test_trip_closed_by_ignition_and_released_after_lateness():
+    aggregator = TripAggregator(FIELDS, interval=0, epoch_ms=True)
+    records = [record(START + i * 10_000, ignition=1, speed=30, odometer=1000 + i * 80) for i in range(30)]
+    records.append(record(START + 300_000, ignition=0, odometer=3400))
+    # Record ignition on terlambat di tengah trip tetap digabung selama trip belum dipublish
+    records.append(records.pop(5))
+    output = feed(aggregator, records)
+    assert output == []
+    output = feed(aggregator, [record(START + 600_000, ignition=0, odometer=3400)])
+    assert len(output) == 1
+    trip = output[0]
+    assert trip["type"] == "trip"
+    assert (trip["start"], trip["end"]) == (START, START + 300_000)
+    assert trip["distance_m"] == 2400
+    assert trip["records"] == 31 and trip["late_records"] == 1
+
+
+def test_gap_between_records_splits_trip():
+    aggregator = TripAggregator(FIELDS, interval=0, lateness=0, epoch_ms=True)
+    records = [record(START + i * 10_000, ignition=1, speed=20) for i in range(5)]
+    records += [record(START + 20 * MINUTE + i * 10_000, ignition=1, speed=20) for i in range(5)]
+    records.append(record(START + 40 * MINUTE))
+    output = feed(aggregator, records)
+    assert [(trip["start"], trip["end"]) for trip in output] == [
+        (START, START + 40_000), (START + 20 * MINUTE, START + 20 * MINUTE + 40_000),
+    ]
+
+
+def test_shutdown_publishes_partial_windows():
+    aggregator = TripAggregator(FIELDS, epoch_ms=True)
+    imei = "353201350385883"
+    records = [record(START + 10 * MINUTE), record(START + 50 * MINUTE)]
+    records += [record(START + HOUR + i * 30_000, ignition=1, speed=30) for i in range(3)]
+    assert feed(aggregator, records, imei) == []
+    (closed_imei, output), = aggregator.close_all(START + HOUR + MINUTE)
+    assert closed_imei == imei
+    assert [(summary["type"], summary["start"], summary["records"], summary["partial"]) for summary in output] == [
+        ("trip", START + HOUR, 3, True),
+        ("interval", START, 2, True),
+        ("interval", START + HOUR, 3, True),
+    ]
+    assert len(aggregator) == 0 and not aggregator.watermarks
+
+
+def test_shutdown_marks_only_unfinished_windows_partial():
+    aggregator = TripAggregator(FIELDS, epoch_ms=True)
+    imei = "353201350385883"
+    feed(aggregator, [record(START + MINUTE), record(START + HOUR + MINUTE)], imei)
+    # Bucket pertama sudah final menurut jam server, bucket kedua belum
+    (_, output), = aggregator.close_all(START + HOUR + 10 * MINUTE)
+    assert [(summary["start"], summary["partial"]) for summary in intervals(output)] == [
+        (START, False), (START + HOUR, True),
+    ]
+
+
+def test_watermarks_pruned_after_idle_ttl():
+    aggregator = TripAggregator(FIELDS, epoch_ms=True, idle_ttl=60)
+    imei = "353201350385883"
+    feed(aggregator, [record(START + MINUTE)], imei)
+    aggregator.evict(imei, START + 3 * HOUR)
+    assert imei in aggregator.watermarks and len(aggregator) == 0
+    aggregator.expire(60)
+    assert imei in aggregator.watermarks
+    trip_ms, interval_ms, evicted = aggregator.watermarks[imei]
+    aggregator.watermarks[imei] = (trip_ms, interval_ms, evicted - 120)
+    aggregator.expire(60)
+    assert not aggregator.watermarks
@@ -0,0 +1,178 @@
+import asyncio
+import mmap
+import os
+import struct
+import time
+from utils.log import get_logger
+
+logger = get_logger("capture")
+
+# Header file: magic, versi, waktu dibuat (epoch ms)
+FILE_HEADER = struct.Struct("<4sBQ")
+# Per frame: waktu diterima (epoch ms), panjang IMEI, panjang frame; lalu IMEI dan frame mentah
+ENTRY_HEADER = struct.Struct("<QBI")
+CAPTURE_MAGIC = b"TCAP"
+CAPTURE_VERSION = 1
+CAPTURE_SUFFIX = ".tcap"
+# File yang sedang ditulis; di-rename ke .tcap saat rotasi
+ACTIVE_SUFFIX = ".tcap.active"
+
+
+class FrameCapture:
+    # Menyimpan setiap frame lengkap yang masuk (sebelum decode) ke file capture berotasi,
+    # untuk replay/re-decode offline. Tulis lewat buffer besar di event loop: biaya per frame
+    # hanya memcpy, syscall terjadi saat buffer penuh atau flush berkala.
+
+    def __init__(self, directory: str, file_size: int, roll_interval: float, buffer_size: int = 1024 * 1024,
+                 flush_interval: float = 1.0):
+        self.directory = directory
+        self.file_size = file_size
+        self.roll_interval = roll_interval
+        self.buffer_size = buffer_size
+        self.flush_interval = flush_interval
+        self.file = None
+        self.path = None
+        self.opened = 0.0
+        self.size = 0
+        self.sequence = 0
+        self.task = None
+        self.frames = 0
+        self.bytes = 0
+        self.files = 0
+        self.failed = 0
+
+    def finish_leftovers(self):
+        # File aktif sisa proses yang mati tetap bisa dibaca sampai entri lengkap terakhir
+        for name in os.listdir(self.directory):
+            if name.endswith(ACTIVE_SUFFIX):
+                path = os.path.join(self.directory, name)
+                os.replace(path, path[:-len(ACTIVE_SUFFIX)] + CAPTURE_SUFFIX)
+                logger.warning("File capture %s dari proses sebelumnya ditutup", name)
+
+    def open(self):
+        if self.sequence == 0:
+            os.makedirs(self.directory, exist_ok=True)
+            self.finish_leftovers()
+        self.sequence += 1
+        now_ms = int(time.time() * 1000)
+        name = f"capture-{now_ms}-{os.getpid()}-{self.sequence:06d}"
+        self.path = os.path.join(self.directory, name + ACTIVE_SUFFIX)
+        self.file = open(self.path, "wb", buffering=self.buffer_size)
+        self.file.write(FILE_HEADER.pack(CAPTURE_MAGIC, CAPTURE_VERSION, now_ms))
+        self.size = FILE_HEADER.size
+        self.opened = time.monotonic()
+
+    def rotate(self):
+        if self.file is None:
+            return
+        self.file.close()
+        os.replace(self.path, self.path[:-len(ACTIVE_SUFFIX)] + CAPTURE_SUFFIX)
+        self.file = None
+        self.files += 1
+
+    def append(self, imei: str, frame) -> bool:
+        imei_bytes = imei.encode("ascii")
+        try:
+            if self.file is None:
+                self.open()
+                if self.task is None:
+                    self.task = asyncio.create_task(self.maintain())
+            write = self.file.write
+            write(ENTRY_HEADER.pack(int(time.time() * 1000), len(imei_bytes), len(frame)))
+            write(imei_bytes)
+            write(frame)
+            size = ENTRY_HEADER.size + len(imei_bytes) + len(frame)
+            self.size += size
+            self.frames += 1
+            self.bytes += size
+            if self.size >= self.file_size:
+                self.rotate()
+        except OSError as e:
+            # Disk penuh/tidak bisa ditulis: capture tidak boleh mengganggu penerimaan data
+            self.failed += 1
+            if self.failed == 1 or self.failed % 10000 == 0:
+                logger.error("Gagal menulis capture (%d frame gagal): %s", self.failed, e)
+            self.discard()
+            return False
+        return True
+
+    def discard(self):
+        # File yang gagal ditulis ditutup apa adanya; entri terakhir yang terpotong dilewati saat replay
+        if self.file is None:
+            return
+        try:
+            self.rotate()
+        except OSError:
+            self.file = None
+
+    async def maintain(self):
+        # Flush berkala supaya crash hanya kehilangan data beberapa detik terakhir, plus rotasi waktu
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            if self.file is None:
+                continue
+            try:
+                if time.monotonic() - self.opened >= self.roll_interval:
+                    self.rotate()
+                else:
+                    self.file.flush()
+            except OSError as e:
+                logger.error("Gagal flush file capture %s: %s", self.path, e)
+                self.discard()
+
+    def close(self):
+        if self.task is not None:
+            self.task.cancel()
+            self.task = None
+        try:
+            self.rotate()
+        except OSError as e:
+            logger.error("Gagal menutup file capture %s: %s", self.path, e)
+        if self.frames:
+            logger.info("Capture ditutup: %d frame, %d byte, %d file", self.frames, self.bytes, self.files)
+
+
+def capture_files(paths, include_active: bool = False):
+    # File/direktori -> daftar file capture, urut nama (nama diawali waktu dibuat)
+    suffixes = (CAPTURE_SUFFIX, ACTIVE_SUFFIX) if include_active else (CAPTURE_SUFFIX,)
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            for root, _, names in os.walk(path):
+                files.extend(os.path.join(root, name) for name in names if name.endswith(suffixes))
+        else:
+            files.append(path)
+    return sorted(files, key=os.path.basename)
+
+
+def read_capture(path: str):
+    # Menghasilkan (waktu diterima ms, IMEI, frame) dari satu file capture lewat mmap.
+    # Frame berupa memoryview ke mmap: salin bila perlu disimpan setelah iterasi berikutnya.
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size < FILE_HEADER.size:
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            magic, version, _ = FILE_HEADER.unpack_from(data, 0)
+            if magic != CAPTURE_MAGIC or version != CAPTURE_VERSION:
+                raise ValueError(f"{path} bukan file capture yang dikenali")
+            view = memoryview(data)
+            try:
+                offset = FILE_HEADER.size
+                end = len(data)
+                while offset + ENTRY_HEADER.size <= end:
+                    received_ms, imei_length, frame_length = ENTRY_HEADER.unpack_from(data, offset)
+                    start = offset + ENTRY_HEADER.size
+                    frame_start = start + imei_length
+                    frame_end = frame_start + frame_length
+                    if frame_end > end:
+                        logger.warning("Entri terakhir %s terpotong, dilewati", path)
+                        break
+                    imei = data[start:frame_start].decode("ascii")
+                    frame = view[frame_start:frame_end]
+                    try:
+                        yield received_ms, imei, frame
+                    finally:
+                        frame.release()
+                    offset = frame_end
+            finally:
+                view.release()
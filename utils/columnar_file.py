@@ -0,0 +1,247 @@
+import os
+import struct
+import sys
+import zlib
+from array import array
+
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:
+    pyarrow = None
+
+# Format kolumnar lokal tanpa dependency (dipakai bila pyarrow tidak terpasang).
+# File = rangkaian chunk; tiap chunk berdiri sendiri sehingga file sementara sisa crash bisa
+# dipulihkan sampai chunk lengkap terakhir.
+# Chunk: magic, versi, jumlah baris, jumlah kolom, panjang body | body | crc32 body
+# Body per kolom: panjang nama, nama, kode tipe, flag null, panjang data terkompresi, data (zlib).
+# Bila flag null = 1, data diawali mask validitas 1 byte per baris (0 = null); nilai null diisi 0/"".
+# Versi 1 (tanpa flag null) tetap bisa dibaca.
+TCOL_MAGIC = b"TCOL"
+TCOL_VERSION = 2
+CHUNK_HEADER = struct.Struct("<4sBIHI")
+COLUMN_HEADER = struct.Struct("<B")
+COLUMN_DATA_V1 = struct.Struct("<cI")
+COLUMN_DATA = struct.Struct("<cBI")
+CHUNK_CRC = struct.Struct("<I")
+
+# Kode tipe: B bool, q int64, Q uint64, d float64, s string (utf-8, panjang uint32 per nilai)
+INT64_MIN, INT64_MAX, UINT64_MAX = -(1 << 63), (1 << 63) - 1, (1 << 64) - 1
+ARRAY_TYPES = {b"B": "B", b"q": "q", b"Q": "Q", b"d": "d"}
+COMPRESSION_LEVEL = 6
+
+
+class SchemaChanged(Exception):
+    # Tipe kolom chunk baru tidak cocok dengan file yang sedang ditulis; pemanggil membuka file baru
+    pass
+
+
+def column_type(values) -> bytes:
+    # Tipe ditentukan dari nilai yang bukan None; kolom yang seluruhnya None disimpan sebagai string null
+    types = set(map(type, values))
+    if type(None) in types:
+        types.discard(type(None))
+        values = [value for value in values if value is not None]
+    if not types:
+        return b"s"
+    if types == {bool}:
+        return b"B"
+    if types == {int}:
+        low, high = min(values), max(values)
+        if low >= INT64_MIN and high <= INT64_MAX:
+            return b"q"
+        if low >= 0 and high <= UINT64_MAX:
+            return b"Q"
+        return b"s"
+    if types <= {int, float}:
+        return b"d"
+    return b"s"
+
+
+def encode_column(code: bytes, values):
+    # Mengembalikan (ada null, data); data = mask validitas (bila ada null) + nilai
+    mask = b""
+    if None in values:
+        mask = bytes(value is not None for value in values)
+        fill = "" if code == b"s" else 0
+        values = [fill if value is None else value for value in values]
+    if code == b"s":
+        encoded = [str(value).encode("utf-8") for value in values]
+        lengths = array("I", map(len, encoded))
+        if sys.byteorder != "little":
+            lengths.byteswap()
+        return bool(mask), mask + lengths.tobytes() + b"".join(encoded)
+    data = array(ARRAY_TYPES[code], values)
+    if sys.byteorder != "little":
+        data.byteswap()
+    return bool(mask), mask + data.tobytes()
+
+
+def decode_column(code: bytes, data: bytes, rows: int, nullable: bool = False):
+    mask = None
+    if nullable:
+        mask = data[:rows]
+        data = data[rows:]
+    if code == b"s":
+        lengths = array("I")
+        lengths.frombytes(data[:rows * 4])
+        if sys.byteorder != "little":
+            lengths.byteswap()
+        values = []
+        offset = rows * 4
+        for length in lengths:
+            values.append(data[offset:offset + length].decode("utf-8"))
+            offset += length
+    else:
+        values = array(ARRAY_TYPES[code])
+        values.frombytes(data)
+        if sys.byteorder != "little":
+            values.byteswap()
+        if code == b"B":
+            values = [bool(value) for value in values]
+    if mask is not None:
+        return [value if valid else None for value, valid in zip(values, mask)]
+    return values
+
+
+def encode_chunk(columns, rows: int) -> bytes:
+    body = []
+    for name, values in columns.items():
+        name_bytes = name.encode("utf-8")
+        code = column_type(values)
+        nullable, data = encode_column(code, values)
+        data = zlib.compress(data, COMPRESSION_LEVEL)
+        body.append(COLUMN_HEADER.pack(len(name_bytes)) + name_bytes + COLUMN_DATA.pack(code, nullable, len(data)) + data)
+    body = b"".join(body)
+    header = CHUNK_HEADER.pack(TCOL_MAGIC, TCOL_VERSION, rows, len(columns), len(body))
+    return header + body + CHUNK_CRC.pack(zlib.crc32(body))
+
+
+def read_chunks(f):
+    # Menghasilkan (jumlah baris, {kolom: nilai}, posisi akhir chunk); berhenti di chunk rusak/terpotong
+    while True:
+        header = f.read(CHUNK_HEADER.size)
+        if len(header) < CHUNK_HEADER.size:
+            return
+        magic, version, rows, column_count, body_length = CHUNK_HEADER.unpack(header)
+        if magic != TCOL_MAGIC or version not in (1, TCOL_VERSION):
+            return
+        body = f.read(body_length)
+        crc = f.read(CHUNK_CRC.size)
+        if len(body) < body_length or len(crc) < CHUNK_CRC.size or CHUNK_CRC.unpack(crc)[0] != zlib.crc32(body):
+            return
+        columns = {}
+        offset = 0
+        for _ in range(column_count):
+            name_length = body[offset]
+            offset += COLUMN_HEADER.size
+            name = body[offset:offset + name_length].decode("utf-8")
+            offset += name_length
+            if version == 1:
+                code, data_length = COLUMN_DATA_V1.unpack_from(body, offset)
+                nullable = False
+                offset += COLUMN_DATA_V1.size
+            else:
+                code, nullable, data_length = COLUMN_DATA.unpack_from(body, offset)
+                offset += COLUMN_DATA.size
+            columns[name] = decode_column(code, zlib.decompress(body[offset:offset + data_length]), rows, nullable)
+            offset += data_length
+        yield rows, columns, f.tell()
+
+
+def read_tcol(path: str):
+    with open(path, "rb") as f:
+        for rows, columns, _ in read_chunks(f):
+            yield columns
+
+
+def recover_tcol(path: str) -> int:
+    # Memotong file sementara sampai chunk lengkap terakhir; mengembalikan jumlah baris yang selamat
+    rows_total = 0
+    end = 0
+    with open(path, "rb") as f:
+        for rows, _, chunk_end in read_chunks(f):
+            rows_total += rows
+            end = chunk_end
+    with open(path, "r+b") as f:
+        f.truncate(end)
+    return rows_total
+
+
+class TcolFileWriter:
+    extension = "tcol"
+
+    def __init__(self, path: str):
+        self.path = path
+        self.file = open(path, "ab")
+
+    def write(self, columns, rows: int):
+        self.file.write(encode_chunk(columns, rows))
+
+    def size(self) -> int:
+        return self.file.tell()
+
+    def close(self):
+        self.file.flush()
+        os.fsync(self.file.fileno())
+        self.file.close()
+
+
+if pyarrow is not None:
+    PARQUET_TYPES = {
+        b"B": pyarrow.bool_, b"q": pyarrow.int64, b"Q": pyarrow.uint64, b"d": pyarrow.float64, b"s": pyarrow.string,
+    }
+
+
+class ParquetFileWriter:
+    # Satu chunk = satu row group; file baru valid setelah close() menulis footer
+    extension = "parquet"
+
+    def __init__(self, path: str, compression: str = "zstd"):
+        self.path = path
+        self.compression = compression
+        self.file = open(path, "wb")
+        self.writer = None
+
+    def table(self, columns):
+        arrays, names = [], []
+        for name, values in columns.items():
+            code = column_type(values)
+            if code == b"s":
+                values = [None if value is None else str(value) for value in values]
+            arrays.append(pyarrow.array(values, type=PARQUET_TYPES[code]()))
+            names.append(name)
+        return pyarrow.Table.from_arrays(arrays, names=names)
+
+    def write(self, columns, rows: int):
+        table = self.table(columns)
+        if self.writer is None:
+            self.writer = pyarrow.parquet.ParquetWriter(self.file, table.schema, compression=self.compression)
+        elif not table.schema.equals(self.writer.schema):
+            try:
+                table = table.select(self.writer.schema.names).cast(self.writer.schema)
+            except (KeyError, ValueError, pyarrow.ArrowException) as e:
+                raise SchemaChanged(str(e))
+        self.writer.write_table(table)
+
+    def size(self) -> int:
+        return self.file.tell()
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+        self.file.flush()
+        os.fsync(self.file.fileno())
+        self.file.close()
+
+
+def writer_class(name: str):
+    if name == "auto":
+        name = "parquet" if pyarrow is not None else "tcol"
+    if name == "parquet":
+        if pyarrow is None:
+            raise RuntimeError("ARCHIVE_FORMAT=parquet membutuhkan paket pyarrow (pip install pyarrow)")
+        return ParquetFileWriter
+    if name == "tcol":
+        return TcolFileWriter
+    raise ValueError(f"ARCHIVE_FORMAT tidak dikenali: {name}")
@@ -1,22 +1,46 @@
-import asyncio
+def _build_table(polynomial):
+    table = []
+    for byte in range(256):
+        crc = byte
+        for _ in range(8):
+            crc = (crc >> 1) ^ (polynomial if crc & 1 else 0)
+        table.append(crc)
+    return tuple(table)
+
 
 class CRC16ARC:
-   
+
     polynomial = 0xA001
     initial_value = 0x0000
     final_xor = 0x0000
+    table = _build_table(polynomial)
+
+    def __init__(self):
+        # Mode incremental: frame bisa di-checksum sambil datanya masuk
+        self.crc = CRC16ARC.initial_value
+
+    def update(self, data) -> "CRC16ARC":
+        self.crc = CRC16ARC._update(self.crc, data)
+        return self
+
+    def digest(self) -> int:
+        return self.crc ^ CRC16ARC.final_xor
+
+    def reset(self):
+        self.crc = CRC16ARC.initial_value
 
     @staticmethod
-    async def compute_crc(data: bytes) -> int:
-        crc = CRC16ARC.initial_value  
+    def _update(crc: int, data) -> int:
+        # data boleh bytes, bytearray atau memoryview; tidak ada salinan yang dibuat
+        table = CRC16ARC.table
         for byte in data:
-            crc ^= byte
-            for _ in range(8):
-                crc = (crc >> 1) ^ (CRC16ARC.polynomial if crc & 1 else 0)
-            await asyncio.sleep(0)
-        return crc ^ CRC16ARC.final_xor
-    
+            crc = (crc >> 8) ^ table[(crc ^ byte) & 0xFF]
+        return crc
+
+    @staticmethod
+    def compute(data) -> int:
+        return CRC16ARC._update(CRC16ARC.initial_value, data) ^ CRC16ARC.final_xor
+
     @staticmethod
-    async def verify_crc(data: bytes, expected_crc: int) -> bool:
-        calculated_crc = await CRC16ARC.compute_crc(data)
-        return calculated_crc == expected_crc
+    def verify(data, expected_crc: int) -> bool:
+        return CRC16ARC.compute(data) == expected_crc
@@ -0,0 +1,184 @@
+import asyncio
+import os
+import struct
+import sys
+import time
+from array import array
+from itertools import islice
+from utils.log import get_logger
+
+logger = get_logger("dedup")
+
+# Header snapshot: magic, versi; per device: panjang IMEI, jumlah entri
+SNAPSHOT_MAGIC = b"TDDP"
+SNAPSHOT_HEADER = struct.Struct(">4sH")
+DEVICE_HEADER = struct.Struct(">HI")
+SNAPSHOT_VERSION = 1
+
+
+def record_key(timestamp_ms: int, priority: int) -> int:
+    # (timestamp, priority) dipadatkan jadi satu int; priority Teltonika hanya 0..2
+    return timestamp_ms << 2 | priority
+
+
+def split_key(key: int):
+    return key >> 2, key & 3
+
+
+class DedupIndex:
+    # Indeks record yang sudah dipublish per IMEI, untuk membuang batch yang dikirim ulang device
+    # karena ACK hilang/terlambat. Per device: dict key -> waktu terlihat (epoch detik), urut sisip,
+    # dibatasi max_per_device dan dibersihkan per ttl oleh prune().
+
+    def __init__(self, ttl: float, max_per_device: int, snapshot_path: str = ""):
+        self.ttl = ttl
+        self.max_per_device = max(4, max_per_device)
+        self.snapshot_path = snapshot_path
+        self.devices = {}
+        self.entries = 0
+        self.task = None
+
+    def __len__(self):
+        return len(self.devices)
+
+    def seen(self, imei: str):
+        return self.devices.get(imei, ())
+
+    def add(self, imei: str, keys):
+        if not keys:
+            return
+        known = self.devices.get(imei)
+        if known is None:
+            known = self.devices[imei] = {}
+        before = len(known)
+        now = int(time.time())
+        for key in keys:
+            known.setdefault(key, now)
+        if len(known) > self.max_per_device:
+            # Buang seperempat entri tertua sekaligus supaya biayanya teramortisasi
+            known = self.devices[imei] = dict(islice(known.items(), len(known) - self.max_per_device * 3 // 4, None))
+        self.entries += len(known) - before
+
+    def prune(self, now: float = None) -> int:
+        cutoff = (time.time() if now is None else now) - self.ttl
+        removed = 0
+        for imei in list(self.devices):
+            known = self.devices[imei]
+            # Entri urut waktu sisip: cukup cek entri tertua
+            if next(iter(known.values())) >= cutoff:
+                continue
+            fresh = {key: seen for key, seen in known.items() if seen >= cutoff}
+            removed += len(known) - len(fresh)
+            if fresh:
+                self.devices[imei] = fresh
+            else:
+                del self.devices[imei]
+        self.entries -= removed
+        return removed
+
+    def dump(self) -> bytes:
+        chunks = [SNAPSHOT_HEADER.pack(SNAPSHOT_MAGIC, SNAPSHOT_VERSION)]
+        for imei, known in self.devices.items():
+            imei_bytes = imei.encode("ascii")
+            chunks.append(DEVICE_HEADER.pack(len(imei_bytes), len(known)))
+            chunks.append(imei_bytes)
+            keys = array("q", known)
+            seen = array("q", known.values())
+            if sys.byteorder != "big":
+                keys.byteswap()
+                seen.byteswap()
+            chunks.append(keys.tobytes())
+            chunks.append(seen.tobytes())
+        return b"".join(chunks)
+
+    @staticmethod
+    def write_file(path: str, data: bytes):
+        # Tulis ke file sementara lalu rename, supaya snapshot lama tidak rusak bila proses mati di tengah
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+
+    def save(self):
+        if not self.snapshot_path:
+            return
+        self.prune()
+        self.write_file(self.snapshot_path, self.dump())
+        logger.info("Snapshot dedup disimpan: %d device, %d entri (%s)", len(self.devices), self.entries, self.snapshot_path)
+
+    async def save_async(self):
+        # dump() di event loop (dict bisa berubah), tulis file di thread
+        if not self.snapshot_path:
+            return
+        self.prune()
+        data = self.dump()
+        await asyncio.get_running_loop().run_in_executor(None, self.write_file, self.snapshot_path, data)
+        logger.debug("Snapshot dedup disimpan: %d device, %d entri", len(self.devices), self.entries)
+
+    def load(self):
+        if not self.snapshot_path or not os.path.exists(self.snapshot_path):
+            return
+        try:
+            with open(self.snapshot_path, "rb") as f:
+                data = f.read()
+            magic, version = SNAPSHOT_HEADER.unpack_from(data, 0)
+            if magic != SNAPSHOT_MAGIC or version != SNAPSHOT_VERSION:
+                raise ValueError("format snapshot tidak dikenali")
+            offset = SNAPSHOT_HEADER.size
+            devices = {}
+            while offset < len(data):
+                imei_length, count = DEVICE_HEADER.unpack_from(data, offset)
+                offset += DEVICE_HEADER.size
+                imei = data[offset:offset + imei_length].decode("ascii")
+                offset += imei_length
+                keys = array("q")
+                seen = array("q")
+                keys.frombytes(data[offset:offset + count * 8])
+                offset += count * 8
+                seen.frombytes(data[offset:offset + count * 8])
+                offset += count * 8
+                if len(keys) != count or len(seen) != count:
+                    raise ValueError("snapshot terpotong")
+                if sys.byteorder != "big":
+                    keys.byteswap()
+                    seen.byteswap()
+                devices[imei] = dict(zip(keys, seen))
+        except (OSError, ValueError, struct.error, UnicodeDecodeError) as e:
+            logger.warning("Snapshot dedup %s tidak bisa dibaca, mulai dari kosong: %s", self.snapshot_path, e)
+            return
+        self.devices = devices
+        self.entries = sum(len(known) for known in devices.values())
+        removed = self.prune()
+        logger.info("Snapshot dedup dimuat: %d device, %d entri (%d kedaluwarsa dibuang)", len(self.devices), self.entries, removed)
+
+    async def maintain(self, prune_interval: float, snapshot_interval: float):
+        loop = asyncio.get_running_loop()
+        next_snapshot = loop.time() + snapshot_interval
+        while True:
+            await asyncio.sleep(prune_interval)
+            self.prune()
+            if self.snapshot_path and snapshot_interval > 0 and loop.time() >= next_snapshot:
+                next_snapshot = loop.time() + snapshot_interval
+                try:
+                    await self.save_async()
+                except OSError as e:
+                    logger.error("Gagal menyimpan snapshot dedup: %s", e)
+
+    def start(self, prune_interval: float, snapshot_interval: float):
+        self.load()
+        if self.task is None:
+            self.task = asyncio.create_task(self.maintain(prune_interval, snapshot_interval))
+
+    def stop(self):
+        if self.task is not None:
+            self.task.cancel()
+            self.task = None
+        try:
+            self.save()
+        except OSError as e:
+            logger.error("Gagal menyimpan snapshot dedup: %s", e)
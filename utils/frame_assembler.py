@@ -0,0 +1,68 @@
+import struct
+
+_HEADER = struct.Struct(">II")
+HEADER_SIZE = _HEADER.size
+CRC_SIZE = 4
+
+
+class FrameError(ValueError):
+    pass
+
+
+class AVLFrameAssembler:
+    # Satu buffer per koneksi: preamble (4B) + data field length (4B) + data field + CRC (4B)
+
+    __slots__ = ("buffer", "start", "max_frame_size")
+
+    def __init__(self, max_frame_size: int):
+        self.buffer = bytearray()
+        self.start = 0
+        self.max_frame_size = max_frame_size
+
+    def pending(self) -> int:
+        return len(self.buffer) - self.start
+
+    def feed(self, data):
+        self._compact()
+        self.buffer += data
+
+    def frames(self):
+        # Menghasilkan memoryview untuk setiap frame lengkap tanpa menyalin buffer.
+        # Pemanggil wajib me-release view (mis. `with frame:`) sebelum feed() berikutnya.
+        buffer = self.buffer
+        view = memoryview(buffer)
+        try:
+            while True:
+                available = len(buffer) - self.start
+                if available < HEADER_SIZE:
+                    return
+                preamble, data_field_length = _HEADER.unpack_from(buffer, self.start)
+                if preamble != 0:
+                    raise FrameError(f"Preamble tidak valid: {preamble:#010x}")
+                frame_size = HEADER_SIZE + data_field_length + CRC_SIZE
+                if data_field_length < 3 or frame_size > self.max_frame_size:
+                    raise FrameError(f"Data field length tidak valid: {data_field_length} bytes")
+                if available < frame_size:
+                    return
+                end = self.start + frame_size
+                frame = view[self.start:end]
+                self.start = end
+                yield frame
+        finally:
+            view.release()
+
+    def trim(self):
+        # Dipanggil setelah frame diproses: koneksi yang diam tidak menahan buffer chunk terakhir
+        if self.start and self.start == len(self.buffer):
+            self.buffer = bytearray()
+            self.start = 0
+
+    def _compact(self):
+        if not self.start:
+            return
+        try:
+            del self.buffer[:self.start]
+        except BufferError:
+            # Masih ada view frame lama yang dipegang; pindah ke buffer baru
+            self.buffer = self.buffer[self.start:]
+        self.start = 0
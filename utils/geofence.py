@@ -0,0 +1,363 @@
+import asyncio
+import json
+import os
+import time
+from math import cos, radians
+from utils.dedup import split_key
+from utils.log import get_logger
+from utils.metrics import geofence_events_total, geofence_reloads_total
+
+logger = get_logger("geofence")
+
+METERS_PER_DEGREE = 111_320.0
+# Zona yang menutupi lebih dari sekian sel grid tidak dipecah ke sel, cukup dicek bbox-nya setiap record
+MAX_ZONE_CELLS = 4096
+NO_ZONES = frozenset()
+
+ENTER_COUNTER = geofence_events_total.labels("enter")
+EXIT_COUNTER = geofence_events_total.labels("exit")
+
+
+class Zone:
+    # Satu geofence: polygon (ring luar + lubang, atau multipolygon) atau lingkaran (pusat + radius meter).
+    # Ring disimpan sebagai (xs, ys) = (longitude, latitude) untuk ray casting even-odd.
+
+    __slots__ = ("id", "name", "bbox", "rings", "center", "radius", "lon_scale", "signature")
+
+    def __init__(self, zone_id: str, name: str, rings=None, center=None, radius: float = 0.0):
+        self.id = zone_id
+        self.name = name
+        self.rings = rings
+        self.center = center
+        self.radius = radius
+        if rings is not None:
+            self.bbox = (
+                min(min(ys) for _, ys in rings), min(min(xs) for xs, _ in rings),
+                max(max(ys) for _, ys in rings), max(max(xs) for xs, _ in rings),
+            )
+            self.lon_scale = 0.0
+        else:
+            latitude, longitude = center
+            self.lon_scale = cos(radians(latitude))
+            dlat = radius / METERS_PER_DEGREE
+            dlon = dlat / max(self.lon_scale, 1e-6)
+            self.bbox = (latitude - dlat, longitude - dlon, latitude + dlat, longitude + dlon)
+        # Dipakai saat reload untuk mengenali zona yang tidak berubah
+        self.signature = (name, rings, center, radius)
+
+    @classmethod
+    def from_feature(cls, feature) -> "Zone":
+        # GeoJSON Feature: Polygon/MultiPolygon, atau Point dengan properties.radius (meter) untuk lingkaran
+        properties = feature.get("properties") or {}
+        zone_id = feature.get("id", properties.get("id"))
+        if zone_id is None:
+            raise ValueError("zona tanpa id")
+        zone_id = str(zone_id)
+        name = str(properties.get("name", zone_id))
+        geometry = feature["geometry"]
+        kind = geometry["type"]
+        if kind == "Point":
+            longitude, latitude = geometry["coordinates"][:2]
+            radius = float(properties.get("radius", 0))
+            if radius <= 0:
+                raise ValueError(f"zona lingkaran {zone_id} tanpa radius")
+            return cls(zone_id, name, center=(float(latitude), float(longitude)), radius=radius)
+        if kind == "Polygon":
+            polygons = [geometry["coordinates"]]
+        elif kind == "MultiPolygon":
+            polygons = geometry["coordinates"]
+        else:
+            raise ValueError(f"geometri {kind} tidak didukung (zona {zone_id})")
+        rings = tuple(
+            (tuple(float(point[0]) for point in ring), tuple(float(point[1]) for point in ring))
+            for polygon in polygons for ring in polygon if len(ring) >= 3
+        )
+        if not rings:
+            raise ValueError(f"zona polygon {zone_id} kosong")
+        return cls(zone_id, name, rings=rings)
+
+    def contains(self, latitude: float, longitude: float) -> bool:
+        south, west, north, east = self.bbox
+        if not (south <= latitude <= north and west <= longitude <= east):
+            return False
+        if self.rings is None:
+            center_latitude, center_longitude = self.center
+            dy = (latitude - center_latitude) * METERS_PER_DEGREE
+            dx = (longitude - center_longitude) * METERS_PER_DEGREE * self.lon_scale
+            return dx * dx + dy * dy <= self.radius * self.radius
+        inside = False
+        for xs, ys in self.rings:
+            j = len(xs) - 1
+            for i in range(len(xs)):
+                yi, yj = ys[i], ys[j]
+                if (yi > latitude) != (yj > latitude) and \
+                        longitude < (xs[j] - xs[i]) * (latitude - yi) / (yj - yi) + xs[i]:
+                    inside = not inside
+                j = i
+        return inside
+
+
+class GridIndex:
+    # Grid lat/lon seragam: sel -> {zone_id: (south, west, north, east, zone)}. Setiap record hanya
+    # mengecek zona di selnya sendiri; bbox disimpan di entri supaya penyaringan awal tanpa method call.
+
+    def __init__(self, cell_size: float):
+        self.cell_size = cell_size
+        self.cells = {}
+        self.large = {}
+
+    def span(self, zone: Zone):
+        south, west, north, east = zone.bbox
+        size = self.cell_size
+        return range(int(south // size), int(north // size) + 1), range(int(west // size), int(east // size) + 1)
+
+    def insert(self, zone: Zone):
+        rows, columns = self.span(zone)
+        entry = zone.bbox + (zone,)
+        if len(rows) * len(columns) > MAX_ZONE_CELLS:
+            self.large[zone.id] = entry
+            return
+        cells = self.cells
+        for row in rows:
+            for column in columns:
+                cell = cells.get((row, column))
+                if cell is None:
+                    cell = cells[(row, column)] = {}
+                cell[zone.id] = entry
+
+    def remove(self, zone: Zone):
+        if self.large.pop(zone.id, None) is not None:
+            return
+        rows, columns = self.span(zone)
+        cells = self.cells
+        for row in rows:
+            for column in columns:
+                cell = cells.get((row, column))
+                if cell is not None:
+                    cell.pop(zone.id, None)
+                    if not cell:
+                        del cells[(row, column)]
+
+    def candidates(self, latitude: float, longitude: float):
+        size = self.cell_size
+        cell = self.cells.get((int(latitude // size), int(longitude // size)))
+        if cell is None:
+            return self.large.values()
+        if not self.large:
+            return cell.values()
+        return list(cell.values()) + list(self.large.values())
+
+
+class DeviceFence:
+    # Zona tempat device berada saat ini plus posisi terakhir yang dievaluasi.
+    # updated: jam server (monotonic) frame terakhir, hanya untuk melepas device yang diam
+    __slots__ = ("inside", "latitude", "longitude", "timestamp_ms", "generation", "updated")
+
+    def __init__(self, inside, latitude, longitude, timestamp_ms: int, generation: int):
+        self.inside = inside
+        self.latitude = latitude
+        self.longitude = longitude
+        self.timestamp_ms = timestamp_ms
+        self.generation = generation
+        self.updated = time.monotonic()
+
+
+def load_zones(path: str):
+    # Berjalan di thread executor saat reload: parsing file besar tidak menahan event loop
+    with open(path, "r", encoding="utf-8") as f:
+        document = json.load(f)
+    # FeatureCollection atau list Feature; bentuk lain ditolak dengan ValueError supaya set zona lama tetap dipakai
+    features = document.get("features") if isinstance(document, dict) else document
+    if not isinstance(features, list):
+        raise ValueError(f"file zona harus FeatureCollection atau list Feature, bukan {type(document).__name__}")
+    zones = {}
+    for feature in features:
+        try:
+            if not isinstance(feature, dict):
+                raise TypeError(f"feature harus object, bukan {type(feature).__name__}")
+            zone = Zone.from_feature(feature)
+        except (KeyError, TypeError, ValueError, IndexError) as e:
+            logger.warning("Zona geofence dilewati: %s", e)
+            continue
+        zones[zone.id] = zone
+    return zones
+
+
+class GeofenceEngine:
+    # Evaluasi geofence saat ingest: setiap posisi dicek ke zona kandidat dari grid, state masuk/keluar
+    # disimpan per IMEI, dan hanya transisi (enter/exit) yang dikembalikan sebagai event.
+    # File zona (GeoJSON) dipantau mtime-nya; reload hanya memindahkan zona yang berubah di index.
+    # State device yang tidak mengirim apa pun selama idle_ttl detik (jam server) dilepas.
+
+    def __init__(self, path: str, cell_size: float = 0.01, reload_interval: float = 10.0,
+                 topic_template: str = "topic/geofence", idle_ttl: float = 86400.0):
+        self.path = path
+        self.reload_interval = reload_interval
+        self.idle_ttl = idle_ttl
+        self.topic_template = topic_template
+        self.index = GridIndex(cell_size)
+        self.zones = {}
+        self.devices = {}
+        self.topics = {}
+        self.mtime = None
+        # Naik setiap set zona berubah; device diam dievaluasi ulang sekali setelah reload
+        self.generation = 0
+        self.events = 0
+        self.task = None
+
+    def __len__(self):
+        return len(self.zones)
+
+    def topic_for(self, imei: str) -> str:
+        topic = self.topics.get(imei)
+        if topic is None:
+            topic = self.topics[imei] = self.topic_template.format(imei=imei)
+        return topic
+
+    def apply(self, zones):
+        # Diff terhadap set zona lama: hanya zona baru/berubah/dihapus yang disentuh di index
+        added = changed = removed = 0
+        for zone_id, zone in self.zones.items():
+            new_zone = zones.get(zone_id)
+            if new_zone is None:
+                self.index.remove(zone)
+                removed += 1
+            elif new_zone.signature != zone.signature:
+                self.index.remove(zone)
+                self.index.insert(new_zone)
+                changed += 1
+            else:
+                zones[zone_id] = zone
+        for zone_id, zone in zones.items():
+            if zone_id not in self.zones:
+                self.index.insert(zone)
+                added += 1
+        self.zones = zones
+        if removed:
+            # Zona yang dihapus dilupakan tanpa event exit
+            for state in self.devices.values():
+                if state.inside and not state.inside <= zones.keys():
+                    state.inside = frozenset(zone_id for zone_id in state.inside if zone_id in zones)
+        if added or changed or removed:
+            self.generation += 1
+        geofence_reloads_total.inc()
+        logger.info("Zona geofence dimuat dari %s: %d zona (%d baru, %d berubah, %d dihapus)",
+                    self.path, len(zones), added, changed, removed)
+
+    def reload(self) -> bool:
+        mtime = os.stat(self.path).st_mtime_ns
+        if mtime == self.mtime:
+            return False
+        self.apply(load_zones(self.path))
+        self.mtime = mtime
+        return True
+
+    async def reload_async(self):
+        try:
+            mtime = os.stat(self.path).st_mtime_ns
+            if mtime == self.mtime:
+                return
+            zones = await asyncio.get_running_loop().run_in_executor(None, load_zones, self.path)
+        except (OSError, ValueError) as e:
+            # File sedang ditulis/rusak: set zona lama tetap dipakai, dicoba lagi di interval berikutnya
+            logger.error("Gagal memuat ulang zona geofence %s: %s", self.path, e)
+            return
+        self.apply(zones)
+        self.mtime = mtime
+
+    def prune(self, now: float = None) -> int:
+        # Device yang kembali setelah dilepas diperlakukan seperti posisi pertama (tanpa event)
+        cutoff = (time.monotonic() if now is None else now) - self.idle_ttl
+        idle = [imei for imei, state in self.devices.items() if state.updated < cutoff]
+        for imei in idle:
+            del self.devices[imei]
+            self.topics.pop(imei, None)
+        return len(idle)
+
+    async def maintain(self):
+        loop = asyncio.get_running_loop()
+        prune_interval = max(1.0, min(self.idle_ttl / 4, 60.0)) if self.idle_ttl > 0 else 0.0
+        next_reload = loop.time() + self.reload_interval
+        next_prune = loop.time() + prune_interval
+        while True:
+            due = [
+                moment for moment, interval in ((next_reload, self.reload_interval), (next_prune, prune_interval))
+                if interval > 0
+            ]
+            await asyncio.sleep(max(0.0, min(due) - loop.time()))
+            now = loop.time()
+            if prune_interval > 0 and now >= next_prune:
+                next_prune = now + prune_interval
+                self.prune()
+            if self.reload_interval > 0 and now >= next_reload:
+                next_reload = now + self.reload_interval
+                await self.reload_async()
+
+    def start(self):
+        self.reload()
+        if self.task is None and (self.reload_interval > 0 or self.idle_ttl > 0):
+            self.task = asyncio.create_task(self.maintain())
+
+    def stop(self):
+        if self.task is not None:
+            self.task.cancel()
+            self.task = None
+
+    def zones_at(self, latitude: float, longitude: float):
+        inside = [
+            zone.id for south, west, north, east, zone in self.index.candidates(latitude, longitude)
+            if south <= latitude <= north and west <= longitude <= east and zone.contains(latitude, longitude)
+        ]
+        return frozenset(inside) if inside else NO_ZONES
+
+    def event(self, kind: str, imei: str, zone_id: str, record):
+        zone = self.zones.get(zone_id)
+        return {
+            "imei": imei,
+            "event": kind,
+            "zone_id": zone_id,
+            "zone_name": zone.name if zone is not None else zone_id,
+            "timestamp": record["timestamp"],
+            "latitude": record["latitude"],
+            "longitude": record["longitude"],
+            "speed": record.get("speed"),
+        }
+
+    def evaluate(self, imei: str, payload, keys):
+        # payload: record hasil mapping satu frame (utuh), keys: record_key() sejajar.
+        # Posisi pertama sebuah IMEI hanya mengisi state; event muncul pada transisi berikutnya.
+        events = []
+        state = self.devices.get(imei)
+        generation = self.generation
+        for record, key in zip(payload, keys):
+            timestamp_ms = split_key(key)[0]
+            latitude = record["latitude"]
+            longitude = record["longitude"]
+            if state is None:
+                state = self.devices[imei] = DeviceFence(
+                    self.zones_at(latitude, longitude), latitude, longitude, timestamp_ms, generation
+                )
+                continue
+            if timestamp_ms < state.timestamp_ms:
+                # Record terlambat tidak mengubah state masuk/keluar
+                continue
+            state.timestamp_ms = timestamp_ms
+            if latitude == state.latitude and longitude == state.longitude and state.generation == generation:
+                continue
+            state.latitude = latitude
+            state.longitude = longitude
+            state.generation = generation
+            inside = self.zones_at(latitude, longitude)
+            if inside == state.inside:
+                continue
+            for zone_id in inside - state.inside:
+                events.append(self.event("enter", imei, zone_id, record))
+                ENTER_COUNTER.inc()
+            for zone_id in state.inside - inside:
+                events.append(self.event("exit", imei, zone_id, record))
+                EXIT_COUNTER.inc()
+            state.inside = inside
+        if state is not None:
+            state.updated = time.monotonic()
+        self.events += len(events)
+        return events
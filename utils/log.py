@@ -0,0 +1,111 @@
+import logging
+import time
+from abc import ABC, abstractmethod
+from config.config import Config
+
+ROOT_LOGGER = "teltonika"
+COMPONENTS = ("server", "framing", "codec", "mapper", "mqtt")
+
+# IMEI yang pesan debug-nya tetap dikeluarkan walaupun level komponen INFO
+debug_imeis = frozenset()
+
+
+class OncePerRecordFilter(logging.Filter, ABC):
+    # Satu instance dipasang di semua handler root (file + stdout); keputusan disimpan di record
+    # supaya counter hanya maju sekali per record, dan semua handler melihat keputusan yang sama
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        decisions = record.__dict__.setdefault("log_filter_decisions", {})
+        decision = decisions.get(id(self))
+        if decision is None:
+            decision = decisions[id(self)] = self.check(record)
+        return decision
+
+    @abstractmethod
+    def check(self, record: logging.LogRecord) -> bool:
+        pass
+
+
+class RateLimitFilter(OncePerRecordFilter):
+    # Membatasi pesan berulang per template (record.msg), bukan per teks hasil format
+
+    def __init__(self, interval: float, burst: int):
+        super().__init__()
+        self.interval = interval
+        self.burst = burst
+        self.windows = {}
+
+    def check(self, record: logging.LogRecord) -> bool:
+        if self.interval <= 0 or getattr(record, "device_debug", False):
+            return True
+        key = (record.name, record.msg)
+        now = time.monotonic()
+        window = self.windows.get(key)
+        if window is None or now - window[0] >= self.interval:
+            suppressed = window[2] if window else 0
+            self.windows[key] = [now, 1, 0]
+            if suppressed:
+                record.msg = f"{record.getMessage()} ({suppressed} pesan serupa disembunyikan)"
+                record.args = None
+            return True
+        if window[1] < self.burst:
+            window[1] += 1
+            return True
+        window[2] += 1
+        return False
+
+
+class SampleFilter(OncePerRecordFilter):
+    # Hanya meneruskan 1 dari setiap N record di bawah level WARNING
+
+    def __init__(self, rate: int):
+        super().__init__()
+        self.rate = rate
+        self.counter = 0
+
+    def check(self, record: logging.LogRecord) -> bool:
+        if self.rate <= 1 or record.levelno >= logging.WARNING or getattr(record, "device_debug", False):
+            return True
+        self.counter += 1
+        return self.counter % self.rate == 0
+
+
+def get_logger(component: str) -> logging.Logger:
+    return logging.getLogger(f"{ROOT_LOGGER}.{component}")
+
+
+def device_debug_enabled(logger: logging.Logger, imei: str) -> bool:
+    # Dipakai sebagai guard sebelum format per-record di hot path
+    return imei in debug_imeis or logger.isEnabledFor(logging.DEBUG)
+
+
+def device_debug(logger: logging.Logger, imei: str, msg: str, *args):
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug(msg, *args)
+    elif imei in debug_imeis:
+        # Dinaikkan ke INFO supaya lolos dari level produksi
+        logger.info("[debug %s] " + msg, imei, *args, extra={"device_debug": True})
+
+
+def parse_levels(spec: str):
+    levels = {}
+    for item in filter(None, (part.strip() for part in spec.split(","))):
+        component, _, level = item.partition("=")
+        levels[component.strip()] = level.strip().upper()
+    return levels
+
+
+def setup_logging():
+    global debug_imeis
+
+    logging.getLogger(ROOT_LOGGER).setLevel(Config.LOG_LEVEL)
+    for component, level in parse_levels(Config.LOG_LEVELS).items():
+        get_logger(component).setLevel(level)
+
+    debug_imeis = frozenset(imei.strip() for imei in Config.DEBUG_IMEIS.split(",") if imei.strip())
+
+    rate_limit = RateLimitFilter(Config.LOG_RATE_LIMIT_INTERVAL, Config.LOG_RATE_LIMIT_BURST)
+    sample = SampleFilter(Config.LOG_SAMPLE_RATE)
+    for handler in logging.getLogger().handlers:
+        handler.addFilter(rate_limit)
+        handler.addFilter(sample)
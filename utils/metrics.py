@@ -0,0 +1,219 @@
+from abc import ABC, abstractmethod
+from bisect import bisect_left
+
+# Bucket default (detik) untuk durasi decode/mapping/serialisasi/publish
+LATENCY_BUCKETS = (0.0001, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+
+
+def format_labels(names, values, extra=""):
+    pairs = [f'{name}="{value}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def format_value(value) -> str:
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class CounterChild:
+    __slots__ = ("value",)
+
+    def __init__(self):
+        self.value = 0
+
+    def inc(self, amount=1):
+        self.value += amount
+
+
+class HistogramChild:
+    # counts per bucket (tidak kumulatif); dijumlahkan saat render supaya observe() tetap murah
+    __slots__ = ("bounds", "counts", "sum", "count")
+
+    def __init__(self, bounds):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class Metric(ABC):
+    kind = None
+
+    def __init__(self, name: str, help_text: str, labels=(), label_values=()):
+        self.name = name
+        self.help = help_text
+        self.label_names = tuple(labels)
+        self.children = {}
+        # Kombinasi label didaftarkan di awal; hot path cukup memegang referensi child
+        for values in label_values:
+            self.labels(*values)
+        if not self.label_names:
+            self.children[()] = self.new_child()
+
+    @abstractmethod
+    def new_child(self):
+        pass
+
+    def labels(self, *values):
+        values = tuple(str(value) for value in values)
+        child = self.children.get(values)
+        if child is None:
+            child = self.children[values] = self.new_child()
+        return child
+
+    def header(self):
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def new_child(self):
+        return CounterChild()
+
+    def inc(self, amount=1):
+        self.children[()].value += amount
+
+    def render(self):
+        lines = self.header()
+        for values, child in self.children.items():
+            lines.append(f"{self.name}{format_labels(self.label_names, values)} {format_value(child.value)}")
+        return lines
+
+
+class Gauge(Metric):
+    # Nilai dibaca saat scrape lewat callback: tidak ada biaya sama sekali di hot path.
+    # callback mengembalikan angka, atau dict label_values -> angka untuk gauge berlabel.
+    kind = "gauge"
+
+    def __init__(self, name: str, help_text: str, callback, labels=()):
+        self.callback = callback
+        super().__init__(name, help_text, labels)
+
+    def new_child(self):
+        return None
+
+    def render(self):
+        lines = self.header()
+        value = self.callback()
+        items = value.items() if isinstance(value, dict) else (((), value),)
+        for values, child_value in items:
+            if not isinstance(values, tuple):
+                values = (values,)
+            lines.append(f"{self.name}{format_labels(self.label_names, values)} {format_value(child_value)}")
+        return lines
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help_text: str, labels=(), label_values=(), buckets=LATENCY_BUCKETS):
+        self.bounds = tuple(sorted(buckets))
+        super().__init__(name, help_text, labels, label_values)
+
+    def new_child(self):
+        return HistogramChild(self.bounds)
+
+    def observe(self, value):
+        self.children[()].observe(value)
+
+    def render(self):
+        lines = self.header()
+        for values, child in self.children.items():
+            cumulative = 0
+            for bound, count in zip(self.bounds + (float("inf"),), child.counts):
+                cumulative += count
+                le = 'le="+Inf"' if bound == float("inf") else f'le="{bound!r}"'
+                lines.append(f"{self.name}_bucket{format_labels(self.label_names, values, le)} {cumulative}")
+            labels = format_labels(self.label_names, values)
+            lines.append(f"{self.name}_sum{labels} {format_value(child.sum)}")
+            lines.append(f"{self.name}_count{labels} {child.count}")
+        return lines
+
+
+class MetricsRegistry:
+    def __init__(self, prefix: str = "teltonika_"):
+        self.prefix = prefix
+        self.metrics = {}
+
+    def register(self, metric):
+        metric.name = self.prefix + metric.name
+        if metric.name in self.metrics:
+            raise ValueError(f"Metric {metric.name} sudah terdaftar")
+        self.metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name, help_text, labels=(), label_values=()) -> Counter:
+        return self.register(Counter(name, help_text, labels, label_values))
+
+    def gauge(self, name, help_text, callback, labels=()) -> Gauge:
+        return self.register(Gauge(name, help_text, callback, labels))
+
+    def histogram(self, name, help_text, labels=(), label_values=(), buckets=LATENCY_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, help_text, labels, label_values, buckets))
+
+    def render(self) -> str:
+        lines = []
+        for metric in self.metrics.values():
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+metrics = MetricsRegistry()
+
+# Codec yang didukung; label didaftarkan di awal supaya hot path tidak membuat child baru
+CODECS = (("8",), ("8e",))
+CODEC_LABELS = {0x08: "8", 0x8E: "8e"}
+
+connections_total = metrics.counter("connections_total", "Jumlah koneksi TCP yang diterima")
+connection_events_total = metrics.counter(
+    "connection_events_total", "Koneksi yang ditolak atau diputus server per alasan", ("event",),
+    (("rejected",), ("login_timeout",), ("invalid_login",), ("duplicate",), ("idle_timeout",), ("frame_timeout",), ("drain",)),
+)
+bytes_received_total = metrics.counter("bytes_received_total", "Byte yang diterima dari device")
+frames_total = metrics.counter("frames_total", "Frame AVL yang diproses per codec", ("codec",), CODECS)
+records_total = metrics.counter("records_total", "Record AVL yang berhasil didecode per codec", ("codec",), CODECS)
+frame_errors_total = metrics.counter(
+    "frame_errors_total", "Frame yang ditolak per alasan", ("reason",),
+    (("crc",), ("unknown_codec",), ("decode",), ("short",), ("framing",)),
+)
+unknown_codec_total = metrics.counter("unknown_codec_total", "Frame dengan codec ID tidak dikenali", ("codec_id",))
+decode_seconds = metrics.histogram("decode_seconds", "Durasi CRC + decode per frame", ("codec",), CODECS)
+mapping_seconds = metrics.histogram("mapping_seconds", "Durasi mapping record satu frame ke payload")
+serialization_seconds = metrics.histogram("serialization_seconds", "Durasi serialisasi satu pesan MQTT")
+publish_seconds = metrics.histogram("publish_seconds", "Latency publish MQTT per pesan")
+publish_failures_total = metrics.counter("publish_failures_total", "Publish MQTT yang gagal (di-spool atau dibuang)")
+dropped_records_total = metrics.counter("dropped_records_total", "Record yang dibuang publisher (gagal serialisasi, gagal ditulis ke spool, atau gagal publish tanpa spool)")
+offloaded_frames_total = metrics.counter("offloaded_frames_total", "Frame besar yang didecode di executor")
+duplicate_records_total = metrics.counter("duplicate_records_total", "Record yang dibuang karena sudah pernah dipublish (batch dikirim ulang)")
+duplicate_frames_total = metrics.counter("duplicate_frames_total", "Frame yang seluruh record-nya duplikat")
+filtered_records_total = metrics.counter(
+    "filtered_records_total", "Record yang dibuang filter sebelum mapping per aturan", ("rule",),
+    (("zero_position",), ("out_of_range",), ("ancient_timestamp",), ("future_timestamp",), ("low_satellites",), ("speed_jump",)),
+)
+suppressed_records_total = metrics.counter("suppressed_records_total", "Record yang tidak dipublish karena state device tidak berubah")
+geofence_events_total = metrics.counter(
+    "geofence_events_total", "Event transisi geofence yang dipublish", ("event",), (("enter",), ("exit",)),
+)
+geofence_reloads_total = metrics.counter("geofence_reloads_total", "Set zona geofence yang dimuat (start + reload)")
+trip_summaries_total = metrics.counter(
+    "trip_summaries_total", "Ringkasan trip/interval yang dipublish", ("type",), (("trip",), ("interval",)),
+)
+trip_late_records_total = metrics.counter(
+    "trip_late_records_total", "Record terlambat yang tidak masuk ringkasan karena window-nya sudah dipublish",
+)
+simplified_records_total = metrics.counter(
+    "simplified_records_total", "Record yang tidak dipublish karena terwakili segmen lintasan yang disederhanakan",
+)
+archive_records_total = metrics.counter("archive_records_total", "Record yang ditulis ke arsip kolumnar")
+archive_dropped_records_total = metrics.counter("archive_dropped_records_total", "Record yang tidak diarsip (buffer penuh atau gagal tulis)")
+archive_files_total = metrics.counter("archive_files_total", "File arsip yang sudah difinalisasi")
+archive_write_seconds = metrics.histogram("archive_write_seconds", "Durasi menulis satu batch arsip (di thread writer)")
+captured_frames_total = metrics.counter("captured_frames_total", "Frame mentah yang disimpan ke file capture")
+capture_bytes_total = metrics.counter("capture_bytes_total", "Byte yang ditulis ke file capture")
@@ -0,0 +1,59 @@
+import asyncio
+import logging
+import multiprocessing
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from utils.log import get_logger, setup_logging
+
+logger = get_logger("server")
+
+EXECUTOR_KINDS = ("none", "thread", "process")
+
+
+def init_process_worker():
+    # Process hasil spawn tidak mewarisi konfigurasi logging dari index.py
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    setup_logging()
+
+
+class Offloader:
+    # Menjalankan pekerjaan CPU-berat (decode frame besar) di luar event loop.
+    # Executor dibuat saat pertama kali dipakai supaya worker yang tidak pernah menerima frame besar tidak membuat pool.
+
+    def __init__(self, kind: str = "process", workers: int = 2):
+        if kind not in EXECUTOR_KINDS:
+            raise ValueError(f"Jenis executor tidak dikenali: {kind}")
+        self.kind = kind
+        self.workers = workers
+        self.executor = None
+        self.submitted = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.kind != "none"
+
+    @property
+    def needs_copy(self) -> bool:
+        # memoryview tidak bisa di-pickle; process pool butuh salinan bytes
+        return self.kind == "process"
+
+    def get_executor(self):
+        if self.executor is None:
+            if self.kind == "process":
+                self.executor = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                    initializer=init_process_worker,
+                )
+            else:
+                self.executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="offload")
+            logger.info("Executor offload %s dibuat (%d worker)", self.kind, self.workers)
+        return self.executor
+
+    async def run(self, func, *args):
+        self.submitted += 1
+        return await asyncio.get_running_loop().run_in_executor(self.get_executor(), func, *args)
+
+    def shutdown(self):
+        if self.executor is not None:
+            self.executor.shutdown(wait=True, cancel_futures=True)
+            self.executor = None
@@ -0,0 +1,153 @@
+import asyncio
+import time
+from datetime import datetime, timezone
+from math import cos, radians, sqrt
+
+# Urutan = urutan pemeriksaan (yang paling murah dan paling sering kena lebih dulu);
+# record dihitung pada aturan pertama yang menolaknya
+FILTER_RULES = (
+    "zero_position", "out_of_range", "ancient_timestamp", "future_timestamp", "low_satellites", "speed_jump",
+)
+
+METERS_PER_DEGREE = 111_320.0
+# Lompatan di bawah jarak ini dianggap jitter GPS biasa, tidak dinilai kecepatannya
+MIN_JUMP_METERS = 200.0
+# Setelah sekian lompatan berturut-turut, posisi baru diterima (device dipindah saat mati, dsb.)
+MAX_JUMP_REJECTS = 3
+
+
+def parse_rules(spec: str):
+    rules = tuple(filter(None, (rule.strip() for rule in spec.lower().split(","))))
+    for rule in rules:
+        if rule not in FILTER_RULES:
+            raise ValueError(f"Aturan filter record tidak dikenali: {rule}")
+    return rules
+
+
+def date_ms(value: str) -> int:
+    # "2015-01-01" (UTC) -> epoch ms
+    moment = datetime.fromisoformat(value)
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=timezone.utc)
+    return int(moment.timestamp() * 1000)
+
+
+class RecordFilter:
+    # Membuang fix GPS sampah dari AVLRecord mentah, sebelum mapping dan serialisasi.
+    # Aturan aktif dikompilasi sekali menjadi tuple (nama, fungsi) dengan batas yang sudah dihitung;
+    # instance di-cache per konfigurasi sehingga process pool cukup menerima key-nya.
+
+    __slots__ = ("rules", "checks", "speed_jump", "max_speed", "keep_priority")
+
+    _compiled = {}
+
+    def __init__(self, rules, max_future: float = 86400.0, min_timestamp: str = "2015-01-01",
+                 min_satellites: int = 3, max_speed: float = 250.0, keep_priority: int = 2):
+        self.rules = tuple(rule for rule in FILTER_RULES if rule in rules)
+        max_future_ms = int(max_future * 1000)
+        min_timestamp_ms = date_ms(min_timestamp)
+        compiled = {
+            "zero_position": lambda record, now_ms: record.latitude == 0 and record.longitude == 0,
+            "out_of_range": lambda record, now_ms: not (-90 <= record.latitude <= 90 and -180 <= record.longitude <= 180),
+            "ancient_timestamp": lambda record, now_ms: record.timestamp_ms < min_timestamp_ms,
+            "future_timestamp": lambda record, now_ms: record.timestamp_ms > now_ms + max_future_ms,
+            "low_satellites": lambda record, now_ms: record.satellites < min_satellites,
+        }
+        self.checks = tuple((rule, compiled[rule]) for rule in self.rules if rule in compiled)
+        self.speed_jump = "speed_jump" in self.rules
+        self.max_speed = max_speed
+        # Record dengan priority >= ini (2 = panic) tidak pernah dibuang; 3 = semua record difilter
+        self.keep_priority = keep_priority
+
+    @classmethod
+    def for_config(cls, rules, *args) -> "RecordFilter":
+        key = (tuple(rules),) + args
+        record_filter = cls._compiled.get(key)
+        if record_filter is None:
+            record_filter = cls._compiled[key] = cls(*key)
+        return record_filter
+
+    def is_jump(self, record, last_fix) -> bool:
+        last_ms, last_latitude, last_longitude, _ = last_fix
+        dy = (record.latitude - last_latitude) * METERS_PER_DEGREE
+        dx = (record.longitude - last_longitude) * METERS_PER_DEGREE * cos(radians((record.latitude + last_latitude) / 2))
+        distance = sqrt(dx * dx + dy * dy)
+        if distance <= MIN_JUMP_METERS:
+            return False
+        # m/ms -> km/jam
+        return distance * 3600 / (record.timestamp_ms - last_ms) > self.max_speed
+
+    def apply(self, records, keys, last_fix, now_ms: int):
+        # records: AVLRecord satu frame, keys sejajar. last_fix: (timestamp_ms, lat, lon, lompatan ditolak)
+        # fix terakhir IMEI ini yang lolos, atau None. Mengembalikan (records, keys, {aturan: jumlah}, last_fix).
+        kept, kept_keys = [], []
+        dropped = {}
+        checks = self.checks
+        for record, key in zip(records, keys):
+            if record.priority >= self.keep_priority:
+                kept.append(record)
+                kept_keys.append(key)
+                continue
+            rule = None
+            for name, check in checks:
+                if check(record, now_ms):
+                    rule = name
+                    break
+            if rule is None and self.speed_jump:
+                if last_fix is None:
+                    last_fix = (record.timestamp_ms, record.latitude, record.longitude, 0)
+                elif record.timestamp_ms > last_fix[0]:
+                    # Record terlambat (lebih tua dari fix terakhir) tidak dinilai dan tidak mengubah state
+                    if last_fix[3] < MAX_JUMP_REJECTS and self.is_jump(record, last_fix):
+                        rule = "speed_jump"
+                        last_fix = last_fix[:3] + (last_fix[3] + 1,)
+                    else:
+                        last_fix = (record.timestamp_ms, record.latitude, record.longitude, 0)
+            if rule is None:
+                kept.append(record)
+                kept_keys.append(key)
+            else:
+                dropped[rule] = dropped.get(rule, 0) + 1
+        return kept, kept_keys, dropped, last_fix
+
+
+class LastFixes:
+    # Fix terakhir yang lolos per IMEI untuk aturan speed_jump. Device yang tidak mengirim apa pun selama
+    # ttl detik (jam server) dilepas; fix pertamanya setelah itu diterima sebagai titik acuan baru.
+
+    def __init__(self, ttl: float):
+        self.ttl = ttl
+        self.fixes = {}
+        self.task = None
+
+    def __len__(self):
+        return len(self.fixes)
+
+    def get(self, imei: str):
+        entry = self.fixes.get(imei)
+        return entry[0] if entry is not None else None
+
+    def set(self, imei: str, last_fix):
+        self.fixes[imei] = (last_fix, time.monotonic())
+
+    def prune(self, now: float = None) -> int:
+        cutoff = (time.monotonic() if now is None else now) - self.ttl
+        idle = [imei for imei, (_, seen) in self.fixes.items() if seen < cutoff]
+        for imei in idle:
+            del self.fixes[imei]
+        return len(idle)
+
+    async def maintain(self):
+        interval = max(1.0, min(self.ttl / 4, 60.0))
+        while True:
+            await asyncio.sleep(interval)
+            self.prune()
+
+    def start(self):
+        if self.task is None:
+            self.task = asyncio.create_task(self.maintain())
+
+    def stop(self):
+        if self.task is not None:
+            self.task.cancel()
+            self.task = None
@@ -0,0 +1,104 @@
+import json
+from abc import ABC, abstractmethod
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+try:
+    import cbor2
+except ImportError:
+    cbor2 = None
+
+PAYLOAD_VERSION = 1
+
+
+class PayloadSerializer(ABC):
+    # Mengubah list record hasil mapper menjadi payload MQTT (bytes)
+    name = None
+    binary = False
+
+    def __init__(self, envelope: bool):
+        self.envelope = envelope
+
+    def wrap(self, records):
+        # Header format/versi supaya consumer bisa menegosiasikan decoder
+        if self.envelope:
+            return {"format": self.name, "version": PAYLOAD_VERSION, "records": records}
+        return records
+
+    @abstractmethod
+    def dumps(self, records) -> bytes:
+        pass
+
+
+class JSONSerializer(PayloadSerializer):
+    name = "json"
+
+    def dumps(self, records) -> bytes:
+        return json.dumps(self.wrap(records), separators=(",", ":")).encode("utf-8")
+
+
+class OrjsonSerializer(PayloadSerializer):
+    name = "json"
+
+    def dumps(self, records) -> bytes:
+        try:
+            return orjson.dumps(self.wrap(records), option=orjson.OPT_NON_STR_KEYS)
+        except TypeError:
+            # Nilai NX > 8 byte (mis. VIN) menjadi integer di atas 64-bit yang ditolak orjson
+            return json.dumps(self.wrap(records), separators=(",", ":")).encode("utf-8")
+
+
+def pack_big_int(value):
+    # Dipanggil msgpack untuk integer di luar 64-bit (nilai NX > 8 byte, mis. VIN): dikirim sebagai bin big-endian
+    if isinstance(value, int) and value >= 0:
+        return value.to_bytes((value.bit_length() + 7) // 8, "big")
+    raise TypeError(f"Tipe {type(value).__name__} tidak bisa diserialisasi ke msgpack")
+
+
+class MsgpackSerializer(PayloadSerializer):
+    name = "msgpack"
+    binary = True
+
+    def dumps(self, records) -> bytes:
+        return msgpack.packb(self.wrap(records), use_bin_type=True, default=pack_big_int)
+
+
+class CBORSerializer(PayloadSerializer):
+    name = "cbor"
+    binary = True
+
+    def dumps(self, records) -> bytes:
+        return cbor2.dumps(self.wrap(records))
+
+
+def get_serializer(name: str, envelope: str = "auto") -> PayloadSerializer:
+    name = name.lower()
+    if name == "json":
+        cls = OrjsonSerializer if orjson is not None else JSONSerializer
+    elif name == "json-std":
+        cls = JSONSerializer
+    elif name == "msgpack":
+        if msgpack is None:
+            raise RuntimeError("PAYLOAD_FORMAT=msgpack membutuhkan paket msgpack (pip install msgpack)")
+        cls = MsgpackSerializer
+    elif name == "cbor":
+        if cbor2 is None:
+            raise RuntimeError("PAYLOAD_FORMAT=cbor membutuhkan paket cbor2 (pip install cbor2)")
+        cls = CBORSerializer
+    else:
+        raise ValueError(f"PAYLOAD_FORMAT tidak dikenali: {name}")
+
+    # auto: JSON tetap array polos (kompatibel dengan consumer lama), format biner selalu memakai header
+    if envelope == "auto":
+        use_envelope = cls.binary
+    else:
+        use_envelope = envelope.lower() in ("1", "true", "yes")
+    return cls(use_envelope)
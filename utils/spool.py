@@ -0,0 +1,130 @@
+import mmap
+import os
+import struct
+
+# Panjang payload, panjang topic
+ENTRY_HEADER = struct.Struct(">IH")
+SEGMENT_SUFFIX = ".seg"
+
+
+class SegmentSpool:
+    # Spool append-only berbasis segment: entri (topic, payload) ditulis berurutan,
+    # segment yang sudah ditutup dibaca ulang lewat mmap lalu dihapus setelah di-ACK
+
+    def __init__(self, directory: str, segment_size: int, fsync: bool = False):
+        self.directory = directory
+        self.segment_size = segment_size
+        self.fsync = fsync
+
+        # Segment sisa proses sebelumnya langsung dianggap tertutup dan siap di-replay
+        self.sealed = sorted(
+            int(name[:-len(SEGMENT_SUFFIX)])
+            for name in (os.listdir(directory) if os.path.isdir(directory) else ())
+            if name.endswith(SEGMENT_SUFFIX) and name[:-len(SEGMENT_SUFFIX)].isdigit()
+        )
+        self.next_seq = self.sealed[-1] + 1 if self.sealed else 0
+        self.active = None
+        self.active_seq = None
+        self.active_size = 0
+        # Posisi replay di segment tertua, supaya entri yang sudah terkirim tidak diulang
+        self.replay_offset = 0
+
+        self.pending_bytes = sum(os.path.getsize(self.path(seq)) for seq in self.sealed)
+        self.spooled_entries = 0
+        self.replayed_entries = 0
+
+    def path(self, seq: int) -> str:
+        return os.path.join(self.directory, f"{seq:020d}{SEGMENT_SUFFIX}")
+
+    def __len__(self):
+        return len(self.sealed) + (1 if self.active_size else 0)
+
+    def empty(self) -> bool:
+        return not self.sealed and not self.active_size
+
+    def append(self, topic: str, payload):
+        if isinstance(payload, str):
+            payload = payload.encode("utf-8")
+        topic_bytes = topic.encode("utf-8")
+        if self.active is None:
+            os.makedirs(self.directory, exist_ok=True)
+            self.active_seq = self.next_seq
+            self.next_seq += 1
+            self.active = open(self.path(self.active_seq), "ab")
+            self.active_size = 0
+        self.active.write(ENTRY_HEADER.pack(len(payload), len(topic_bytes)))
+        self.active.write(topic_bytes)
+        self.active.write(payload)
+        size = ENTRY_HEADER.size + len(topic_bytes) + len(payload)
+        self.active_size += size
+        self.pending_bytes += size
+        self.spooled_entries += 1
+        if self.active_size >= self.segment_size:
+            self.seal()
+
+    def flush(self):
+        if self.active is not None:
+            self.active.flush()
+            if self.fsync:
+                os.fsync(self.active.fileno())
+
+    def seal(self):
+        # Segment aktif ditutup agar bisa dibaca replay; append berikutnya membuka segment baru
+        if self.active is None:
+            return
+        self.flush()
+        self.active.close()
+        if self.active_size:
+            self.sealed.append(self.active_seq)
+        else:
+            os.remove(self.path(self.active_seq))
+        self.active = None
+        self.active_seq = None
+        self.active_size = 0
+
+    def read_oldest(self, max_entries: int):
+        # Membaca hingga max_entries entri dari segment tertua mulai replay_offset.
+        # Mengembalikan list (topic, payload, offset_sesudahnya); list kosong berarti segment habis.
+        if not self.sealed:
+            return []
+        seq = self.sealed[0]
+        entries = []
+        with open(self.path(seq), "rb") as f:
+            size = os.fstat(f.fileno()).st_size
+            if size == 0:
+                return entries
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as view:
+                offset = self.replay_offset
+                while offset + ENTRY_HEADER.size <= size and len(entries) < max_entries:
+                    payload_length, topic_length = ENTRY_HEADER.unpack_from(view, offset)
+                    start = offset + ENTRY_HEADER.size
+                    end = start + topic_length + payload_length
+                    if end > size:
+                        # Entri terpotong (crash saat menulis): sisa segment diabaikan
+                        break
+                    topic = view[start:start + topic_length].decode("utf-8")
+                    entries.append((topic, view[start + topic_length:end], end))
+                    offset = end
+        return entries
+
+    def ack(self, offset: int):
+        self.replayed_entries += 1
+        self.replay_offset = offset
+
+    def release_oldest(self):
+        seq = self.sealed.pop(0)
+        path = self.path(seq)
+        self.pending_bytes -= os.path.getsize(path)
+        os.remove(path)
+        self.replay_offset = 0
+
+    def close(self):
+        self.seal()
+
+    def stats(self):
+        return {
+            "spool_segments": len(self),
+            "spool_pending_bytes": self.pending_bytes,
+            "spooled_entries": self.spooled_entries,
+            "replayed_entries": self.replayed_entries,
+        }
@@ -0,0 +1,153 @@
+import asyncio
+import time
+from utils.dedup import split_key
+
+# all = setiap record dipublish utuh (snapshot penuh, perilaku lama)
+# changed = record utuh hanya bila ada field yang berubah melewati deadband, atau heartbeat
+# delta = hanya field yang berubah (+ imei, timestamp); record pertama/heartbeat/prioritas tetap utuh
+STATE_MODES = ("all", "changed", "delta")
+
+# Field yang tidak dibandingkan: identitas, waktu, dan data mentah
+IGNORED_FIELDS = ("imei", "timestamp", "data_payload")
+POSITION_FIELDS = ("latitude", "longitude", "altitude", "angle", "speed")
+
+DEFAULT_DEADBANDS = (
+    "latitude=0.0001,longitude=0.0001,altitude=10,angle=15,speed=3,"
+    "battery_voltage=100,power_input=300,fuel_level=1,total_odometer=100,fuel_used_gps=100,"
+    "gsm_signal=1,engine_load=5,coolant_temp=2,engine_rpm=100,vehicle_speed=3,intake_air_temp=2,"
+    "maf=200,throttle_position=3,run_time_since_engine_start=60,control_module_voltage=200,"
+    "engine_oil_temperature=2,fuel_rate=50"
+)
+
+
+def parse_deadbands(spec: str):
+    # "latitude=0.0001,speed=3" -> {"latitude": 0.0001, "speed": 3.0}
+    deadbands = {}
+    for item in filter(None, (part.strip() for part in spec.split(","))):
+        field, _, band = item.partition("=")
+        deadbands[field.strip()] = float(band)
+    return deadbands
+
+
+class DeviceState:
+    # Nilai terakhir yang dipublish untuk satu IMEI, disimpan sebagai list sejajar StateCache.fields.
+    # updated: jam server (monotonic) frame terakhir, hanya untuk melepas device yang diam
+    __slots__ = ("values", "published_ms", "snapshot_ms", "updated")
+
+    def __init__(self, values, timestamp_ms: int):
+        self.values = values
+        self.published_ms = timestamp_ms
+        self.snapshot_ms = timestamp_ms
+        self.updated = time.monotonic()
+
+
+class StateCache:
+    # Cache state terakhir per IMEI untuk publish change-only. Waktu dihitung dari timestamp record
+    # (bukan jam server), supaya backlog yang diupload sekaligus tetap dinilai per interval aslinya.
+    # Device yang tidak mengirim apa pun selama idle_ttl detik (jam server) dilepas; record berikutnya
+    # diperlakukan sebagai record pertama (dipublish utuh).
+
+    def __init__(self, fields, mode: str = "changed", deadbands=None, min_interval: float = 0.0,
+                 heartbeat_interval: float = 300.0, force_priority: int = 1, idle_ttl: float = 3600.0):
+        if mode not in STATE_MODES:
+            raise ValueError(f"Mode publish state tidak dikenali: {mode}")
+        deadbands = deadbands or {}
+        self.mode = mode
+        self.fields = tuple(field for field in fields if field not in IGNORED_FIELDS)
+        # (index, field, deadband); deadband 0 = setiap perubahan nilai dipublish
+        self.compiled = tuple(
+            (index, field, deadbands.get(field, 0.0)) for index, field in enumerate(self.fields)
+        )
+        self.min_interval_ms = int(min_interval * 1000)
+        self.heartbeat_ms = int(heartbeat_interval * 1000)
+        # Record dengan priority >= ini (1 = high, 2 = panic) selalu dipublish utuh; 3 = nonaktif
+        self.force_priority = force_priority
+        self.idle_ttl = idle_ttl
+        self.devices = {}
+        self.task = None
+
+    def __len__(self):
+        return len(self.devices)
+
+    @classmethod
+    def for_mapper(cls, mapper, **policy) -> "StateCache":
+        return cls(POSITION_FIELDS + tuple(mapper.template), **policy)
+
+    def changes(self, state: DeviceState, payload):
+        changed = []
+        values = state.values
+        for index, field, band in self.compiled:
+            value = payload.get(field)
+            old = values[index]
+            if value == old:
+                continue
+            if band and type(value) in (int, float) and type(old) in (int, float) and abs(value - old) < band:
+                continue
+            changed.append((index, field, value))
+        return changed
+
+    def filter(self, imei: str, payload, keys):
+        # payload: list record hasil mapping untuk satu frame; keys: record_key() sejajar payload.
+        # Mengembalikan list yang perlu dipublish (record utuh atau delta).
+        if self.mode == "all":
+            return payload
+        state = self.devices.get(imei)
+        fields = self.fields
+        output = []
+        for record, key in zip(payload, keys):
+            timestamp_ms, priority = split_key(key)
+            if state is None:
+                state = self.devices[imei] = DeviceState([record.get(field) for field in fields], timestamp_ms)
+                output.append(record)
+                continue
+            if timestamp_ms < state.published_ms:
+                # Record terlambat (lebih tua dari state): dipublish apa adanya tanpa mengubah state
+                output.append(record)
+                continue
+            if priority >= self.force_priority or timestamp_ms - state.snapshot_ms >= self.heartbeat_ms:
+                state.values = [record.get(field) for field in fields]
+                state.published_ms = state.snapshot_ms = timestamp_ms
+                output.append(record)
+                continue
+            if timestamp_ms - state.published_ms < self.min_interval_ms:
+                continue
+            changed = self.changes(state, record)
+            if not changed:
+                continue
+            state.published_ms = timestamp_ms
+            if self.mode == "changed":
+                # Record utuh juga berfungsi sebagai snapshot, heartbeat dihitung ulang dari sini
+                state.values = [record.get(field) for field in fields]
+                state.snapshot_ms = timestamp_ms
+                output.append(record)
+            else:
+                delta = {"imei": record["imei"], "timestamp": record["timestamp"]}
+                for index, field, value in changed:
+                    state.values[index] = value
+                    delta[field] = value
+                output.append(delta)
+        if state is not None:
+            state.updated = time.monotonic()
+        return output
+
+    def prune(self, now: float = None) -> int:
+        cutoff = (time.monotonic() if now is None else now) - self.idle_ttl
+        idle = [imei for imei, state in self.devices.items() if state.updated < cutoff]
+        for imei in idle:
+            del self.devices[imei]
+        return len(idle)
+
+    async def maintain(self):
+        interval = max(1.0, min(self.idle_ttl / 4, 60.0))
+        while True:
+            await asyncio.sleep(interval)
+            self.prune()
+
+    def start(self):
+        if self.task is None:
+            self.task = asyncio.create_task(self.maintain())
+
+    def stop(self):
+        if self.task is not None:
+            self.task.cancel()
+            self.task = None
@@ -0,0 +1,15 @@
+# Key yang digabung dengan nilai maksimum, bukan dijumlahkan
+MAX_KEYS = frozenset(("last_flush_seconds", "max_queue_depth"))
+
+
+def merge_stats(stats_list):
+    total = {}
+    for stats in stats_list:
+        for key, value in stats.items():
+            if not isinstance(value, (int, float)):
+                continue
+            if key in MAX_KEYS:
+                total[key] = max(total.get(key, 0), value)
+            else:
+                total[key] = total.get(key, 0) + value
+    return total
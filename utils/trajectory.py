@@ -0,0 +1,185 @@
+import asyncio
+import time
+from math import cos, radians
+from utils.dedup import split_key
+from utils.log import get_logger
+from utils.metrics import simplified_records_total
+
+logger = get_logger("trajectory")
+
+METERS_PER_DEGREE = 111_320.0
+
+
+class DeviceTrack:
+    # Titik anchor (terakhir dipublish) + titik yang ditahan sejak anchor, dalam meter relatif ke anchor.
+    # Hanya record terakhir (tail) yang disimpan utuh karena hanya dia yang bisa menjadi titik berikutnya.
+    __slots__ = (
+        "anchor_ms", "anchor_latitude", "anchor_longitude", "anchor_angle", "lon_scale",
+        "points", "tail", "last_ms", "updated",
+    )
+
+    def __init__(self, timestamp_ms: int, latitude: float, longitude: float, angle):
+        self.points = []
+        self.tail = None
+        self.last_ms = timestamp_ms
+        self.updated = time.monotonic()
+        self.move_anchor(timestamp_ms, latitude, longitude, angle)
+
+    def move_anchor(self, timestamp_ms: int, latitude: float, longitude: float, angle):
+        self.anchor_ms = timestamp_ms
+        self.anchor_latitude = latitude
+        self.anchor_longitude = longitude
+        self.anchor_angle = angle
+        self.lon_scale = METERS_PER_DEGREE * cos(radians(latitude))
+        self.points = []
+        self.tail = None
+
+    def project(self, latitude: float, longitude: float):
+        return (
+            (longitude - self.anchor_longitude) * self.lon_scale,
+            (latitude - self.anchor_latitude) * METERS_PER_DEGREE,
+        )
+
+
+class TrajectorySimplifier:
+    # Penyederhanaan lintasan streaming per IMEI (opening window dengan SED: jarak ke posisi yang
+    # diinterpolasi menurut waktu di segmen anchor -> titik baru). Titik ditahan selama segmen dari
+    # anchor masih mewakili semua titik yang ditahan dalam toleransi; begitu terlampaui, titik
+    # sebelumnya dipublish dan menjadi anchor baru. Buffer per device dibatasi max_points.
+
+    def __init__(self, tolerance: float, angle: float = 30.0, max_points: int = 60, max_interval: float = 300.0,
+                 max_delay: float = 30.0):
+        self.tolerance_sq = tolerance * tolerance
+        self.angle = angle
+        self.max_points = max(2, max_points)
+        self.max_interval_ms = int(max_interval * 1000)
+        self.max_delay = max_delay
+        self.devices = {}
+        self.task = None
+        self.dropped = 0
+
+    def __len__(self):
+        return len(self.devices)
+
+    def fits(self, track: DeviceTrack, timestamp_ms: int, x: float, y: float) -> bool:
+        # Semua titik yang ditahan berada dalam toleransi SED terhadap segmen anchor (0, 0) -> (x, y)
+        span = timestamp_ms - track.anchor_ms
+        if span <= 0:
+            return not track.points
+        anchor_ms = track.anchor_ms
+        tolerance_sq = self.tolerance_sq
+        for point_ms, px, py in track.points:
+            ratio = (point_ms - anchor_ms) / span
+            dx = ratio * x - px
+            dy = ratio * y - py
+            if dx * dx + dy * dy > tolerance_sq:
+                return False
+        return True
+
+    def turned(self, track: DeviceTrack, angle, speed) -> bool:
+        if not speed or angle is None or track.anchor_angle is None:
+            return False
+        delta = abs(angle - track.anchor_angle) % 360
+        return min(delta, 360 - delta) > self.angle
+
+    def release_tail(self, track: DeviceTrack, output, output_keys):
+        # Titik terakhir yang ditahan dipublish dan menjadi anchor; titik lain di buffer dibuang
+        record, key = track.tail
+        output.append(record)
+        output_keys.append(key)
+        self.discard(len(track.points) - 1)
+        track.move_anchor(split_key(key)[0], record["latitude"], record["longitude"], record.get("angle"))
+
+    def discard(self, count: int):
+        if count > 0:
+            self.dropped += count
+            simplified_records_total.inc(count)
+
+    def filter(self, imei: str, payload, keys, events):
+        # payload: record hasil mapping satu frame, keys: record_key() sejajar, events: event_io_id sejajar.
+        # Mengembalikan (record, keys) yang dipublish; bisa berisi titik tahanan dari frame sebelumnya.
+        output, output_keys = [], []
+        track = self.devices.get(imei)
+        for record, key, event_io_id in zip(payload, keys, events):
+            timestamp_ms, priority = split_key(key)
+            latitude = record["latitude"]
+            longitude = record["longitude"]
+            angle = record.get("angle")
+            if track is None:
+                track = self.devices[imei] = DeviceTrack(timestamp_ms, latitude, longitude, angle)
+                output.append(record)
+                output_keys.append(key)
+                continue
+            if timestamp_ms <= track.last_ms:
+                # Record terlambat tidak disisipkan ke lintasan yang sedang disederhanakan
+                output.append(record)
+                output_keys.append(key)
+                continue
+            track.last_ms = timestamp_ms
+            # Titik wajib: event IO, priority high/panic, belokan, atau terlalu lama sejak titik terakhir
+            forced = (
+                event_io_id or priority
+                or timestamp_ms - track.anchor_ms >= self.max_interval_ms
+                or self.turned(track, angle, record.get("speed"))
+            )
+            x, y = track.project(latitude, longitude)
+            if track.points and not self.fits(track, timestamp_ms, x, y):
+                self.release_tail(track, output, output_keys)
+                x, y = track.project(latitude, longitude)
+            elif len(track.points) >= self.max_points:
+                self.release_tail(track, output, output_keys)
+                x, y = track.project(latitude, longitude)
+            if forced:
+                self.discard(len(track.points))
+                output.append(record)
+                output_keys.append(key)
+                track.move_anchor(timestamp_ms, latitude, longitude, angle)
+            else:
+                track.points.append((timestamp_ms, x, y))
+                track.tail = (record, key)
+        if track is not None:
+            track.updated = time.monotonic()
+        return output, output_keys
+
+    def flush(self, max_delay: float):
+        # Titik tahanan device yang diam lebih dari max_delay detik (jam server) dipublish, supaya posisi
+        # terakhir kendaraan yang berhenti mengirim tetap sampai. Mengembalikan [(imei, records, keys)].
+        cutoff = time.monotonic() - max_delay
+        flushed = []
+        for imei, track in self.devices.items():
+            if track.tail is not None and track.updated <= cutoff:
+                records, keys = [], []
+                self.release_tail(track, records, keys)
+                flushed.append((imei, records, keys))
+        return flushed
+
+    def prune(self, idle: float) -> int:
+        # State device tanpa titik tahanan yang diam lebih dari idle detik dilepas; record berikutnya
+        # diperlakukan sebagai record pertama (dipublish dan menjadi anchor baru)
+        cutoff = time.monotonic() - idle
+        idle_devices = [imei for imei, track in self.devices.items() if track.tail is None and track.updated <= cutoff]
+        for imei in idle_devices:
+            del self.devices[imei]
+        return len(idle_devices)
+
+    async def maintain(self, publish):
+        # Setelah diam max_interval, record berikutnya toh menjadi titik wajib: anchor lama tidak diperlukan lagi
+        idle = max(self.max_delay, self.max_interval_ms / 1000)
+        interval = max(1.0, self.max_delay / 2)
+        while True:
+            await asyncio.sleep(interval)
+            for imei, records, keys in self.flush(self.max_delay):
+                try:
+                    await publish(imei, records, keys)
+                except Exception as e:
+                    logger.error("Gagal mempublish titik lintasan IMEI %s: %s", imei, e)
+            self.prune(idle)
+
+    def start(self, publish):
+        if self.task is None:
+            self.task = asyncio.create_task(self.maintain(publish))
+
+    def stop(self):
+        if self.task is not None:
+            self.task.cancel()
+            self.task = None
@@ -0,0 +1,410 @@
+import asyncio
+import time
+from datetime import datetime, timezone
+from math import cos, radians, sqrt
+from utils.dedup import split_key
+from utils.log import get_logger
+from utils.metrics import trip_summaries_total, trip_late_records_total
+
+logger = get_logger("trips")
+
+METERS_PER_DEGREE = 111_320.0
+# io_id Teltonika yang dipakai agregasi; nama field diambil dari profile mapping
+IGNITION_IO, ODOMETER_IO, FUEL_USED_IO, FUEL_RATE_IO, RPM_IO = 1, 16, 12, 13, 36
+
+
+def format_time(timestamp_ms: int, epoch_ms: bool):
+    if epoch_ms:
+        return timestamp_ms
+    return datetime.fromtimestamp(timestamp_ms / 1000, tz=timezone.utc).isoformat()
+
+
+class Window:
+    # Agregat satu trip atau satu interval. Counter kumulatif device (odometer, fuel used) disimpan
+    # sebagai min/max sehingga record terlambat tetap bisa digabung tanpa memperhatikan urutan;
+    # durasi, jarak GPS dan fuel dari rate hanya dihitung dari selisih record yang datang berurutan.
+
+    __slots__ = (
+        "start_ms", "end_ms", "first_ms", "last_ms", "records", "late", "odometer_min", "odometer_max",
+        "fuel_min", "fuel_max", "gps_distance", "rate_fuel", "engine_ms", "moving_ms", "idle_ms",
+        "max_speed", "max_rpm", "start_position", "end_position", "last_on_ms",
+    )
+
+    def __init__(self, start_ms: int, end_ms: int = 0):
+        self.start_ms = start_ms
+        self.end_ms = end_ms
+        self.first_ms = None
+        self.last_ms = None
+        self.records = 0
+        self.late = 0
+        self.odometer_min = self.odometer_max = None
+        self.fuel_min = self.fuel_max = None
+        self.gps_distance = 0.0
+        self.rate_fuel = 0.0
+        self.engine_ms = self.moving_ms = self.idle_ms = 0
+        self.max_speed = 0
+        self.max_rpm = 0
+        self.start_position = self.end_position = None
+        # Record ignition on terakhir (khusus trip), untuk mengoreksi akhir trip dari record terlambat
+        self.last_on_ms = 0
+
+    def merge(self, timestamp_ms: int, position, speed, odometer, fuel, rpm):
+        # Bagian yang tidak bergantung urutan; dipakai untuk semua record termasuk yang terlambat
+        self.records += 1
+        if self.first_ms is None or timestamp_ms < self.first_ms:
+            self.first_ms = timestamp_ms
+            self.start_position = position
+        if self.last_ms is None or timestamp_ms > self.last_ms:
+            self.last_ms = timestamp_ms
+            self.end_position = position
+        if odometer:
+            if self.odometer_min is None or odometer < self.odometer_min:
+                self.odometer_min = odometer
+            if self.odometer_max is None or odometer > self.odometer_max:
+                self.odometer_max = odometer
+        if fuel:
+            if self.fuel_min is None or fuel < self.fuel_min:
+                self.fuel_min = fuel
+            if self.fuel_max is None or fuel > self.fuel_max:
+                self.fuel_max = fuel
+        if speed > self.max_speed:
+            self.max_speed = speed
+        if rpm > self.max_rpm:
+            self.max_rpm = rpm
+
+    def extend(self, previous, dt_ms: int, step_meters: float, fuel_rate):
+        # Selisih dari record berurutan sebelumnya; durasi dihitung menurut keadaan record sebelumnya
+        ignition, speed = previous
+        if ignition:
+            self.engine_ms += dt_ms
+            if speed > 0:
+                self.moving_ms += dt_ms
+            else:
+                self.idle_ms += dt_ms
+        self.gps_distance += step_meters
+        if fuel_rate:
+            # fuel rate GPS (io 13) dalam 0.01 l/100 km -> ml per meter = rate * 1e-4
+            self.rate_fuel += fuel_rate * step_meters * 1e-4
+
+    def summary(self, kind: str, imei: str, epoch_ms: bool, partial: bool = False):
+        end_ms = self.end_ms or self.last_ms
+        if self.odometer_max is not None and self.odometer_max > self.odometer_min:
+            distance, distance_source = self.odometer_max - self.odometer_min, "odometer"
+        else:
+            distance, distance_source = round(self.gps_distance), "gps"
+        if self.fuel_max is not None and self.fuel_max > self.fuel_min:
+            fuel, fuel_source = self.fuel_max - self.fuel_min, "counter"
+        elif self.rate_fuel:
+            fuel, fuel_source = round(self.rate_fuel), "rate"
+        else:
+            fuel, fuel_source = None, None
+        return {
+            "imei": imei,
+            "type": kind,
+            "start": format_time(self.start_ms, epoch_ms),
+            "end": format_time(end_ms, epoch_ms),
+            "duration_s": round((end_ms - self.start_ms) / 1000),
+            "distance_m": distance,
+            "distance_source": distance_source,
+            "fuel_used_ml": fuel,
+            "fuel_source": fuel_source,
+            # Trip = rentang ignition on, jadi durasinya adalah waktu mesin hidup (tidak bergantung urutan record)
+            "engine_s": round((end_ms - self.start_ms if kind == "trip" else self.engine_ms) / 1000),
+            "moving_s": round(self.moving_ms / 1000),
+            "idle_s": round(self.idle_ms / 1000),
+            "max_speed": self.max_speed,
+            "avg_speed": round(distance / self.moving_ms * 3600, 1) if self.moving_ms else 0.0,
+            "max_rpm": self.max_rpm,
+            "start_position": self.start_position,
+            "end_position": self.end_position,
+            "records": self.records,
+            "late_records": self.late,
+            # true = window belum final saat server berhenti; sisa window dipublish terpisah setelah start
+            "partial": partial,
+        }
+
+
+class DeviceTrips:
+    # State O(1) per IMEI: trip terbuka, trip yang sudah berakhir tapi masih menunggu record terlambat,
+    # interval berjalan dan interval sebelumnya, plus record berurutan terakhir
+    __slots__ = (
+        "trip", "ended", "interval", "previous_interval", "last_ms", "previous", "position",
+        "odometer", "trip_emitted_ms", "interval_emitted_ms", "seen",
+    )
+
+    def __init__(self):
+        self.trip = None
+        self.ended = None
+        self.interval = None
+        self.previous_interval = None
+        self.last_ms = 0
+        self.previous = None
+        self.position = None
+        self.odometer = None
+        self.trip_emitted_ms = 0
+        self.interval_emitted_ms = 0
+        self.seen = time.monotonic()
+
+
+class TripAggregator:
+    # Ringkasan trip (ignition on -> off, atau putus lebih dari gap) dan interval tetap per IMEI,
+    # dihitung inkremental dari record hasil mapping. Ringkasan dipublish setelah record-time device
+    # melewati akhir window + lateness, supaya record yang datang tidak berurutan masih ikut dihitung.
+    # Jam server hanya dipakai untuk melepas state device yang lama tidak mengirim (idle_ttl).
+
+    def __init__(self, fields, gap: float = 600.0, interval: float = 3600.0, lateness: float = 120.0,
+                 idle_ttl: float = 7200.0, epoch_ms: bool = False, topic_template: str = "topic/trips"):
+        self.ignition_field, self.odometer_field, self.fuel_field, self.rate_field, self.rpm_field = fields
+        self.gap_ms = int(gap * 1000)
+        self.interval_ms = int(interval * 1000)
+        self.lateness_ms = int(lateness * 1000)
+        self.idle_ttl = idle_ttl
+        self.epoch_ms = epoch_ms
+        self.topic_template = topic_template
+        self.topics = {}
+        self.devices = {}
+        # IMEI yang state-nya sudah dilepas -> (trip_emitted_ms, interval_emitted_ms, waktu dilepas), supaya
+        # record berikutnya tidak membuka lagi window yang sudah dipublish; dibuang setelah idle_ttl berikutnya
+        self.watermarks = {}
+        self.task = None
+        self.summaries = 0
+        self.late_dropped = 0
+
+    def __len__(self):
+        return len(self.devices)
+
+    def topic_for(self, imei: str) -> str:
+        topic = self.topics.get(imei)
+        if topic is None:
+            topic = self.topics[imei] = self.topic_template.format(imei=imei)
+        return topic
+
+    @classmethod
+    def for_mapper(cls, mapper, **policy) -> "TripAggregator":
+        fields = []
+        for io_id in (IGNITION_IO, ODOMETER_IO, FUEL_USED_IO, FUEL_RATE_IO, RPM_IO):
+            targets = mapper.io_fields.get(io_id)
+            fields.append(targets[0][0] if targets else None)
+        return cls(tuple(fields), epoch_ms=mapper.epoch_ms, **policy)
+
+    def values(self, record):
+        get = record.get
+        speed = get("speed") or 0
+        rpm = (get(self.rpm_field) or 0) if self.rpm_field else 0
+        if self.ignition_field:
+            ignition = bool(get(self.ignition_field))
+        else:
+            # Profile tanpa io 1: mesin dianggap hidup bila RPM terbaca atau kendaraan bergerak
+            ignition = rpm > 0 or speed > 0
+        odometer = (get(self.odometer_field) or 0) if self.odometer_field else 0
+        fuel = (get(self.fuel_field) or 0) if self.fuel_field else 0
+        rate = (get(self.rate_field) or 0) if self.rate_field else 0
+        return ignition, speed, odometer, fuel, rate, rpm
+
+    def emit(self, output, kind: str, imei: str, window: Window, partial: bool = False):
+        output.append(window.summary(kind, imei, self.epoch_ms, partial))
+        trip_summaries_total.labels(kind).inc()
+        self.summaries += 1
+
+    def add(self, imei: str, payload, keys):
+        # payload: record hasil mapping satu frame (utuh), keys: record_key() sejajar.
+        # Mengembalikan ringkasan trip/interval yang sudah final.
+        state = self.devices.get(imei)
+        if state is None:
+            state = self.devices[imei] = DeviceTrips()
+            watermarks = self.watermarks.pop(imei, None)
+            if watermarks is not None:
+                state.trip_emitted_ms, state.interval_emitted_ms, _ = watermarks
+        state.seen = time.monotonic()
+        output = []
+        for record, key in zip(payload, keys):
+            timestamp_ms = split_key(key)[0]
+            ignition, speed, odometer, fuel, rate, rpm = self.values(record)
+            position = (record["latitude"], record["longitude"])
+            merge_args = (timestamp_ms, position, speed, odometer, fuel, rpm)
+            if timestamp_ms > state.last_ms:
+                self.add_in_order(state, imei, output, timestamp_ms, ignition, speed, odometer, rate, merge_args)
+            else:
+                self.add_late(state, timestamp_ms, ignition, merge_args)
+        self.release(state, imei, output, state.last_ms)
+        return output
+
+    def add_in_order(self, state: DeviceTrips, imei: str, output, timestamp_ms: int, ignition: bool, speed,
+                     odometer, rate, merge_args):
+        dt_ms = timestamp_ms - state.last_ms if state.previous is not None else 0
+        connected = 0 < dt_ms <= self.gap_ms
+        step = 0.0
+        if connected and state.position is not None:
+            latitude, longitude = merge_args[1]
+            dy = (latitude - state.position[0]) * METERS_PER_DEGREE
+            dx = (longitude - state.position[1]) * METERS_PER_DEGREE * cos(radians(latitude))
+            step = sqrt(dx * dx + dy * dy)
+
+        trip = state.trip
+        if trip is not None and not connected:
+            # Putus terlalu lama (device mati/tanpa sinyal): trip ditutup di record terakhir sebelum jeda
+            self.end_trip(state, imei, output, state.last_ms)
+            trip = None
+        if trip is not None:
+            trip.merge(*merge_args)
+            trip.extend(state.previous, dt_ms, step, rate)
+            if ignition:
+                trip.last_on_ms = timestamp_ms
+            else:
+                self.end_trip(state, imei, output, timestamp_ms)
+        elif ignition and timestamp_ms > state.trip_emitted_ms:
+            trip = state.trip = Window(timestamp_ms)
+            trip.merge(*merge_args)
+            trip.last_on_ms = timestamp_ms
+            if state.odometer and odometer:
+                # Jarak dihitung dari odometer saat ignition on, termasuk selisih sejak record sebelumnya
+                trip.odometer_min = min(state.odometer, odometer)
+
+        bucket = timestamp_ms // self.interval_ms * self.interval_ms if self.interval_ms else None
+        if bucket is not None and bucket < state.interval_emitted_ms:
+            # Interval ini sudah dipublish sebelum state device dilepas
+            self.late_dropped += 1
+            trip_late_records_total.inc()
+        elif bucket is not None:
+            interval = state.interval
+            if interval is None or bucket > interval.start_ms:
+                if interval is not None:
+                    if state.previous_interval is not None:
+                        self.emit(output, "interval", imei, state.previous_interval)
+                        state.interval_emitted_ms = state.previous_interval.end_ms
+                    state.previous_interval = interval
+                interval = state.interval = Window(bucket, bucket + self.interval_ms)
+                if connected and state.odometer and odometer:
+                    interval.odometer_min = min(state.odometer, odometer)
+            interval.merge(*merge_args)
+            if connected:
+                interval.extend(state.previous, dt_ms, step, rate)
+
+        state.last_ms = timestamp_ms
+        state.previous = (ignition, speed)
+        state.position = merge_args[1]
+        if odometer:
+            state.odometer = odometer
+
+    def add_late(self, state: DeviceTrips, timestamp_ms: int, ignition: bool, merge_args):
+        # Record lebih tua dari record terakhir: digabung ke window yang masih terbuka bila masuk rentangnya
+        merged = False
+        trip, ended = state.trip, state.ended
+        window = None
+        if trip is not None and timestamp_ms >= trip.start_ms:
+            window = trip
+        elif ended is not None and ended.start_ms <= timestamp_ms <= ended.end_ms:
+            window = ended
+            if not ignition and ended.last_on_ms < timestamp_ms < ended.end_ms:
+                # Ignition off yang lebih awal baru datang: trip sebenarnya berakhir di record ini
+                ended.end_ms = timestamp_ms
+        elif trip is not None and ignition and timestamp_ms > (ended.end_ms if ended is not None else state.trip_emitted_ms):
+            # Ignition on sebelum awal trip terbuka (dan setelah trip sebelumnya): awal trip dimundurkan
+            trip.start_ms = timestamp_ms
+            window = trip
+        if window is not None:
+            window.merge(*merge_args)
+            window.late += 1
+            if ignition and timestamp_ms > window.last_on_ms:
+                window.last_on_ms = timestamp_ms
+            merged = True
+        for window in (state.interval, state.previous_interval):
+            if window is not None and window.start_ms <= timestamp_ms < window.end_ms:
+                window.merge(*merge_args)
+                window.late += 1
+                merged = True
+                break
+        if not merged and (ignition or timestamp_ms < state.interval_emitted_ms):
+            # Window-nya sudah dipublish (atau tidak ada trip terbuka untuk record ignition on)
+            self.late_dropped += 1
+            trip_late_records_total.inc()
+
+    def end_trip(self, state: DeviceTrips, imei: str, output, end_ms: int):
+        trip = state.trip
+        state.trip = None
+        trip.end_ms = end_ms
+        if state.ended is not None:
+            self.emit(output, "trip", imei, state.ended)
+        state.ended = trip
+
+    def release(self, state: DeviceTrips, imei: str, output, watermark_ms: int):
+        # Window yang sudah lewat lateness terhadap record-time device dipublish
+        if state.ended is not None and watermark_ms >= state.ended.end_ms + self.lateness_ms:
+            self.emit(output, "trip", imei, state.ended)
+            state.trip_emitted_ms = state.ended.end_ms
+            state.ended = None
+        previous_interval = state.previous_interval
+        if previous_interval is not None and watermark_ms >= previous_interval.end_ms + self.lateness_ms:
+            self.emit(output, "interval", imei, previous_interval)
+            state.interval_emitted_ms = previous_interval.end_ms
+            state.previous_interval = None
+
+    def evict(self, imei: str, now_ms: int):
+        # State IMEI ini dilepas. now_ms (jam server) dipakai sebagai watermark: hanya window yang sudah final
+        # (record berikutnya pasti terlambat untuknya) yang dipublish; window yang belum final dibuang tanpa
+        # ringkasan parsial. Watermark emit disimpan supaya window yang sudah dipublish tidak dibuka lagi.
+        state = self.devices.pop(imei)
+        output = []
+        if state.trip is not None and now_ms > state.last_ms + self.gap_ms:
+            self.end_trip(state, imei, output, state.last_ms)
+        self.release(state, imei, output, now_ms)
+        interval = state.interval
+        if interval is not None and state.previous_interval is None and now_ms >= interval.end_ms + self.lateness_ms:
+            self.emit(output, "interval", imei, interval)
+            state.interval_emitted_ms = interval.end_ms
+        if state.trip_emitted_ms or state.interval_emitted_ms:
+            self.watermarks[imei] = (state.trip_emitted_ms, state.interval_emitted_ms, time.monotonic())
+        return output
+
+    def expire(self, idle: float, now_ms: int = None):
+        # Device yang tidak mengirim apa pun selama idle detik (jam server). Mengembalikan [(imei, ringkasan)].
+        cutoff = time.monotonic() - idle
+        now_ms = int(time.time() * 1000) if now_ms is None else now_ms
+        expired = []
+        for imei in [imei for imei, state in self.devices.items() if state.seen < cutoff]:
+            output = self.evict(imei, now_ms)
+            if output:
+                expired.append((imei, output))
+        # Watermark device yang tetap diam selama idle berikutnya juga dilepas
+        for imei in [imei for imei, watermarks in self.watermarks.items() if watermarks[2] < cutoff]:
+            del self.watermarks[imei]
+        return expired
+
+    def close_all(self, now_ms: int = None):
+        # Saat shutdown: window yang sudah final dipublish seperti biasa, window yang belum final (trip terbuka,
+        # trip yang menunggu record terlambat, interval berjalan) dipublish dengan "partial": true
+        now_ms = int(time.time() * 1000) if now_ms is None else now_ms
+        closed = []
+        for imei in list(self.devices):
+            state = self.devices[imei]
+            output = self.evict(imei, now_ms)
+            if state.ended is not None:
+                self.emit(output, "trip", imei, state.ended, partial=True)
+            if state.trip is not None:
+                self.emit(output, "trip", imei, state.trip, partial=True)
+            for interval in (state.previous_interval, state.interval):
+                if interval is not None and interval.end_ms > state.interval_emitted_ms:
+                    self.emit(output, "interval", imei, interval, partial=True)
+            if output:
+                closed.append((imei, output))
+        self.watermarks.clear()
+        return closed
+
+    async def maintain(self, publish):
+        interval = max(1.0, min(self.idle_ttl / 8, 60.0))
+        while True:
+            await asyncio.sleep(interval)
+            for imei, summaries in self.expire(self.idle_ttl):
+                try:
+                    await publish(imei, summaries)
+                except Exception as e:
+                    logger.error("Gagal mempublish ringkasan trip IMEI %s: %s", imei, e)
+
+    def start(self, publish):
+        if self.task is None:
+            self.task = asyncio.create_task(self.maintain(publish))
+
+    def stop(self):
+        if self.task is not None:
+            self.task.cancel()
+            self.task = None